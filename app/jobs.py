@@ -0,0 +1,200 @@
+"""Background job execution.
+
+Routes enqueue work with ``app.routes.jobs.enqueue_job``; ``python worker.py``
+runs a JobWorker that claims jobs from the ``jobs`` table and calls the
+handler registered for each job kind. Handlers receive the job payload and
+a JobContext and return a JSON-serializable result.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures a retry cannot fix (bad input, missing config)"""
+
+
+class JobContext:
+    """What a handler knows about the job it is running"""
+
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.id = job['id']
+        self.kind = job['kind']
+        self.tenant = job['tenant']
+        self.attempt = job['attempts']
+        # What earlier attempts recorded; handlers resume from it
+        self.progress = job.get('progress') or {}
+
+    def report_progress(self, progress):
+        """Publish progress for ``GET /api/jobs/<id>`` (also keeps the job's lock fresh)"""
+        self.queue.update_progress(self.id, progress)
+        self.progress = progress
+
+    def checkpoint(self, **state):
+        """Record that an external side effect happened, before doing anything else.
+
+        If this cannot be stored a retry would repeat the side effect, so the
+        job fails permanently instead.
+        """
+        progress = {**self.progress, **state}
+        try:
+            self.report_progress(progress)
+        except Exception as e:
+            raise PermanentJobError(f"Could not record job state after publishing; not retrying: {str(e)}")
+
+
+def _generate_blog(payload, job):
+    from app.routes.blog import generate_and_publish
+    return generate_and_publish(**payload, state=job.progress, save_state=lambda state: job.checkpoint(**state))
+
+
+def _bulk_blog(payload, job):
+    from app.routes.blog import generate_bulk
+    # A retry picks up after the keywords the last attempt already drafted
+    return generate_bulk(**payload, previous=job.progress, checkpoint=lambda snapshot: job.checkpoint(**snapshot))
+
+
+def _reoptimize(payload, job):
+    from app.routes.reoptimize import reoptimize
+    return reoptimize(**payload, state=job.progress, save_state=lambda state: job.checkpoint(**state))
+
+
+def _gbp_post(payload, job):
+    from app.routes.gbp import publish_gbp_post
+    from app.services.google_service import GBPPostUnconfirmed
+    if 'published' in job.progress:
+        return job.progress['published']
+    try:
+        result = publish_gbp_post(**payload)
+    except GBPPostUnconfirmed as e:
+        # A timed-out request may still have been accepted by Google, and a
+        # duplicate public post is worse than asking the user to try again.
+        # Failures before the request went out are retried as usual.
+        raise PermanentJobError(f"GBP post failed and is not retried (it may have been published): {str(e)}")
+    job.checkpoint(published=result)
+    return result
+
+
+JOB_HANDLERS = {
+    'generate_blog': _generate_blog,
+    'bulk_blog': _bulk_blog,
+    'reoptimize': _reoptimize,
+    'gbp_post': _gbp_post,
+}
+
+
+class JobWorker:
+    """Claims and runs jobs on ``concurrency`` threads until stopped.
+
+    Idle threads poll every ``poll_interval`` seconds. Jobs whose worker
+    died are handed back to the queue once their lock is older than
+    ``lock_timeout``. Marking a finished job done is tried
+    ``complete_retries`` more times before it is left to that sweep, which
+    fails jobs on their last attempt.
+    """
+
+    def __init__(self, queue=None, handlers=None, concurrency=None, poll_interval=None, lock_timeout=None,
+                 worker_id=None, complete_retries=None):
+        if queue is None:
+            from app.models import job_manager as queue
+        self.queue = queue
+        self.handlers = handlers if handlers is not None else JOB_HANDLERS
+        self.concurrency = concurrency or int(os.getenv('JOB_WORKER_CONCURRENCY', 4))
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.getenv('JOB_POLL_INTERVAL', 1.0))
+        self.lock_timeout = lock_timeout or float(os.getenv('JOB_LOCK_TIMEOUT', 1800))
+        self.complete_retries = (complete_retries if complete_retries is not None
+                                 else int(os.getenv('JOB_COMPLETE_RETRIES', 3)))
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {'succeeded': 0, 'retried': 0, 'failed': 0, 'busy_seconds': 0.0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def run_once(self):
+        """Claim and run one job; returns False when nothing was runnable"""
+        job = self.queue.claim(self.worker_id)
+        if job is None:
+            return False
+
+        started = time.monotonic()
+        handler = self.handlers.get(job['kind'])
+        try:
+            if handler is None:
+                raise PermanentJobError(f"No handler for job kind '{job['kind']}'")
+            result = handler(job['payload'], JobContext(self.queue, job))
+        except Exception as e:
+            status = self.queue.fail(job['id'], e, retry=not isinstance(e, PermanentJobError))
+            self._count('retried' if status == 'queued' else 'failed')
+            self._count('busy_seconds', time.monotonic() - started)
+            logger.error(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed "
+                         f"({'will retry' if status == 'queued' else 'giving up'}): {str(e)}")
+            return True
+
+        self._count('busy_seconds', time.monotonic() - started)
+        if not self._complete(job, result):
+            return True
+        self._count('succeeded')
+        logger.info(f"Job {job['id']} ({job['kind']}) succeeded in {time.monotonic() - started:.1f}s")
+        return True
+
+    def _complete(self, job, result):
+        """Mark ``job`` done, retrying with backoff; returns whether it was"""
+        for attempt in range(self.complete_retries + 1):
+            try:
+                self.queue.complete(job['id'], result)
+                return True
+            except Exception as e:
+                if attempt == self.complete_retries:
+                    # Leave the job to the stale-lock sweep, whose rerun finds
+                    # the handler's checkpoints instead of publishing again
+                    logger.error(f"Job {job['id']} ({job['kind']}) succeeded but could not be marked done: {str(e)}")
+                    return False
+                logger.warning(f"Job {job['id']} ({job['kind']}) succeeded but could not be marked done "
+                               f"(will retry): {str(e)}")
+                self._stop.wait(self.poll_interval * 2 ** attempt)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if not self.run_once():
+                    self._stop.wait(self.poll_interval)
+            except Exception as e:
+                # Database hiccup: back off instead of spinning
+                logger.error(f"Job worker error: {str(e)}")
+                self._stop.wait(self.poll_interval * 5)
+
+    def run(self):
+        """Run until ``stop()``; jobs in progress are finished before returning"""
+        logger.info(f"Job worker {self.worker_id} started with {self.concurrency} threads")
+        threads = [threading.Thread(target=self._loop, name=f'job-worker-{n}', daemon=True)
+                   for n in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        while not self._stop.wait(min(60.0, self.lock_timeout / 4)):
+            try:
+                requeued = self.queue.requeue_stale(self.lock_timeout)
+                if requeued:
+                    logger.warning(f"Requeued {requeued} jobs from lost workers")
+            except Exception as e:
+                logger.error(f"Stale job sweep failed: {str(e)}")
+        for thread in threads:
+            thread.join()
+        logger.info(f"Job worker {self.worker_id} stopped: {self.stats()}")
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['busy_seconds'] = round(stats['busy_seconds'], 3)
+        return stats
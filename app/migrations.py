@@ -0,0 +1,310 @@
+"""Versioned schema migrations.
+
+Each entry in ``MIGRATIONS`` is ``(version, description, statements)``. Applied
+versions are recorded in ``schema_migrations`` so that a booting worker only
+needs a single ``SELECT max(version)`` when the schema is already current.
+New schema changes must be appended with the next version number; never edit
+a migration that has already shipped.
+"""
+from psycopg2 import errors
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+# Arbitrary application-wide key for pg_advisory_xact_lock so that concurrent
+# workers booting at the same time apply migrations exactly once.
+MIGRATION_LOCK_ID = 72_411_950
+
+MIGRATIONS = [
+    (1, 'initial schema', [
+        '''CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(255) UNIQUE NOT NULL,
+            email VARCHAR(255) UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role VARCHAR(50) DEFAULT 'user',
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP,
+            api_calls_count INTEGER DEFAULT 0,
+            subscription_plan VARCHAR(50) DEFAULT 'free'
+        )''',
+        '''CREATE TABLE IF NOT EXISTS user_api_keys (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            service_name VARCHAR(255) NOT NULL,
+            api_key TEXT NOT NULL,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used TIMESTAMP,
+            usage_count INTEGER DEFAULT 0,
+            UNIQUE(user_id, service_name)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS posts (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users (id),
+            wordpress_id INTEGER,
+            title TEXT,
+            content TEXT,
+            keywords TEXT,
+            status VARCHAR(50) DEFAULT 'draft',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''CREATE TABLE IF NOT EXISTS user_sessions (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            session_token TEXT UNIQUE NOT NULL,
+            ip_address VARCHAR(255),
+            user_agent TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE
+        )''',
+        '''CREATE TABLE IF NOT EXISTS user_settings (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            setting_key VARCHAR(255) NOT NULL,
+            setting_value TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, setting_key)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS activity_logs (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users (id),
+            action VARCHAR(255) NOT NULL,
+            details TEXT,
+            ip_address VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+    ]),
+    (2, 'session revocations', [
+        '''CREATE TABLE IF NOT EXISTS session_revocations (
+            session_token TEXT PRIMARY KEY,
+            expires_at TIMESTAMP,
+            revoked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_session_revocations_revoked_at
+            ON session_revocations (revoked_at)''',
+        '''INSERT INTO session_revocations (session_token, expires_at)
+            SELECT session_token, expires_at FROM user_sessions
+            WHERE is_active = FALSE AND expires_at > CURRENT_TIMESTAMP
+            ON CONFLICT (session_token) DO NOTHING''',
+    ]),
+    (3, 'indexes for hot lookup paths', [
+        # Per-user history, newest first (login audit, delete_user)
+        '''CREATE INDEX IF NOT EXISTS idx_activity_logs_user_created
+            ON activity_logs (user_id, created_at DESC)''',
+        # Active-session lookups already use the UNIQUE(session_token) index;
+        # these serve per-user cleanup and expiry sweeps
+        '''CREATE INDEX IF NOT EXISTS idx_user_sessions_user_id
+            ON user_sessions (user_id)''',
+        '''CREATE INDEX IF NOT EXISTS idx_user_sessions_expires_at
+            ON user_sessions (expires_at)''',
+        # Covering index for the revocation refresh (index-only scan); it
+        # replaces the plain revoked_at index from migration 2
+        '''CREATE INDEX IF NOT EXISTS idx_session_revocations_live
+            ON session_revocations (revoked_at) INCLUDE (session_token, expires_at)
+            WHERE expires_at IS NOT NULL''',
+        'DROP INDEX IF EXISTS idx_session_revocations_revoked_at',
+        '''CREATE INDEX IF NOT EXISTS idx_users_created_at
+            ON users (created_at DESC, id DESC)''',
+        '''CREATE INDEX IF NOT EXISTS idx_posts_created_at
+            ON posts (created_at)''',
+        '''CREATE INDEX IF NOT EXISTS idx_posts_user_created
+            ON posts (user_id, created_at DESC)''',
+        '''CREATE INDEX IF NOT EXISTS idx_posts_wordpress_id
+            ON posts (wordpress_id) WHERE wordpress_id IS NOT NULL''',
+    ]),
+    (4, 'partition activity_logs by month', [
+        'ALTER TABLE activity_logs RENAME TO activity_logs_legacy',
+        'DROP INDEX IF EXISTS idx_activity_logs_user_created',
+        # Keep the id sequence alive when the legacy table is dropped
+        'ALTER SEQUENCE activity_logs_id_seq OWNED BY NONE',
+        '''CREATE TABLE activity_logs (
+            id INTEGER NOT NULL DEFAULT nextval('activity_logs_id_seq'),
+            user_id INTEGER REFERENCES users (id),
+            action VARCHAR(255) NOT NULL,
+            details TEXT,
+            ip_address VARCHAR(255),
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)''',
+        'ALTER SEQUENCE activity_logs_id_seq OWNED BY activity_logs.id',
+        '''CREATE INDEX IF NOT EXISTS idx_activity_logs_user_created
+            ON activity_logs (user_id, created_at DESC)''',
+        # Catches rows for months whose partition has not been created yet
+        'CREATE TABLE activity_logs_default PARTITION OF activity_logs DEFAULT',
+        # One partition per month from the oldest existing row to next month
+        '''DO $$
+        DECLARE
+            part_start DATE;
+        BEGIN
+            SELECT date_trunc('month', COALESCE(min(created_at), CURRENT_TIMESTAMP))
+              INTO part_start FROM activity_logs_legacy;
+            WHILE part_start <= date_trunc('month', CURRENT_TIMESTAMP) + INTERVAL '1 month' LOOP
+                EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF activity_logs FOR VALUES FROM (%L) TO (%L)',
+                               'activity_logs_' || to_char(part_start, 'YYYY_MM'), part_start, part_start + INTERVAL '1 month');
+                part_start := part_start + INTERVAL '1 month';
+            END LOOP;
+        END $$''',
+        '''INSERT INTO activity_logs (id, user_id, action, details, ip_address, created_at)
+            SELECT id, user_id, action, details, ip_address, COALESCE(created_at, CURRENT_TIMESTAMP)
+            FROM activity_logs_legacy''',
+        'DROP TABLE activity_logs_legacy',
+    ]),
+    (5, 'keyword ranking cache', [
+        # One SEMrush lookup per keyword, database and day
+        '''CREATE TABLE IF NOT EXISTS keyword_ranking_cache (
+            keyword TEXT NOT NULL,
+            database VARCHAR(16) NOT NULL,
+            day DATE NOT NULL,
+            result JSONB NOT NULL,
+            fetched_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (keyword, database, day)
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_keyword_ranking_cache_day
+            ON keyword_ranking_cache (day)''',
+    ]),
+    (6, 'keyword ranking history and daily rollups', [
+        # Keywords are stored once; history rows carry only a small integer id
+        '''CREATE TABLE IF NOT EXISTS tracked_keywords (
+            id SERIAL PRIMARY KEY,
+            keyword TEXT NOT NULL,
+            database VARCHAR(16) NOT NULL,
+            UNIQUE (keyword, database)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS keyword_ranking_history (
+            keyword_id INTEGER NOT NULL REFERENCES tracked_keywords (id) ON DELETE CASCADE,
+            captured_at TIMESTAMP NOT NULL,
+            position SMALLINT NOT NULL,
+            search_volume INTEGER,
+            cpc REAL,
+            PRIMARY KEY (keyword_id, captured_at)
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_keyword_ranking_history_captured_at
+            ON keyword_ranking_history (captured_at)''',
+        # Position 0 means "not ranking" and is excluded from the position stats
+        '''CREATE TABLE IF NOT EXISTS keyword_ranking_daily (
+            keyword_id INTEGER NOT NULL REFERENCES tracked_keywords (id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            samples INTEGER NOT NULL,
+            best_position SMALLINT,
+            worst_position SMALLINT,
+            avg_position REAL,
+            last_position SMALLINT NOT NULL,
+            search_volume INTEGER,
+            PRIMARY KEY (keyword_id, day)
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_keyword_ranking_daily_day
+            ON keyword_ranking_daily (day)''',
+    ]),
+    (7, 'organic keyword ingestion checkpoints', [
+        '''CREATE TABLE IF NOT EXISTS organic_ingest_checkpoints (
+            domain TEXT NOT NULL,
+            database VARCHAR(16) NOT NULL,
+            next_offset INTEGER NOT NULL DEFAULT 0,
+            rows_ingested INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP,
+            PRIMARY KEY (domain, database)
+        )''',
+    ]),
+    (8, 're-optimization run checkpoints', [
+        '''CREATE TABLE IF NOT EXISTS reoptimization_checkpoints (
+            run_key VARCHAR(32) NOT NULL,
+            post_id INTEGER NOT NULL,
+            status VARCHAR(16) NOT NULL,
+            stage VARCHAR(16),
+            error TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (run_key, post_id)
+        )''',
+    ]),
+    (9, 'background jobs', [
+        '''CREATE TABLE IF NOT EXISTS jobs (
+            id BIGSERIAL PRIMARY KEY,
+            kind VARCHAR(32) NOT NULL,
+            tenant VARCHAR(64) NOT NULL DEFAULT 'default',
+            priority SMALLINT NOT NULL DEFAULT 0,
+            status VARCHAR(16) NOT NULL DEFAULT 'queued',
+            payload JSONB NOT NULL DEFAULT '{}',
+            result JSONB,
+            progress JSONB,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            locked_by VARCHAR(64),
+            locked_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        # Workers only ever scan ready jobs; keep that index small
+        """CREATE INDEX IF NOT EXISTS idx_jobs_ready
+            ON jobs (priority DESC, run_after, id) WHERE status = 'queued'""",
+        """CREATE INDEX IF NOT EXISTS idx_jobs_running
+            ON jobs (tenant, locked_at) WHERE status = 'running'""",
+        '''CREATE INDEX IF NOT EXISTS idx_jobs_finished_at
+            ON jobs (finished_at) WHERE finished_at IS NOT NULL''',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Return the highest applied migration version (0 for a fresh database)"""
+    c = conn.cursor()
+    try:
+        c.execute('SELECT max(version) FROM schema_migrations')
+    except errors.UndefinedTable:
+        conn.rollback()
+        return 0
+    row = c.fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn):
+    """Apply all pending migrations in a single transaction.
+
+    Returns the list of versions applied. The caller is responsible for
+    committing; on error the transaction is left for the caller to roll back.
+    """
+    c = conn.cursor()
+    c.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATION_LOCK_ID,))
+    c.execute('''CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+
+    # Re-read under the lock: another worker may have migrated meanwhile
+    c.execute('SELECT max(version) FROM schema_migrations')
+    current = c.fetchone()[0] or 0
+
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        for statement in statements:
+            c.execute(statement)
+        c.execute('INSERT INTO schema_migrations (version, description) VALUES (%s, %s)',
+                  (version, description))
+        applied.append(version)
+        logger.info(f"Applied schema migration {version}: {description}")
+
+    return applied
+
+
+if __name__ == '__main__':
+    # Deploy-time entry point: python -m app.migrations
+    from app.utils.logger import setup_logger
+    from app.models import db_manager
+    setup_logger()
+    if not db_manager.init_database(auto_migrate=True):
+        raise SystemExit(1)
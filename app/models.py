@@ -1,144 +1,172 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
-import bcrypt
-from flask import request
+from psycopg2.extras import Json, RealDictCursor, execute_values
+from flask import request, has_request_context
+import base64
+import csv
+import io
+import json
 import jwt
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from app.utils.logger import get_logger
+from app.utils.db_pool import ConnectionPool
+from app.utils.cache import CacheInvalidationListener, cache_from_env
+from app.utils.session_revocation import RevocationList
+from app.utils.activity_log import ActivityLogWriter
+from app.utils.passwords import PasswordHasher, PasswordHasherBusy
+from app.migrations import LATEST_VERSION, apply_migrations, get_schema_version
 from urllib.parse import urlparse
 
 logger = get_logger()
 
 class DatabaseManager:
+    # Pools are shared per DSN so every manager in the process borrows from
+    # the same set of connections.
+    _pools = {}
+    _pools_lock = threading.Lock()
+    _schema_ready = {}
+
     def __init__(self):
         from dotenv import load_dotenv
         load_dotenv()  # Load environment variables
         self.database_url = os.getenv('DATABASE_URL')
         if not self.database_url:
             logger.warning("DATABASE_URL environment variable is not set. Database operations will be disabled.")
-            return
-        try:
-            self.init_database()
-        except Exception as e:
-            logger.error(f"Failed to initialize database: {str(e)}")
-            # Don't raise exception to allow app to start even if DB is not ready
-            pass
 
     def test_connection(self):
         """Test database connection"""
         try:
-            conn = self.get_connection()
-            c = conn.cursor()
-            c.execute('SELECT 1')
-            conn.close()
+            with self.connection() as conn:
+                c = conn.cursor()
+                c.execute('SELECT 1')
             return True
         except Exception as e:
             logger.error(f"Database connection test failed: {str(e)}")
             return False
 
     def get_connection(self):
+        """Open a dedicated, unpooled connection (caller must close it)"""
         if not self.database_url:
             raise ValueError("Database URL is not configured")
         return psycopg2.connect(self.database_url)
 
-    def init_database(self):
-        """Initialize all database tables"""
-        conn = None
-        try:
-            conn = self.get_connection()
-            c = conn.cursor()
+    @property
+    def pool(self):
+        """Process-wide connection pool for this database URL"""
+        if not self.database_url:
+            raise ValueError("Database URL is not configured")
+        pool = DatabaseManager._pools.get(self.database_url)
+        if pool is None:
+            with DatabaseManager._pools_lock:
+                pool = DatabaseManager._pools.get(self.database_url)
+                if pool is None:
+                    pool = ConnectionPool.from_env(self.database_url)
+                    DatabaseManager._pools[self.database_url] = pool
+        return pool
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection; commits on success, rolls back on error"""
+        with self.pool.connection() as conn:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+
+    def pool_stats(self):
+        """Pool hit/miss and wait-time counters"""
+        if not self.database_url:
+            return {}
+        return self.pool.stats()
+
+    def bulk_upsert(self, cursor, table, columns, rows, conflict_columns,
+                    update_columns=None, touch_column=None, page_size=1000):
+        """Insert or update many rows with one INSERT ... ON CONFLICT statement.
+
+        Table and column names are interpolated directly and must come from
+        code, never from user input. Rows sharing a conflict key are collapsed
+        (last one wins) because Postgres refuses to update the same row twice
+        in one statement. Returns the number of rows sent.
+        """
+        if not rows:
+            return 0
+
+        key_positions = [columns.index(col) for col in conflict_columns]
+        unique_rows = {}
+        for row in rows:
+            unique_rows[tuple(row[i] for i in key_positions)] = tuple(row)
+        rows = list(unique_rows.values())
+
+        if update_columns is None:
+            update_columns = [col for col in columns if col not in conflict_columns]
+        assignments = [f"{col} = EXCLUDED.{col}" for col in update_columns]
+        if touch_column:
+            assignments.append(f"{touch_column} = CURRENT_TIMESTAMP")
+
+        query = (f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s "
+                 f"ON CONFLICT ({', '.join(conflict_columns)}) ")
+        query += f"DO UPDATE SET {', '.join(assignments)}" if assignments else "DO NOTHING"
+
+        execute_values(cursor, query, rows, page_size=page_size)
+        return len(rows)
+
+    def notify_invalidation(self, cursor, cache_name, key):
+        """Tell other workers to drop a cache entry once this transaction commits"""
+        channel = os.getenv('CACHE_INVALIDATION_CHANNEL')
+        if channel:
+            cursor.execute('SELECT pg_notify(%s, %s)', (channel, f"{cache_name}:{key}"))
+
+    def init_database(self, auto_migrate=None):
+        """Bring the schema up to date, at most once per process.
+
+        When the schema is already current this costs a single version query.
+        Set DB_AUTO_MIGRATE=false to only check the version at boot and apply
+        migrations out of band with ``python -m app.migrations``.
+        """
+        if not self.database_url:
+            return False
+        if DatabaseManager._schema_ready.get(self.database_url):
+            return True
 
-            # Users table
-            c.execute('''CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(255) UNIQUE NOT NULL,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                role VARCHAR(50) DEFAULT 'user',
-                is_active BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP,
-                api_calls_count INTEGER DEFAULT 0,
-                subscription_plan VARCHAR(50) DEFAULT 'free'
-            )''')
-
-            # User API Keys table
-            c.execute('''CREATE TABLE IF NOT EXISTS user_api_keys (
-                  id SERIAL PRIMARY KEY,
-                  user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
-                  service_name VARCHAR(255) NOT NULL,
-                  api_key TEXT NOT NULL,
-                  is_active BOOLEAN DEFAULT TRUE,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  last_used TIMESTAMP,
-                  usage_count INTEGER DEFAULT 0,
-                  UNIQUE(user_id, service_name)
-              )''')
-
-            # Posts table (existing) - updated to include user_id
-            c.execute('''CREATE TABLE IF NOT EXISTS posts (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users (id),
-                wordpress_id INTEGER,
-                title TEXT,
-                content TEXT,
-                keywords TEXT,
-                status VARCHAR(50) DEFAULT 'draft',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )''')
-
-            # User Sessions
-            c.execute('''CREATE TABLE IF NOT EXISTS user_sessions (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
-                session_token TEXT UNIQUE NOT NULL,
-                ip_address VARCHAR(255),
-                user_agent TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP,
-                is_active BOOLEAN DEFAULT TRUE
-            )''')
-
-            # User Settings
-            c.execute('''CREATE TABLE IF NOT EXISTS user_settings (
-                  id SERIAL PRIMARY KEY,
-                  user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
-                  setting_key VARCHAR(255) NOT NULL,
-                  setting_value TEXT,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  UNIQUE(user_id, setting_key)
-              )''')
-
-            # Activity Logs
-            c.execute('''CREATE TABLE IF NOT EXISTS activity_logs (
-                  id SERIAL PRIMARY KEY,
-                  user_id INTEGER REFERENCES users (id),
-                  action VARCHAR(255) NOT NULL,
-                  details TEXT,
-                  ip_address VARCHAR(255),
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-              )''')
-
-            conn.commit()
-            logger.info("Database initialized successfully")
-
-            # Test the connection after initialization
-            self.test_connection()
+        if auto_migrate is None:
+            auto_migrate = os.getenv('DB_AUTO_MIGRATE', 'true').lower() != 'false'
+
+        try:
+            with self.connection() as conn:
+                version = get_schema_version(conn)
+                if version < LATEST_VERSION:
+                    if not auto_migrate:
+                        logger.warning(f"Database schema is at version {version}, expected {LATEST_VERSION}. "
+                                       "Run 'python -m app.migrations' to upgrade.")
+                        return False
+                    applied = apply_migrations(conn)
+                    if applied:
+                        logger.info(f"Database schema migrated to version {applied[-1]}")
+
+            DatabaseManager._schema_ready[self.database_url] = True
+            return True
 
         except Exception as e:
             logger.error(f"Failed to initialize database: {str(e)}")
             # Don't raise exception to allow app to start even if DB is not ready
-        finally:
-            if conn:
-                conn.close()
+            return False
 
 class UserManager:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db=None, activity_writer=None, hasher=None):
+        self.db = db or db_manager
+        self.hasher = hasher or password_hasher
+        # Activity and last-login writes go through a write-behind queue
+        # unless ACTIVITY_LOG_ASYNC=false
+        if activity_writer is None and os.getenv('ACTIVITY_LOG_ASYNC', 'true').lower() != 'false':
+            activity_writer = ActivityLogWriter.from_env(self.db)
+        self.activity_writer = activity_writer
 
     def _check_db_connection(self):
         """Check if database is configured"""
@@ -152,30 +180,31 @@ class UserManager:
             return {'error': 'Database not configured'}
 
         try:
-            conn = self.db.get_connection()
-            c = conn.cursor()
+            # Hash before checking out a connection so a slow hash never
+            # holds one from the pool
+            password_hash = self.hasher.hash(password)
 
-            # Check if user already exists
-            c.execute('SELECT id FROM users WHERE username = %s OR email = %s', (username, email))
-            if c.fetchone():
-                return {'error': 'User already exists'}
+            with self.db.connection() as conn:
+                c = conn.cursor()
 
-            # Hash password
-            password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+                # Check if user already exists
+                c.execute('SELECT id FROM users WHERE username = %s OR email = %s', (username, email))
+                if c.fetchone():
+                    return {'error': 'User already exists'}
 
-            # Create user
-            c.execute('''INSERT INTO users (username, email, password_hash, role, subscription_plan)
-                        VALUES (%s, %s, %s, %s, %s)
-                        RETURNING id''',
-                     (username, email, password_hash, role, subscription_plan))
+                # Create user
+                c.execute('''INSERT INTO users (username, email, password_hash, role, subscription_plan)
+                            VALUES (%s, %s, %s, %s, %s)
+                            RETURNING id''',
+                         (username, email, password_hash, role, subscription_plan))
 
-            user_id = c.fetchone()[0]
-            conn.commit()
-            conn.close()
+                user_id = c.fetchone()[0]
 
             logger.info(f"User created: {username} (ID: {user_id})")
             return {'success': True, 'user_id': user_id}
 
+        except PasswordHasherBusy as e:
+            return {'error': str(e), 'retry_after': e.retry_after}
         except Exception as e:
             logger.error(f"Error creating user: {str(e)}")
             return {'error': str(e)}
@@ -186,15 +215,14 @@ class UserManager:
             return {'error': 'Database not configured'}
 
         try:
-            conn = self.db.get_connection()
-            c = conn.cursor()
+            with self.db.connection() as conn:
+                c = conn.cursor()
 
-            c.execute('''SELECT id, username, email, password_hash, role, is_active
-                        FROM users WHERE (username = %s OR email = %s) AND is_active = TRUE''',
-                     (username_or_email, username_or_email))
+                c.execute('''SELECT id, username, email, password_hash, role, is_active
+                            FROM users WHERE (username = %s OR email = %s) AND is_active = TRUE''',
+                         (username_or_email, username_or_email))
 
-            user = c.fetchone()
-            conn.close()
+                user = c.fetchone()
 
             if not user:
                 return {'error': 'User not found'}
@@ -202,12 +230,15 @@ class UserManager:
             user_id, username, email, password_hash, role, is_active = user
 
             # Verify password
-            if bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8')):
+            if self.hasher.verify(password, password_hash):
+                if self.hasher.needs_rehash(password_hash):
+                    self._rehash_password(user_id, password)
+
                 # Update last login
                 self.update_last_login(user_id)
 
                 # Log activity
-                remote_addr = request.remote_addr if 'request' in globals() else "unknown"
+                remote_addr = self._remote_addr()
                 self.log_activity(user_id, 'login', f'User logged in from {remote_addr}')
 
                 return {
@@ -222,18 +253,35 @@ class UserManager:
             else:
                 return {'error': 'Invalid password'}
 
+        except PasswordHasherBusy as e:
+            logger.warning("Password hashing pool saturated, rejecting login")
+            return {'error': str(e), 'retry_after': e.retry_after}
         except Exception as e:
             logger.error(f"Error authenticating user: {str(e)}")
             return {'error': str(e)}
 
+    def _rehash_password(self, user_id, password):
+        """Upgrade a hash made with an old BCRYPT_ROUNDS once the password is known"""
+        try:
+            password_hash = self.hasher.hash(password)
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute('UPDATE users SET password_hash = %s WHERE id = %s', (password_hash, user_id))
+            self.hasher.record_rehash()
+        except Exception as e:
+            # The login already succeeded; try again next time
+            logger.warning(f"Error rehashing password for user {user_id}: {str(e)}")
+
     def update_last_login(self, user_id):
         """Update user's last login timestamp"""
+        if self.activity_writer:
+            self.activity_writer.touch_last_login(user_id)
+            return
+
         try:
-            conn = self.db.get_connection()
-            c = conn.cursor()
-            c.execute('UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = %s', (user_id,))
-            conn.commit()
-            conn.close()
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute('UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = %s', (user_id,))
         except Exception as e:
             logger.error(f"Error updating last login: {str(e)}")
 
@@ -243,52 +291,121 @@ class UserManager:
             return None
 
         try:
-            conn = self.db.get_connection()
-            c = conn.cursor()
-            c.execute('SELECT id, username, email, role, is_active, created_at, last_login, subscription_plan FROM users WHERE id = %s', (user_id,))
-            user = c.fetchone()
-            conn.close()
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute(f'SELECT {self.USER_COLUMNS} FROM users WHERE id = %s', (user_id,))
+                user = c.fetchone()
 
             if user:
-                return {
-                    'id': user[0],
-                    'username': user[1],
-                    'email': user[2],
-                    'role': user[3],
-                    'is_active': user[4],
-                    'created_at': user[5],
-                    'last_login': user[6],
-                    'subscription_plan': user[7]
-                }
+                return self._user_from_row(user)
             return None
 
         except Exception as e:
             logger.error(f"Error getting user: {str(e)}")
             return None
 
-    def get_all_users(self):
-        """Get all users"""
+    USER_COLUMNS = 'id, username, email, role, is_active, created_at, last_login, subscription_plan'
+
+    @staticmethod
+    def _user_from_row(user):
+        return {
+            'id': user[0],
+            'username': user[1],
+            'email': user[2],
+            'role': user[3],
+            'is_active': user[4],
+            'created_at': user[5],
+            'last_login': user[6],
+            'subscription_plan': user[7]
+        }
+
+    @staticmethod
+    def encode_user_cursor(user):
+        """Opaque keyset cursor pointing just after ``user``"""
+        raw = json.dumps([user['created_at'].isoformat(), user['id']])
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def decode_user_cursor(cursor):
+        try:
+            created_at, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return datetime.fromisoformat(created_at), int(user_id)
+        except (ValueError, TypeError, UnicodeError):
+            raise ValueError('Invalid cursor')
+
+    @staticmethod
+    def _user_filters(role=None, is_active=None, subscription_plan=None, search=None):
+        clauses, params = [], []
+        if role:
+            clauses.append('role = %s')
+            params.append(role)
+        if is_active is not None:
+            clauses.append('is_active = %s')
+            params.append(is_active)
+        if subscription_plan:
+            clauses.append('subscription_plan = %s')
+            params.append(subscription_plan)
+        if search:
+            pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            clauses.append('(username ILIKE %s OR email ILIKE %s)')
+            params.extend([pattern, pattern])
+        return clauses, params
+
+    def list_users(self, limit=50, after=None, **filters):
+        """One page of users, newest first, using keyset pagination.
+
+        ``after`` is the ``next_cursor`` of the previous page. Each page is an
+        index range scan on (created_at DESC, id DESC), so latency does not
+        grow with the page number. Filters: role, is_active,
+        subscription_plan, search (matches username or email).
+        """
         if not self._check_db_connection():
-            return []
+            return {'users': [], 'next_cursor': None}
 
-        try:
-            conn = self.db.get_connection()
+        clauses, params = self._user_filters(**filters)
+        if after:
+            clauses.append('(created_at, id) < (%s, %s)')
+            params.extend(self.decode_user_cursor(after))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        with self.db.connection() as conn:
             c = conn.cursor()
-            c.execute('SELECT id, username, email, role, is_active, created_at, last_login, subscription_plan FROM users ORDER BY created_at DESC')
-            users = c.fetchall()
-            conn.close()
-
-            return [{
-                'id': user[0],
-                'username': user[1],
-                'email': user[2],
-                'role': user[3],
-                'is_active': user[4],
-                'created_at': user[5],
-                'last_login': user[6],
-                'subscription_plan': user[7]
-            } for user in users]
+            # Fetch one extra row to know whether another page exists
+            c.execute(f'''SELECT {self.USER_COLUMNS} FROM users {where}
+                         ORDER BY created_at DESC, id DESC LIMIT %s''', params + [limit + 1])
+            rows = c.fetchall()
+
+        users = [self._user_from_row(row) for row in rows[:limit]]
+        next_cursor = self.encode_user_cursor(users[-1]) if len(rows) > limit else None
+        return {'users': users, 'next_cursor': next_cursor}
+
+    def iter_users(self, batch_size=1000, **filters):
+        """Yield every matching user through a server-side cursor.
+
+        Rows are fetched ``batch_size`` at a time, so memory stays flat
+        however many users there are. The pooled connection is held until
+        the generator is exhausted or closed.
+        """
+        if not self._check_db_connection():
+            return
+
+        clauses, params = self._user_filters(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self.db.connection() as conn:
+            c = conn.cursor(name='iter_users')
+            c.itersize = batch_size
+            c.execute(f'''SELECT {self.USER_COLUMNS} FROM users {where}
+                         ORDER BY created_at DESC, id DESC''', params)
+            try:
+                for row in c:
+                    yield self._user_from_row(row)
+            finally:
+                c.close()
 
+    def get_all_users(self):
+        """Get all users (prefer list_users / iter_users for large tables)"""
+        try:
+            return list(self.iter_users())
         except Exception as e:
             logger.error(f"Error getting all users: {str(e)}")
             return []
@@ -296,24 +413,22 @@ class UserManager:
     def update_user(self, user_id, updates):
         """Update user information"""
         try:
-            conn = self.db.get_connection()
-            c = conn.cursor()
+            with self.db.connection() as conn:
+                c = conn.cursor()
 
-            update_fields = []
-            values = []
+                update_fields = []
+                values = []
 
-            for field, value in updates.items():
-                if field in ['username', 'email', 'role', 'is_active', 'subscription_plan']:
-                    update_fields.append(f"{field} = %s")
-                    values.append(value)
+                for field, value in updates.items():
+                    if field in ['username', 'email', 'role', 'is_active', 'subscription_plan']:
+                        update_fields.append(f"{field} = %s")
+                        values.append(value)
 
-            if update_fields:
-                query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = %s"
-                values.append(user_id)
-                c.execute(query, tuple(values))
-                conn.commit()
+                if update_fields:
+                    query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = %s"
+                    values.append(user_id)
+                    c.execute(query, tuple(values))
 
-            conn.close()
             logger.info(f"User updated: {user_id}")
             return {'success': True}
 
@@ -324,26 +439,38 @@ class UserManager:
     def delete_user(self, user_id):
         """Delete user"""
         try:
-            conn = self.db.get_connection()
-            c = conn.cursor()
-
-            # Check if user exists
-            c.execute('SELECT id FROM users WHERE id = %s', (user_id,))
-            if not c.fetchone():
-                return {'error': 'User not found'}
-
-            # Delete related records first (cascade delete)
-            c.execute('DELETE FROM user_api_keys WHERE user_id = %s', (user_id,))
-            c.execute('DELETE FROM user_sessions WHERE user_id = %s', (user_id,))
-            c.execute('DELETE FROM activity_logs WHERE user_id = %s', (user_id,))
-            # Note: posts table doesn't have user_id column, skip it
-
-            # Delete the user
-            c.execute('DELETE FROM users WHERE id = %s', (user_id,))
-            deleted = c.rowcount > 0
-
-            conn.commit()
-            conn.close()
+            with self.db.connection() as conn:
+                c = conn.cursor()
+
+                # Check if user exists
+                c.execute('SELECT id FROM users WHERE id = %s', (user_id,))
+                if not c.fetchone():
+                    return {'error': 'User not found'}
+
+                # Delete related records first (cascade delete)
+                c.execute('DELETE FROM user_api_keys WHERE user_id = %s', (user_id,))
+                # Stateless session validation only sees revocations, so
+                # tombstone the user's live sessions before removing them
+                c.execute('''DELETE FROM user_sessions WHERE user_id = %s
+                            RETURNING session_token, expires_at, is_active''', (user_id,))
+                live_sessions = [(token, expires_at) for token, expires_at, is_active in c.fetchall() if is_active]
+                if live_sessions:
+                    execute_values(c, '''INSERT INTO session_revocations (session_token, expires_at)
+                                       VALUES %s ON CONFLICT (session_token) DO NOTHING''', live_sessions)
+                c.execute('DELETE FROM activity_logs WHERE user_id = %s', (user_id,))
+                # Posts stay (they are live in WordPress) but lose their owner
+                c.execute('UPDATE posts SET user_id = NULL WHERE user_id = %s', (user_id,))
+
+                # Delete the user
+                c.execute('DELETE FROM users WHERE id = %s', (user_id,))
+                deleted = c.rowcount > 0
+
+                self.db.notify_invalidation(c, 'api_keys', user_id)
+                self.db.notify_invalidation(c, 'user_settings', user_id)
+            api_key_cache.invalidate(user_id)
+            user_settings_cache.invalidate(user_id)
+            for session_token, expires_at in live_sessions:
+                session_manager.revocations.revoke(session_token, expires_at)
 
             if deleted:
                 logger.info(f"User deleted: {user_id}")
@@ -355,22 +482,28 @@ class UserManager:
             logger.error(f"Error deleting user: {str(e)}")
             return {'error': str(e)}
 
+    def _remote_addr(self):
+        return request.remote_addr if has_request_context() else 'unknown'
+
     def log_activity(self, user_id, action, details=''):
         """Log user activity"""
+        if self.activity_writer:
+            self.activity_writer.log(user_id, action, details, self._remote_addr())
+            return
+
         try:
-            conn = self.db.get_connection()
-            c = conn.cursor()
-            c.execute('''INSERT INTO activity_logs (user_id, action, details, ip_address)
-                        VALUES (%s, %s, %s, %s)''',
-                     (user_id, action, details, request.remote_addr if 'request' in globals() else 'unknown'))
-            conn.commit()
-            conn.close()
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute('''INSERT INTO activity_logs (user_id, action, details, ip_address)
+                            VALUES (%s, %s, %s, %s)''',
+                         (user_id, action, details, self._remote_addr()))
         except Exception as e:
             logger.error(f"Error logging activity: {str(e)}")
 
 class UserSettingsManager:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db=None, cache=None):
+        self.db = db or db_manager
+        self.cache = cache or user_settings_cache
 
     def _check_db_connection(self):
         """Check if database is configured"""
@@ -378,19 +511,31 @@ class UserSettingsManager:
             return False
         return True
 
+    def _load_user_settings(self, user_id):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('SELECT setting_key, setting_value FROM user_settings WHERE user_id = %s', (user_id,))
+            settings = c.fetchall()
+
+        return {setting[0]: setting[1] for setting in settings}
+
+    def _upsert_settings(self, cursor, user_id, settings_dict):
+        self.db.bulk_upsert(
+            cursor,
+            'user_settings',
+            ('user_id', 'setting_key', 'setting_value'),
+            [(user_id, key, value) for key, value in settings_dict.items()],
+            ('user_id', 'setting_key'),
+            touch_column='updated_at'
+        )
+
     def get_user_settings(self, user_id):
         """Get user settings"""
         if not self._check_db_connection():
             return {}
 
         try:
-            conn = self.db.get_connection()
-            c = conn.cursor()
-            c.execute('SELECT setting_key, setting_value FROM user_settings WHERE user_id = %s', (user_id,))
-            settings = c.fetchall()
-            conn.close()
-
-            return {setting[0]: setting[1] for setting in settings}
+            return dict(self.cache.get_or_load(user_id, lambda: self._load_user_settings(user_id)))
         except Exception as e:
             logger.error(f"Error getting user settings: {str(e)}")
             return {}
@@ -401,24 +546,11 @@ class UserSettingsManager:
             return {'error': 'Database not configured'}
 
         try:
-            conn = self.db.get_connection()
-            c = conn.cursor()
-
-            # Check if setting exists
-            c.execute('SELECT id FROM user_settings WHERE user_id = %s AND setting_key = %s', (user_id, setting_key))
-            existing = c.fetchone()
-
-            if existing:
-                # Update existing setting
-                c.execute('UPDATE user_settings SET setting_value = %s WHERE user_id = %s AND setting_key = %s',
-                         (setting_value, user_id, setting_key))
-            else:
-                # Insert new setting
-                c.execute('INSERT INTO user_settings (user_id, setting_key, setting_value) VALUES (%s, %s, %s)',
-                         (user_id, setting_key, setting_value))
-
-            conn.commit()
-            conn.close()
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                self._upsert_settings(c, user_id, {setting_key: setting_value})
+                self.db.notify_invalidation(c, 'user_settings', user_id)
+            self.cache.invalidate(user_id)
 
             logger.info(f"User setting updated: {setting_key} for user {user_id}")
             return {'success': True}
@@ -433,25 +565,13 @@ class UserSettingsManager:
             return {'error': 'Database not configured'}
 
         try:
-            conn = self.db.get_connection()
-            c = conn.cursor()
-
-            for setting_key, setting_value in settings_dict.items():
-                # Check if setting exists
-                c.execute('SELECT id FROM user_settings WHERE user_id = %s AND setting_key = %s', (user_id, setting_key))
-                existing = c.fetchone()
-
-                if existing:
-                    # Update existing setting
-                    c.execute('UPDATE user_settings SET setting_value = %s WHERE user_id = %s AND setting_key = %s',
-                             (setting_value, user_id, setting_key))
-                else:
-                    # Insert new setting
-                    c.execute('INSERT INTO user_settings (user_id, setting_key, setting_value) VALUES (%s, %s, %s)',
-                             (user_id, setting_key, setting_value))
-
-            conn.commit()
-            conn.close()
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                # One INSERT ... ON CONFLICT for the whole form instead of a
+                # SELECT plus UPDATE/INSERT per key
+                self._upsert_settings(c, user_id, settings_dict)
+                self.db.notify_invalidation(c, 'user_settings', user_id)
+            self.cache.invalidate(user_id)
 
             logger.info(f"Bulk user settings updated for user {user_id}")
             return {'success': True}
@@ -461,8 +581,9 @@ class UserSettingsManager:
             return {'error': str(e)}
 
 class APIKeyManager:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db=None, cache=None):
+        self.db = db or db_manager
+        self.cache = cache or api_key_cache
 
     def _check_db_connection(self):
         """Check if database is configured"""
@@ -470,33 +591,40 @@ class APIKeyManager:
             return False
         return True
 
+    def _load_user_api_keys(self, user_id):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''SELECT service_name, api_key, is_active, created_at, last_used, usage_count
+                        FROM user_api_keys WHERE user_id = %s''', (user_id,))
+            keys = c.fetchall()
+
+        return [{
+            'service_name': key[0],
+            'api_key': key[1],
+            'is_active': key[2],
+            'created_at': key[3],
+            'last_used': key[4],
+            'usage_count': key[5]
+        } for key in keys]
+
     def set_user_api_key(self, user_id, service_name, api_key):
         """Set API key for a specific user"""
         if not self._check_db_connection():
             return {'error': 'Database not configured'}
 
         try:
-            conn = self.db.get_connection()
-            c = conn.cursor()
-
-            # Check if key already exists
-            c.execute('''SELECT id FROM user_api_keys
-                        WHERE user_id = %s AND service_name = %s''', (user_id, service_name))
-
-            existing = c.fetchone()
-
-            if existing:
-                # Update existing key
-                c.execute('''UPDATE user_api_keys SET api_key = %s
-                            WHERE user_id = %s AND service_name = %s''',
-                         (api_key, user_id, service_name))
-            else:
-                # Insert new key
-                c.execute('''INSERT INTO user_api_keys (user_id, service_name, api_key)
-                           VALUES (%s, %s, %s)''', (user_id, service_name, api_key))
-
-            conn.commit()
-            conn.close()
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                self.db.bulk_upsert(
+                    c,
+                    'user_api_keys',
+                    ('user_id', 'service_name', 'api_key'),
+                    [(user_id, service_name, api_key)],
+                    ('user_id', 'service_name'),
+                    touch_column='updated_at'
+                )
+                self.db.notify_invalidation(c, 'api_keys', user_id)
+            self.cache.invalidate(user_id)
 
             logger.info(f"User API key set: {service_name} for user {user_id}")
             return {'success': True}
@@ -511,31 +639,49 @@ class APIKeyManager:
             return []
 
         try:
-            conn = self.db.get_connection()
-            c = conn.cursor()
-            c.execute('''SELECT service_name, api_key, is_active, created_at, last_used, usage_count
-                        FROM user_api_keys WHERE user_id = %s''', (user_id,))
-            keys = c.fetchall()
-            conn.close()
-
-            return [{
-                'service_name': key[0],
-                'api_key': key[1],
-                'is_active': key[2],
-                'created_at': key[3],
-                'last_used': key[4],
-                'usage_count': key[5]
-            } for key in keys]
+            keys = self.cache.get_or_load(user_id, lambda: self._load_user_api_keys(user_id))
+            return [dict(key) for key in keys]
 
         except Exception as e:
             logger.error(f"Error getting user API keys: {str(e)}")
             return []
 
+    def delete_user_api_key(self, user_id, service_name):
+        """Delete a user's API key for a service"""
+        if not self._check_db_connection():
+            return {'error': 'Database not configured'}
+
+        try:
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute('DELETE FROM user_api_keys WHERE user_id = %s AND service_name = %s',
+                          (user_id, service_name))
+                deleted = c.rowcount > 0
+
+                self.db.notify_invalidation(c, 'api_keys', user_id)
+            self.cache.invalidate(user_id)
+
+            if not deleted:
+                return {'error': 'API key not found'}
+
+            logger.info(f"User API key deleted: {service_name} for user {user_id}")
+            return {'success': True}
+
+        except Exception as e:
+            logger.error(f"Error deleting user API key: {str(e)}")
+            return {'error': str(e)}
+
 
 class SessionManager:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db=None, revocations=None):
+        self.db = db or db_manager
         self.jwt_secret = os.getenv('JWT_SECRET_KEY', 'your-jwt-secret-key')
+        # 'stateless' trusts the signed JWT and only consults the in-memory
+        # revocation list; 'database' checks user_sessions on every call
+        self.validation_mode = os.getenv('SESSION_VALIDATION_MODE', 'stateless')
+        if revocations is None:
+            revocations = RevocationList(refresh_interval=float(os.getenv('SESSION_REVOCATION_REFRESH', 30)))
+        self.revocations = revocations
 
     def _check_db_connection(self):
         """Check if database is configured"""
@@ -561,16 +707,13 @@ class SessionManager:
             }
             jwt_token = jwt.encode(payload, self.jwt_secret, algorithm='HS256')
 
-            conn = self.db.get_connection()
-            c = conn.cursor()
+            with self.db.connection() as conn:
+                c = conn.cursor()
 
-            expires_at = datetime.now() + timedelta(days=7)
-            c.execute('''INSERT INTO user_sessions (user_id, session_token, ip_address, user_agent, expires_at)
-                        VALUES (%s, %s, %s, %s, %s)''',
-                     (user_id, session_token, ip_address, user_agent, expires_at))
-
-            conn.commit()
-            conn.close()
+                expires_at = datetime.now() + timedelta(days=7)
+                c.execute('''INSERT INTO user_sessions (user_id, session_token, ip_address, user_agent, expires_at)
+                            VALUES (%s, %s, %s, %s, %s)''',
+                         (user_id, session_token, ip_address, user_agent, expires_at))
 
             logger.info(f"Session created for user: {user_id}")
             return {'success': True, 'token': jwt_token, 'session_token': session_token}
@@ -591,15 +734,11 @@ class SessionManager:
             user_id = payload['user_id']
             session_token = payload['session_token']
 
-            # Check if session exists and is active
-            conn = self.db.get_connection()
-            c = conn.cursor()
-            c.execute('''SELECT id FROM user_sessions
-                        WHERE user_id = %s AND session_token = %s AND is_active = 1 AND expires_at > CURRENT_TIMESTAMP''',
-                     (user_id, session_token))
-
-            session = c.fetchone()
-            conn.close()
+            if self.validation_mode == 'database':
+                session = self._find_active_session(user_id, session_token)
+            else:
+                self._refresh_revocations()
+                session = session_token not in self.revocations
 
             if session:
                 return {'valid': True, 'user_id': user_id}
@@ -614,18 +753,52 @@ class SessionManager:
             logger.error(f"Error validating session: {str(e)}")
             return {'valid': False, 'error': 'Session validation error'}
 
+    def _find_active_session(self, user_id, session_token):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''SELECT id FROM user_sessions
+                        WHERE user_id = %s AND session_token = %s AND is_active = TRUE AND expires_at > CURRENT_TIMESTAMP''',
+                     (user_id, session_token))
+            return c.fetchone()
+
+    def _load_revocations(self, since):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            if since is None:
+                c.execute('''SELECT session_token, expires_at, revoked_at FROM session_revocations
+                            WHERE expires_at > CURRENT_TIMESTAMP''')
+            else:
+                c.execute('''SELECT session_token, expires_at, revoked_at FROM session_revocations
+                            WHERE revoked_at > %s AND expires_at > CURRENT_TIMESTAMP''', (since,))
+            return c.fetchall()
+
+    def _refresh_revocations(self):
+        """Pull sessions revoked by other workers, at most once per refresh interval"""
+        try:
+            self.revocations.refresh_if_due(self._load_revocations)
+        except Exception as e:
+            logger.error(f"Error refreshing session revocations: {str(e)}")
+
     def destroy_session(self, user_id, session_token):
         """Destroy user session"""
         if not self._check_db_connection():
             return {'error': 'Database not configured'}
 
         try:
-            conn = self.db.get_connection()
-            c = conn.cursor()
-            c.execute('UPDATE user_sessions SET is_active = 0 WHERE user_id = %s AND session_token = %s',
-                      (user_id, session_token))
-            conn.commit()
-            conn.close()
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute('''UPDATE user_sessions SET is_active = FALSE
+                            WHERE user_id = %s AND session_token = %s
+                            RETURNING expires_at''',
+                          (user_id, session_token))
+                row = c.fetchone()
+                if row:
+                    # Tombstone read by other workers' revocation refresh
+                    c.execute('''INSERT INTO session_revocations (session_token, expires_at)
+                                VALUES (%s, %s) ON CONFLICT (session_token) DO NOTHING''',
+                              (session_token, row[0]))
+
+            self.revocations.revoke(session_token, row[0] if row else None)
 
             logger.info(f"Session destroyed for user: {user_id}")
             return {'success': True}
@@ -634,9 +807,629 @@ class SessionManager:
             logger.error(f"Error destroying session: {str(e)}")
             return {'error': str(e)}
 
-# Global instances
+class PostManager:
+    """Local record of the blog posts drafted in WordPress, keyed by ``wordpress_id``"""
+
+    COLUMNS = ('user_id', 'wordpress_id', 'title', 'content', 'keywords', 'status')
+
+    def __init__(self, db=None):
+        self.db = db or db_manager
+
+    def _check_db_connection(self):
+        """Check if database is configured"""
+        if not self.db.database_url:
+            return False
+        return True
+
+    def create_post(self, wordpress_id, title, content, keywords, user_id=None, status='draft'):
+        """Record one post and return its id"""
+        return self.create_posts([{'wordpress_id': wordpress_id, 'title': title, 'content': content,
+                                   'keywords': keywords, 'status': status}], user_id=user_id)[0]
+
+    def create_posts(self, posts, user_id=None):
+        """Record many posts with one multi-row INSERT; returns their ids in order.
+
+        ``posts`` are dicts with ``wordpress_id``, ``title``, ``content`` and
+        ``keywords`` (``status`` defaults to draft, ``user_id`` to the argument).
+        """
+        if not posts:
+            return []
+        if not self._check_db_connection():
+            raise RuntimeError('Database not configured')
+
+        rows = [(post.get('user_id', user_id), post['wordpress_id'], post['title'], post['content'],
+                 post['keywords'], post.get('status', 'draft')) for post in posts]
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            ids = execute_values(c, f"INSERT INTO posts ({', '.join(self.COLUMNS)}) VALUES %s RETURNING id",
+                                 rows, page_size=len(rows), fetch=True)
+            return [post_id for (post_id,) in ids]
+
+    def update_post(self, wordpress_id, content, keywords=None, title=None):
+        """Store re-optimized content for a post; returns whether it was found"""
+        return self.update_posts([(wordpress_id, content, keywords, title)]) > 0
+
+    def update_posts(self, updates):
+        """Apply ``(wordpress_id, content, keywords, title)`` updates in one statement.
+
+        ``None`` keywords or title keep the stored value. Returns the number
+        of posts updated.
+        """
+        if not updates:
+            return 0
+        if not self._check_db_connection():
+            raise RuntimeError('Database not configured')
+
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            execute_values(c, '''UPDATE posts SET content = v.content,
+                                    keywords = COALESCE(v.keywords, posts.keywords),
+                                    title = COALESCE(v.title, posts.title),
+                                    updated_at = CURRENT_TIMESTAMP
+                                FROM (VALUES %s) AS v (wordpress_id, content, keywords, title)
+                                WHERE posts.wordpress_id = v.wordpress_id''',
+                           updates, template='(%s::integer, %s, %s, %s)', page_size=len(updates))
+            return c.rowcount
+
+    def get_recent_posts(self, days=30):
+        """``(id, wordpress_id, keywords)`` for posts created in the last ``days`` days"""
+        if not self._check_db_connection():
+            return []
+
+        try:
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute('''SELECT id, wordpress_id, keywords FROM posts
+                            WHERE created_at >= CURRENT_TIMESTAMP - make_interval(days => %s)
+                            ORDER BY id''', (days,))
+                return c.fetchall()
+        except Exception as e:
+            logger.error(f"Error getting recent posts: {str(e)}")
+            return []
+
+    def list_posts(self, user_id=None, limit=50, offset=0):
+        """Newest posts first, optionally only ``user_id``'s"""
+        if not self._check_db_connection():
+            return []
+
+        try:
+            with self.db.connection() as conn:
+                c = conn.cursor(cursor_factory=RealDictCursor)
+                if user_id is None:
+                    c.execute('''SELECT id, user_id, wordpress_id, title, keywords, status, created_at, updated_at
+                                FROM posts ORDER BY created_at DESC, id DESC LIMIT %s OFFSET %s''',
+                              (limit, offset))
+                else:
+                    c.execute('''SELECT id, user_id, wordpress_id, title, keywords, status, created_at, updated_at
+                                FROM posts WHERE user_id = %s
+                                ORDER BY created_at DESC, id DESC LIMIT %s OFFSET %s''',
+                              (user_id, limit, offset))
+                return [dict(row) for row in c.fetchall()]
+        except Exception as e:
+            logger.error(f"Error listing posts: {str(e)}")
+            return []
+
+    def import_posts(self, rows):
+        """Copy legacy rows into ``posts``, skipping WordPress posts already recorded.
+
+        ``rows`` are ``(user_id, wordpress_id, title, content, keywords,
+        status, created_at, updated_at)``. Users missing from this database
+        are dropped from the row rather than failing the foreign key. Returns
+        the number of rows inserted.
+        """
+        if not rows:
+            return 0
+
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            execute_values(c, '''INSERT INTO posts (user_id, wordpress_id, title, content, keywords,
+                                                   status, created_at, updated_at)
+                                SELECT u.id, v.wordpress_id, v.title, v.content, v.keywords,
+                                       COALESCE(v.status, 'draft'),
+                                       COALESCE(v.created_at, CURRENT_TIMESTAMP),
+                                       COALESCE(v.updated_at, v.created_at, CURRENT_TIMESTAMP)
+                                FROM (VALUES %s) AS v (user_id, wordpress_id, title, content, keywords,
+                                                       status, created_at, updated_at)
+                                LEFT JOIN users u ON u.id = v.user_id
+                                WHERE v.wordpress_id IS NULL OR NOT EXISTS (
+                                    SELECT 1 FROM posts p WHERE p.wordpress_id = v.wordpress_id)''',
+                           rows, template='(%s::integer, %s::integer, %s, %s, %s, %s, %s::timestamp, %s::timestamp)',
+                           page_size=len(rows))
+            return c.rowcount
+
+
+class KeywordRankingManager:
+    """Persistent cache of SEMrush ranking lookups keyed by (keyword, database, day)"""
+
+    def __init__(self, db=None):
+        self.db = db or db_manager
+
+    def _check_db_connection(self):
+        """Check if database is configured"""
+        if not self.db.database_url:
+            return False
+        return True
+
+    def get_rankings(self, keywords, database, day):
+        """Return ``{keyword: result}`` for the keywords already looked up on ``day``"""
+        if not keywords or not self._check_db_connection():
+            return {}
+
+        try:
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute('''SELECT keyword, result FROM keyword_ranking_cache
+                            WHERE database = %s AND day = %s AND keyword = ANY(%s)''',
+                          (database, day, list(keywords)))
+                return {keyword: result for keyword, result in c.fetchall()}
+        except Exception as e:
+            logger.error(f"Error reading keyword ranking cache: {str(e)}")
+            return {}
+
+    def save_rankings(self, results, database, day):
+        """Store ``{keyword: result}`` for ``day`` (one statement)"""
+        if not results or not self._check_db_connection():
+            return
+
+        try:
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                self.db.bulk_upsert(
+                    c, 'keyword_ranking_cache', ['keyword', 'database', 'day', 'result'],
+                    [(keyword, database, day, Json(result)) for keyword, result in results.items()],
+                    conflict_columns=['keyword', 'database', 'day'],
+                    update_columns=['result'],
+                    touch_column='fetched_at'
+                )
+        except Exception as e:
+            logger.error(f"Error saving keyword ranking cache: {str(e)}")
+
+# Share of searches that click through, by ranking position (1-10); beyond
+# page one traffic is negligible for reporting purposes
+ORGANIC_CTR_BY_POSITION = {1: 0.28, 2: 0.15, 3: 0.11, 4: 0.08, 5: 0.07,
+                           6: 0.05, 7: 0.04, 8: 0.03, 9: 0.03, 10: 0.02}
+BEYOND_PAGE_ONE_CTR = 0.005
+
+class RankingHistoryManager:
+    """Time series of keyword positions with per-day rollups.
+
+    Raw samples live in ``keyword_ranking_history`` (keyword id + timestamp,
+    a few bytes per row); ``keyword_ranking_daily`` keeps one pre-aggregated
+    row per keyword and day so trend and summary queries never scan the raw
+    samples. Position 0 means the keyword is not ranking.
+    """
+
+    def __init__(self, db=None, conversion_rate=None):
+        self.db = db or db_manager
+        self.conversion_rate = conversion_rate if conversion_rate is not None else \
+            float(os.getenv('SEO_CONVERSION_RATE', 0.05))
+
+    def _check_db_connection(self):
+        """Check if database is configured"""
+        if not self.db.database_url:
+            return False
+        return True
+
+    def record_rankings(self, results, database='us', captured_at=None):
+        """Append ``{keyword: result}`` samples; results carrying an ``error`` are skipped"""
+        return self.record_samples(
+            [(keyword, result.get('position'), result.get('search_volume'), result.get('cpc'))
+             for keyword, result in results.items() if 'error' not in result],
+            database, captured_at)
+
+    def record_samples(self, samples, database='us', captured_at=None):
+        """Append ``(keyword, position, search_volume, cpc, ...)`` samples and
+        refresh their daily rollups.
+
+        Samples are streamed into a temporary table with COPY and moved into
+        the history with set-based statements, all in one transaction.
+        Returns the number of samples sent.
+        """
+        rows = [(sample[0].strip().lower(), int(sample[1] or 0), sample[2], sample[3])
+                for sample in samples if sample[0] and sample[0].strip()]
+        if not rows or not self._check_db_connection():
+            return 0
+
+        captured_at = captured_at or datetime.now()
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+
+        try:
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute('''CREATE TEMP TABLE ranking_import (
+                                keyword TEXT, position SMALLINT, search_volume INTEGER, cpc REAL
+                            ) ON COMMIT DROP''')
+                c.copy_expert('COPY ranking_import FROM STDIN WITH (FORMAT csv)', buffer)
+                c.execute('''INSERT INTO tracked_keywords (keyword, database)
+                            SELECT DISTINCT keyword, %s FROM ranking_import
+                            ON CONFLICT (keyword, database) DO NOTHING''', (database,))
+                c.execute('''INSERT INTO keyword_ranking_history
+                                (keyword_id, captured_at, position, search_volume, cpc)
+                            SELECT k.id, %s, i.position, i.search_volume, i.cpc
+                            FROM ranking_import i
+                            JOIN tracked_keywords k ON k.keyword = i.keyword AND k.database = %s
+                            ON CONFLICT (keyword_id, captured_at) DO NOTHING''',
+                          (captured_at, database))
+                # Recompute only the (keyword, day) rollups this batch touched
+                c.execute('''INSERT INTO keyword_ranking_daily
+                                (keyword_id, day, samples, best_position, worst_position,
+                                 avg_position, last_position, search_volume)
+                            SELECT h.keyword_id, %(day)s, COUNT(*),
+                                   MIN(h.position) FILTER (WHERE h.position > 0),
+                                   MAX(h.position) FILTER (WHERE h.position > 0),
+                                   AVG(h.position) FILTER (WHERE h.position > 0),
+                                   (ARRAY_AGG(h.position ORDER BY h.captured_at DESC))[1],
+                                   (ARRAY_AGG(h.search_volume ORDER BY h.captured_at DESC))[1]
+                            FROM keyword_ranking_history h
+                            WHERE h.keyword_id IN (
+                                SELECT k.id FROM ranking_import i
+                                JOIN tracked_keywords k ON k.keyword = i.keyword AND k.database = %(database)s)
+                              AND h.captured_at >= %(day)s AND h.captured_at < %(next_day)s
+                            GROUP BY h.keyword_id
+                            ON CONFLICT (keyword_id, day) DO UPDATE SET
+                                samples = EXCLUDED.samples,
+                                best_position = EXCLUDED.best_position,
+                                worst_position = EXCLUDED.worst_position,
+                                avg_position = EXCLUDED.avg_position,
+                                last_position = EXCLUDED.last_position,
+                                search_volume = EXCLUDED.search_volume''',
+                          {'day': captured_at.date(), 'next_day': captured_at.date() + timedelta(days=1),
+                           'database': database})
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Error recording ranking history: {str(e)}")
+            return 0
+
+    def get_position_trend(self, keyword, database='us', days=30):
+        """Daily position rollups for ``keyword`` over the last ``days`` days, oldest first"""
+        if not self._check_db_connection():
+            return []
+
+        since = datetime.now().date() - timedelta(days=days)
+        try:
+            with self.db.connection() as conn:
+                c = conn.cursor(cursor_factory=RealDictCursor)
+                c.execute('''SELECT d.day, d.samples, d.best_position, d.worst_position,
+                                   d.avg_position, d.last_position, d.search_volume
+                            FROM keyword_ranking_daily d
+                            JOIN tracked_keywords k ON k.id = d.keyword_id
+                            WHERE k.keyword = %s AND k.database = %s AND d.day >= %s
+                            ORDER BY d.day''',
+                          (keyword.strip().lower(), database, since))
+                return [dict(row) for row in c.fetchall()]
+        except Exception as e:
+            logger.error(f"Error reading position trend: {str(e)}")
+            return []
+
+    def get_position_changes(self, database='us', days=7, limit=20):
+        """Keywords whose position moved most between the start and end of the window"""
+        if not self._check_db_connection():
+            return []
+
+        since = datetime.now().date() - timedelta(days=days)
+        try:
+            with self.db.connection() as conn:
+                c = conn.cursor(cursor_factory=RealDictCursor)
+                c.execute('''WITH window_days AS (
+                                SELECT d.keyword_id, d.day, d.last_position
+                                FROM keyword_ranking_daily d
+                                JOIN tracked_keywords k ON k.id = d.keyword_id
+                                WHERE k.database = %s AND d.day >= %s
+                            ), first_day AS (
+                                SELECT DISTINCT ON (keyword_id) keyword_id, last_position
+                                FROM window_days ORDER BY keyword_id, day
+                            ), last_day AS (
+                                SELECT DISTINCT ON (keyword_id) keyword_id, last_position
+                                FROM window_days ORDER BY keyword_id, day DESC
+                            )
+                            SELECT k.keyword, f.last_position AS previous_position,
+                                   l.last_position AS position,
+                                   f.last_position - l.last_position AS change
+                            FROM first_day f
+                            JOIN last_day l USING (keyword_id)
+                            JOIN tracked_keywords k ON k.id = f.keyword_id
+                            WHERE f.last_position <> l.last_position
+                            ORDER BY ABS(f.last_position - l.last_position) DESC, k.keyword
+                            LIMIT %s''',
+                          (database, since, limit))
+                return [dict(row) for row in c.fetchall()]
+        except Exception as e:
+            logger.error(f"Error reading position changes: {str(e)}")
+            return []
+
+    def get_summary(self, database='us', days=30):
+        """Portfolio stats from the latest rollup of every keyword seen in the window.
+
+        Traffic is estimated from search volume and a click-through curve by
+        position; conversions apply ``conversion_rate`` to that estimate.
+        """
+        summary = {'total_keywords': 0, 'organic_traffic': 0, 'average_position': 0, 'conversions': 0}
+        if not self._check_db_connection():
+            return summary
+
+        since = datetime.now().date() - timedelta(days=days)
+        try:
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute('''WITH latest AS (
+                                SELECT DISTINCT ON (d.keyword_id) d.last_position, d.search_volume
+                                FROM keyword_ranking_daily d
+                                JOIN tracked_keywords k ON k.id = d.keyword_id
+                                WHERE k.database = %s AND d.day >= %s
+                                ORDER BY d.keyword_id, d.day DESC
+                            )
+                            SELECT last_position, COUNT(*), COALESCE(SUM(search_volume), 0)
+                            FROM latest GROUP BY last_position''',
+                          (database, since))
+                by_position = c.fetchall()
+        except Exception as e:
+            logger.error(f"Error reading ranking summary: {str(e)}")
+            return summary
+
+        ranked_keywords = position_total = traffic = 0
+        for position, keywords, volume in by_position:
+            summary['total_keywords'] += keywords
+            if position > 0:
+                ranked_keywords += keywords
+                position_total += position * keywords
+                traffic += volume * ORGANIC_CTR_BY_POSITION.get(position, BEYOND_PAGE_ONE_CTR)
+
+        summary['organic_traffic'] = round(traffic)
+        summary['average_position'] = round(position_total / ranked_keywords, 1) if ranked_keywords else 0
+        summary['conversions'] = round(traffic * self.conversion_rate)
+        return summary
+
+class OrganicIngestCheckpointManager:
+    """Resume points for streaming organic-keyword ingestion, per (domain, database)"""
+
+    def __init__(self, db=None):
+        self.db = db or db_manager
+
+    def _check_db_connection(self):
+        """Check if database is configured"""
+        if not self.db.database_url:
+            return False
+        return True
+
+    def get_checkpoint(self, domain, database):
+        if not self._check_db_connection():
+            return None
+
+        try:
+            with self.db.connection() as conn:
+                c = conn.cursor(cursor_factory=RealDictCursor)
+                c.execute('''SELECT next_offset, rows_ingested, updated_at, completed_at
+                            FROM organic_ingest_checkpoints WHERE domain = %s AND database = %s''',
+                          (domain, database))
+                row = c.fetchone()
+                return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Error reading ingest checkpoint: {str(e)}")
+            return None
+
+    def save_checkpoint(self, domain, database, next_offset, rows_ingested, completed=False):
+        if not self._check_db_connection():
+            return
+
+        try:
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute('''INSERT INTO organic_ingest_checkpoints
+                                (domain, database, next_offset, rows_ingested, completed_at)
+                            VALUES (%s, %s, %s, %s, CASE WHEN %s THEN CURRENT_TIMESTAMP END)
+                            ON CONFLICT (domain, database) DO UPDATE SET
+                                next_offset = EXCLUDED.next_offset,
+                                rows_ingested = EXCLUDED.rows_ingested,
+                                completed_at = EXCLUDED.completed_at,
+                                updated_at = CURRENT_TIMESTAMP''',
+                          (domain, database, next_offset, rows_ingested, completed))
+        except Exception as e:
+            logger.error(f"Error saving ingest checkpoint: {str(e)}")
+
+class ReoptimizationCheckpointManager:
+    """Per-post outcome of each daily re-optimization run, so reruns skip finished posts"""
+
+    def __init__(self, db=None):
+        self.db = db or db_manager
+
+    def _check_db_connection(self):
+        """Check if database is configured"""
+        if not self.db.database_url:
+            return False
+        return True
+
+    def get_completed(self, run_key):
+        """Return the post ids already published in ``run_key``"""
+        if not self._check_db_connection():
+            return set()
+
+        try:
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute('''SELECT post_id FROM reoptimization_checkpoints
+                            WHERE run_key = %s AND status = %s''', (run_key, 'published'))
+                return {post_id for (post_id,) in c.fetchall()}
+        except Exception as e:
+            logger.error(f"Error reading re-optimization checkpoints: {str(e)}")
+            return set()
+
+    def record(self, run_key, post_id, status, stage=None, error=None):
+        if not self._check_db_connection():
+            return
+
+        try:
+            with self.db.connection() as conn:
+                c = conn.cursor()
+                c.execute('''INSERT INTO reoptimization_checkpoints (run_key, post_id, status, stage, error)
+                            VALUES (%s, %s, %s, %s, %s)
+                            ON CONFLICT (run_key, post_id) DO UPDATE SET
+                                status = EXCLUDED.status,
+                                stage = EXCLUDED.stage,
+                                error = EXCLUDED.error,
+                                updated_at = CURRENT_TIMESTAMP''',
+                          (run_key, post_id, status, stage, error))
+        except Exception as e:
+            logger.error(f"Error saving re-optimization checkpoint: {str(e)}")
+
+class JobManager:
+    """Durable job queue on the ``jobs`` table.
+
+    Workers claim jobs with ``FOR UPDATE SKIP LOCKED``, so any number of
+    worker processes can poll without blocking each other or double-claiming.
+    Higher ``priority`` runs first; among equal priorities the tenant with the
+    fewest running jobs goes next, and no tenant runs more than
+    ``tenant_limit`` jobs at once. Failed jobs are retried with exponential
+    backoff until ``max_attempts``.
+    """
+
+    def __init__(self, db=None, tenant_limit=None, backoff=None, max_backoff=None):
+        self.db = db or db_manager
+        self.tenant_limit = tenant_limit or int(os.getenv('JOB_TENANT_MAX_RUNNING', 4))
+        self.backoff = backoff if backoff is not None else float(os.getenv('JOB_RETRY_BACKOFF', 30))
+        self.max_backoff = max_backoff if max_backoff is not None else float(os.getenv('JOB_RETRY_MAX_BACKOFF', 3600))
+
+    def _check_db_connection(self):
+        """Check if database is configured"""
+        if not self.db.database_url:
+            return False
+        return True
+
+    def enqueue(self, kind, payload, tenant='default', priority=0, max_attempts=None):
+        """Queue a job and return its id"""
+        if not self._check_db_connection():
+            raise RuntimeError('Database not configured')
+
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''INSERT INTO jobs (kind, tenant, priority, payload, max_attempts)
+                        VALUES (%s, %s, %s, %s, %s) RETURNING id''',
+                      (kind, str(tenant), priority, Json(payload),
+                       max_attempts or int(os.getenv('JOB_MAX_ATTEMPTS', 3))))
+            return c.fetchone()[0]
+
+    def claim(self, worker_id):
+        """Lock the next runnable job for ``worker_id``; returns it as a dict or None"""
+        with self.db.connection() as conn:
+            c = conn.cursor(cursor_factory=RealDictCursor)
+            c.execute('''WITH running AS (
+                            SELECT tenant, COUNT(*) AS jobs FROM jobs
+                            WHERE status = 'running' GROUP BY tenant
+                        ), candidate AS (
+                            SELECT j.id FROM jobs j
+                            LEFT JOIN running r ON r.tenant = j.tenant
+                            WHERE j.status = 'queued' AND j.run_after <= CURRENT_TIMESTAMP
+                              AND COALESCE(r.jobs, 0) < %s
+                            ORDER BY j.priority DESC, COALESCE(r.jobs, 0), j.run_after, j.id
+                            LIMIT 1
+                            FOR UPDATE OF j SKIP LOCKED
+                        )
+                        UPDATE jobs SET status = 'running', attempts = jobs.attempts + 1,
+                            locked_by = %s, locked_at = CURRENT_TIMESTAMP,
+                            started_at = COALESCE(jobs.started_at, CURRENT_TIMESTAMP),
+                            updated_at = CURRENT_TIMESTAMP
+                        FROM candidate WHERE jobs.id = candidate.id
+                        RETURNING jobs.id, jobs.kind, jobs.tenant, jobs.payload,
+                                  jobs.progress, jobs.attempts, jobs.max_attempts''',
+                      (self.tenant_limit, worker_id))
+            row = c.fetchone()
+            return dict(row) if row else None
+
+    def complete(self, job_id, result=None):
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''UPDATE jobs SET status = 'succeeded', result = %s, error = NULL,
+                            locked_by = NULL, locked_at = NULL,
+                            finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = %s AND status = 'running' ''',
+                      (Json(result), job_id))
+
+    def fail(self, job_id, error, retry=True):
+        """Record a failed attempt: requeue with backoff, or fail for good.
+
+        Returns the job's new status ('queued' or 'failed').
+        """
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''UPDATE jobs SET
+                            status = CASE WHEN %(retry)s AND attempts < max_attempts
+                                          THEN 'queued' ELSE 'failed' END,
+                            run_after = CURRENT_TIMESTAMP + make_interval(
+                                secs => LEAST(%(backoff)s * power(2, attempts - 1), %(max_backoff)s)),
+                            finished_at = CASE WHEN %(retry)s AND attempts < max_attempts
+                                               THEN NULL ELSE CURRENT_TIMESTAMP END,
+                            error = %(error)s, locked_by = NULL, locked_at = NULL,
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE id = %(id)s AND status = 'running'
+                        RETURNING status''',
+                      {'retry': retry, 'backoff': self.backoff, 'max_backoff': self.max_backoff,
+                       'error': str(error)[:2000], 'id': job_id})
+            row = c.fetchone()
+            return row[0] if row else None
+
+    def update_progress(self, job_id, progress):
+        """Store progress for status polling; also refreshes the job's lock"""
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''UPDATE jobs SET progress = %s, locked_at = CURRENT_TIMESTAMP,
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE id = %s AND status = 'running' ''',
+                      (Json(progress), job_id))
+
+    def requeue_stale(self, lock_timeout):
+        """Give jobs whose worker died (lock older than ``lock_timeout`` seconds) back to the queue"""
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute('''UPDATE jobs SET
+                            status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+                            finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE CURRENT_TIMESTAMP END,
+                            error = 'worker lost', locked_by = NULL, locked_at = NULL,
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE status = 'running'
+                          AND locked_at < CURRENT_TIMESTAMP - make_interval(secs => %s)''',
+                      (lock_timeout,))
+            return c.rowcount
+
+    def get_job(self, job_id):
+        if not self._check_db_connection():
+            return None
+
+        with self.db.connection() as conn:
+            c = conn.cursor(cursor_factory=RealDictCursor)
+            c.execute('''SELECT id, kind, tenant, priority, status, result, progress, error,
+                                attempts, max_attempts, run_after, created_at, started_at, finished_at
+                        FROM jobs WHERE id = %s''', (job_id,))
+            row = c.fetchone()
+            return dict(row) if row else None
+
+# Per-process caches in front of the hottest per-user lookups
+api_key_cache = cache_from_env('api_keys')
+user_settings_cache = cache_from_env('user_settings')
+
+def start_cache_invalidation_listener():
+    """Listen for cross-worker cache invalidations if CACHE_INVALIDATION_CHANNEL is set"""
+    channel = os.getenv('CACHE_INVALIDATION_CHANNEL')
+    if not channel or not db_manager.database_url:
+        return None
+    listener = CacheInvalidationListener(
+        db_manager.get_connection,
+        channel,
+        {'api_keys': api_key_cache, 'user_settings': user_settings_cache}
+    )
+    listener.start()
+    return listener
+
+# Global instances - every manager shares the single db_manager handle
 db_manager = DatabaseManager()
-user_manager = UserManager()
-user_settings_manager = UserSettingsManager()
-api_key_manager = APIKeyManager()
-session_manager = SessionManager()
+password_hasher = PasswordHasher.from_env()
+user_manager = UserManager(db_manager)
+user_settings_manager = UserSettingsManager(db_manager)
+api_key_manager = APIKeyManager(db_manager)
+session_manager = SessionManager(db_manager)
+post_manager = PostManager(db_manager)
+keyword_ranking_manager = KeywordRankingManager(db_manager)
+ranking_history_manager = RankingHistoryManager(db_manager)
+organic_ingest_checkpoint_manager = OrganicIngestCheckpointManager(db_manager)
+reoptimization_checkpoint_manager = ReoptimizationCheckpointManager(db_manager)
+job_manager = JobManager(db_manager)
@@ -0,0 +1,200 @@
+"""Retention for session and activity-log data.
+
+Expired sessions and revocation tombstones are deleted in small batches,
+each in its own short transaction, so cleanup never holds long row locks
+against logins. ``activity_logs`` is range-partitioned by month; whole
+months past the retention window are dropped as partitions instead of
+being deleted row by row.
+"""
+import os
+import re
+import time
+from datetime import date, datetime, timedelta
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+PARTITION_PATTERN = re.compile(r'^activity_logs_(\d{4})_(\d{2})$')
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'activity_logs_{month:%Y_%m}'
+
+
+def delete_in_batches(db, query, params, batch_size, pause=0.0):
+    """Run ``query`` (which must delete at most ``batch_size`` rows) until it
+    deletes fewer than ``batch_size``. Returns the total rows deleted."""
+    total = 0
+    while True:
+        with db.connection() as conn:
+            c = conn.cursor()
+            c.execute(query, params + (batch_size,))
+            deleted = c.rowcount
+        total += deleted
+        if deleted < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)
+
+
+def purge_expired_sessions(db, older_than, batch_size=5000, pause=0.0):
+    """Delete sessions that expired before ``older_than``"""
+    return delete_in_batches(db, '''DELETE FROM user_sessions WHERE id IN (
+                                        SELECT id FROM user_sessions WHERE expires_at < %s
+                                        LIMIT %s FOR UPDATE SKIP LOCKED)''',
+                             (older_than,), batch_size, pause)
+
+
+def purge_expired_revocations(db, now, batch_size=5000, pause=0.0):
+    """Delete revocation tombstones whose token has expired anyway"""
+    return delete_in_batches(db, '''DELETE FROM session_revocations WHERE session_token IN (
+                                        SELECT session_token FROM session_revocations WHERE expires_at < %s
+                                        LIMIT %s FOR UPDATE SKIP LOCKED)''',
+                             (now,), batch_size, pause)
+
+
+def purge_ranking_cache(db, older_than, batch_size=5000, pause=0.0):
+    """Delete cached SEMrush lookups for days before ``older_than``"""
+    return delete_in_batches(db, '''DELETE FROM keyword_ranking_cache WHERE ctid IN (
+                                        SELECT ctid FROM keyword_ranking_cache WHERE day < %s
+                                        LIMIT %s)''',
+                             (older_than,), batch_size, pause)
+
+
+def purge_ranking_history(db, older_than, batch_size=5000, pause=0.0):
+    """Delete raw ranking samples captured before ``older_than``; daily rollups are kept"""
+    return delete_in_batches(db, '''DELETE FROM keyword_ranking_history WHERE ctid IN (
+                                        SELECT ctid FROM keyword_ranking_history WHERE captured_at < %s
+                                        LIMIT %s)''',
+                             (older_than,), batch_size, pause)
+
+
+def purge_finished_jobs(db, older_than, batch_size=5000, pause=0.0):
+    """Delete succeeded and failed jobs that finished before ``older_than``"""
+    return delete_in_batches(db, '''DELETE FROM jobs WHERE id IN (
+                                        SELECT id FROM jobs WHERE finished_at < %s
+                                        LIMIT %s)''',
+                             (older_than,), batch_size, pause)
+
+
+def list_activity_log_partitions(conn):
+    """Return ``{month: partition name}`` for the monthly partitions"""
+    c = conn.cursor()
+    c.execute('''SELECT child.relname FROM pg_inherits
+                 JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                 JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                 WHERE parent.relname = 'activity_logs' ''')
+    partitions = {}
+    for (name,) in c.fetchall():
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def ensure_activity_log_partitions(db, today=None, months_ahead=2):
+    """Create monthly partitions from this month through ``months_ahead``.
+
+    Rows that already landed in the default partition for a month are moved
+    into the new partition before it is attached. Returns the names created.
+    """
+    month = month_start(today or date.today())
+    created = []
+    with db.connection() as conn:
+        existing = list_activity_log_partitions(conn)
+        c = conn.cursor()
+        for _ in range(months_ahead + 1):
+            if month not in existing:
+                name = partition_name(month)
+                end = next_month(month)
+                c.execute(f'CREATE TABLE {name} (LIKE activity_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+                c.execute(f'''WITH moved AS (
+                                 DELETE FROM activity_logs_default
+                                 WHERE created_at >= %s AND created_at < %s RETURNING *)
+                              INSERT INTO {name} SELECT * FROM moved''', (month, end))
+                c.execute(f'ALTER TABLE activity_logs ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)',
+                          (month, end))
+                created.append(name)
+            month = next_month(month)
+    return created
+
+
+def drop_activity_log_partitions(db, older_than, batch_size=5000, pause=0.0):
+    """Drop monthly partitions that end on or before ``older_than``.
+
+    Rows older than the cutoff in the default partition are deleted too.
+    Returns ``(dropped partition names, default-partition rows deleted)``.
+    """
+    cutoff = older_than.date() if isinstance(older_than, datetime) else older_than
+    dropped = []
+    with db.connection() as conn:
+        partitions = list_activity_log_partitions(conn)
+    for month, name in sorted(partitions.items()):
+        if next_month(month) > cutoff:
+            continue
+        # One partition per transaction keeps the parent's lock short
+        with db.connection() as conn:
+            c = conn.cursor()
+            c.execute(f'ALTER TABLE activity_logs DETACH PARTITION {name}')
+            c.execute(f'DROP TABLE {name}')
+        dropped.append(name)
+
+    deleted = delete_in_batches(db, '''DELETE FROM activity_logs_default WHERE ctid IN (
+                                           SELECT ctid FROM activity_logs_default WHERE created_at < %s
+                                           LIMIT %s)''',
+                                (older_than,), batch_size, pause)
+    return dropped, deleted
+
+
+def run_retention(db, now=None):
+    """Apply the configured retention windows and return a summary.
+
+    SESSION_RETENTION_DAYS: how long expired sessions are kept (default 7)
+    ACTIVITY_LOG_RETENTION_DAYS: age at which activity months are dropped (default 90)
+    ACTIVITY_LOG_PARTITIONS_AHEAD: future monthly partitions to keep ready (default 2)
+    RANKING_CACHE_RETENTION_DAYS: how long SEMrush lookups are cached (default 30)
+    RANKING_HISTORY_RETENTION_DAYS: how long raw ranking samples are kept (default 180)
+    JOB_RETENTION_DAYS: how long finished background jobs are kept (default 14)
+    RETENTION_BATCH_SIZE / RETENTION_BATCH_PAUSE_MS: delete batch size and pause
+    """
+    now = now or datetime.now()
+    batch_size = int(os.getenv('RETENTION_BATCH_SIZE', 5000))
+    pause = int(os.getenv('RETENTION_BATCH_PAUSE_MS', 50)) / 1000
+    session_days = int(os.getenv('SESSION_RETENTION_DAYS', 7))
+    activity_days = int(os.getenv('ACTIVITY_LOG_RETENTION_DAYS', 90))
+    months_ahead = int(os.getenv('ACTIVITY_LOG_PARTITIONS_AHEAD', 2))
+    ranking_days = int(os.getenv('RANKING_CACHE_RETENTION_DAYS', 30))
+    history_days = int(os.getenv('RANKING_HISTORY_RETENTION_DAYS', 180))
+    job_days = int(os.getenv('JOB_RETENTION_DAYS', 14))
+
+    started = time.monotonic()
+    summary = {
+        'sessions_deleted': purge_expired_sessions(db, now - timedelta(days=session_days), batch_size, pause),
+        'revocations_deleted': purge_expired_revocations(db, now, batch_size, pause),
+        'rankings_deleted': purge_ranking_cache(db, now.date() - timedelta(days=ranking_days), batch_size, pause),
+        'ranking_samples_deleted': purge_ranking_history(db, now - timedelta(days=history_days),
+                                                         batch_size, pause),
+        'jobs_deleted': purge_finished_jobs(db, now - timedelta(days=job_days), batch_size, pause),
+        'partitions_created': ensure_activity_log_partitions(db, now.date(), months_ahead),
+    }
+    dropped, deleted = drop_activity_log_partitions(db, now - timedelta(days=activity_days), batch_size, pause)
+    summary['partitions_dropped'] = dropped
+    summary['activity_rows_deleted'] = deleted
+    summary['duration_seconds'] = round(time.monotonic() - started, 3)
+    return summary
+
+
+if __name__ == '__main__':
+    # For deployments without the in-process scheduler: python -m app.retention
+    from app.utils.logger import setup_logger
+    from app.models import db_manager
+    setup_logger()
+    logger.info(f"Retention completed: {run_retention(db_manager)}")
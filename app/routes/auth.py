@@ -1,7 +1,11 @@
-from flask import Blueprint, request, jsonify, render_template, redirect, url_for, session, flash
+from flask import Blueprint, Response, request, jsonify, render_template, redirect, url_for, session, flash
 from app.models import user_manager, session_manager
 from app.utils.logger import get_logger
 from functools import wraps
+from datetime import datetime
+import csv
+import io
+import json
 import os
 
 auth_bp = Blueprint('auth', __name__)
@@ -16,6 +20,34 @@ def login_required(f):
     return decorated_function
 
 
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            if request.path.startswith('/api/'):
+                return jsonify({'error': 'Authentication required'}), 401
+            return redirect(url_for('auth.login'))
+        if session.get('role') != 'admin':
+            if request.path.startswith('/api/'):
+                return jsonify({'error': 'Admin access required'}), 403
+            flash('Admin access required', 'error')
+            return redirect(url_for('auth.dashboard'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def busy_response(result, endpoint):
+    """429 for requests rejected because the password hashing pool is full"""
+    if request.is_json:
+        response = jsonify({'error': result['error']})
+        response.status_code = 429
+    else:
+        flash(result['error'], 'error')
+        response = redirect(url_for(endpoint))
+    response.headers['Retry-After'] = str(result['retry_after'])
+    return response
+
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'GET':
@@ -45,6 +77,9 @@ def login():
 
     result = user_manager.authenticate_user(username, password)
 
+    if 'retry_after' in result:
+        return busy_response(result, 'auth.login')
+
     if 'error' in result:
         if request.is_json:
             return jsonify({'error': result['error']}), 401
@@ -75,6 +110,7 @@ def login():
     session['user_id'] = result['user']['id']
     session['username'] = result['user']['username']
     session['role'] = result['user']['role']
+    session['session_token'] = session_result['session_token']
 
     logger.info(f"User logged in: {result['user']['username']}")
 
@@ -131,6 +167,9 @@ def register():
 
     result = user_manager.create_user(username, email, password)
 
+    if 'retry_after' in result:
+        return busy_response(result, 'auth.register')
+
     if 'error' in result:
         if request.is_json:
             return jsonify({'error': result['error']}), 400
@@ -377,14 +416,14 @@ def check_api_status():
 
         if openai_key:
             try:
-                import openai
-                openai.api_key = openai_key
-                # Test with a minimal request
-                openai.completions.create(
-                    model="text-davinci-003",
-                    prompt="test",
+                from app.utils.openai_clients import openai_clients
+                # Test with a minimal request on the user's own client
+                openai_clients.run(openai_clients.complete(
+                    openai_key,
+                    model="gpt-3.5-turbo",
+                    messages=[{"role": "user", "content": "test"}],
                     max_tokens=5
-                )
+                ), timeout=30)
                 status_results['openai'] = {'status': 'connected', 'message': 'API key is valid'}
             except Exception as e:
                 status_results['openai'] = {'status': 'disconnected', 'message': str(e)}
@@ -461,3 +500,97 @@ def check_api_status():
         logger = get_logger()
         logger.error(f"Error checking API status: {str(e)}")
         return jsonify({'error': 'Failed to check API status'}), 500
+
+
+USER_EXPORT_FIELDS = ['id', 'username', 'email', 'role', 'is_active', 'created_at', 'last_login', 'subscription_plan']
+
+
+def user_filters_from_args(args):
+    """Translate ?role=&status=&plan=&q= query parameters into list_users filters"""
+    status = args.get('status')
+    return {
+        'role': args.get('role') or None,
+        'is_active': {'active': True, 'inactive': False}.get(status),
+        'subscription_plan': args.get('plan') or None,
+        'search': (args.get('q') or '').strip() or None,
+    }
+
+
+def serialize_user(user):
+    return {key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in user.items()}
+
+
+@auth_bp.route('/admin/users')
+@admin_required
+def admin_users():
+    filters = user_filters_from_args(request.args)
+    try:
+        page = user_manager.list_users(limit=50, after=request.args.get('after'), **filters)
+    except ValueError:
+        return redirect(url_for('auth.admin_users'))
+    return render_template('admin_users.html',
+                           users=[serialize_user(user) for user in page['users']],
+                           next_cursor=page['next_cursor'],
+                           filters=request.args)
+
+
+@auth_bp.route('/api/admin/users')
+@admin_required
+def admin_list_users():
+    """One keyset page of users: ?limit=&after=<next_cursor>&role=&status=&plan=&q="""
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        page = user_manager.list_users(limit=limit, after=request.args.get('after'),
+                                       **user_filters_from_args(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error listing users: {str(e)}")
+        return jsonify({'error': 'Failed to list users'}), 500
+
+    return jsonify({
+        'users': [serialize_user(user) for user in page['users']],
+        'next_cursor': page['next_cursor']
+    })
+
+
+@auth_bp.route('/api/admin/users/export')
+@admin_required
+def admin_export_users():
+    """Stream every matching user as NDJSON (default) or CSV (?format=csv)"""
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+
+    users = user_manager.iter_users(**user_filters_from_args(request.args))
+
+    def ndjson():
+        buffer = io.StringIO()
+        for user in users:
+            buffer.write(json.dumps(serialize_user(user)) + '\n')
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def csv_rows():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=USER_EXPORT_FIELDS)
+        writer.writeheader()
+        for user in users:
+            writer.writerow(serialize_user(user))
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    stamp = datetime.now().strftime('%Y%m%d')
+    if export_format == 'csv':
+        response = Response(csv_rows(), mimetype='text/csv')
+    else:
+        response = Response(ndjson(), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename=users_{stamp}.{export_format}'
+    return response
@@ -1,14 +1,109 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, request, jsonify, session, stream_with_context
 from app.services.wordpress_service import WordPressService
 from app.services.openai_service import OpenAIService
+from app.services.bulk_blog import BulkBlogGenerator, blog_draft, parse_keyword_list
+from app.models import post_manager
 from app.utils.auth import token_required
+from app.routes.jobs import enqueue_job, wants_background
 from app.utils.logger import get_logger
-import sqlite3
-from datetime import datetime
+import json
+import os
 
 blog_bp = Blueprint('blog', __name__)
 logger = get_logger()
 
+
+def create_draft(blog_content, keyword, secondary_keywords):
+    """Create the WordPress draft; returns (post_result, post_data)"""
+    wordpress_service = WordPressService()
+    post_data = blog_draft(blog_content, keyword, secondary_keywords)
+    return wordpress_service.create_post(post_data), post_data
+
+
+def record_post(wordpress_id, post_data, user_id=None):
+    """Record a drafted post locally; returns a warning instead when there is no database.
+
+    The WordPress draft already exists at this point, so a missing database
+    must not turn it into an error nobody can find the draft from.
+    """
+    if not post_manager.db.database_url:
+        logger.error(f"Post {wordpress_id} drafted but not recorded: database not configured")
+        return 'Draft created in WordPress but not recorded locally: database not configured'
+    post_manager.create_post(wordpress_id, post_data['title'], post_data['content'],
+                             post_data['meta']['keywords'], user_id=user_id)
+    return None
+
+
+def publish_blog_post(blog_content, keyword, secondary_keywords, user_id=None):
+    """Create the WordPress draft and record it locally; returns (post_result, post_data, warning)"""
+    post_result, post_data = create_draft(blog_content, keyword, secondary_keywords)
+    try:
+        warning = record_post(post_result['id'], post_data, user_id)
+    except Exception as e:
+        # The draft exists in WordPress; only the local record is missing
+        logger.error(f"Error recording post {post_result['id']}: {str(e)}")
+        warning = f"Draft created in WordPress but not recorded locally: {str(e)}"
+    return post_result, post_data, warning
+
+
+def sse(event, payload):
+    """One server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def generate_and_publish(keyword, secondary_keywords='', user_id=None, bypass_cache=False, state=None,
+                         save_state=None):
+    """Generate a post and create its WordPress draft (shared by the route and the job worker).
+
+    ``save_state`` is called with ``state`` after the draft is created and
+    again once it is recorded locally; passing that state back in on a retry
+    skips the steps already done, so a retried job never drafts twice.
+    """
+    state = dict(state or {})
+    if 'draft' not in state:
+        # Generate content with OpenAI
+        openai_service = OpenAIService(user_id=user_id)
+        blog_content = openai_service.generate_blog_post(keyword, secondary_keywords, bypass_cache=bypass_cache)
+
+        post_result, post_data = create_draft(blog_content, keyword, secondary_keywords)
+        state['draft'] = {'post_id': post_result['id'], 'post_data': post_data}
+        if save_state:
+            save_state(state)
+
+    draft = state['draft']
+    if not state.get('recorded'):
+        try:
+            warning = record_post(draft['post_id'], draft['post_data'], user_id)
+        except Exception as e:
+            if save_state:
+                raise  # the retry finds the draft in ``state`` and only records it
+            logger.error(f"Error recording post {draft['post_id']}: {str(e)}")
+            warning = f"Draft created in WordPress but not recorded locally: {str(e)}"
+        state['recorded'] = True
+        if warning:
+            state['warning'] = warning
+        if save_state:
+            save_state(state)
+
+    logger.info(f"Blog post generated and posted: {draft['post_id']}")
+    result = {
+        'post_id': draft['post_id'],
+        'title': draft['post_data']['title'],
+        'status': 'draft'
+    }
+    if state.get('warning'):
+        result['warning'] = state['warning']
+    return result
+
+
+def generate_bulk(items, user_id=None, bypass_cache=False, progress=None, previous=None, checkpoint=None):
+    """Generate and draft posts for a keyword list (run by the job worker)"""
+    generator = BulkBlogGenerator(OpenAIService(user_id=user_id), WordPressService(),
+                                  lambda posts: post_manager.create_posts(posts, user_id=user_id),
+                                  bypass_cache=bypass_cache, progress=progress, checkpoint=checkpoint)
+    return generator.run(items, previous=previous)
+
+
 @blog_bp.route('/generate_blog', methods=['POST'])
 @token_required
 def generate_blog():
@@ -20,43 +115,110 @@ def generate_blog():
         if not keyword:
             return jsonify({'error': 'Keyword is required'}), 400
 
-        # Generate content with OpenAI
-        openai_service = OpenAIService(user_id=session.get('user_id'))
-        blog_content = openai_service.generate_blog_post(keyword, secondary_keywords)
-
-        # Post to WordPress
-        wordpress_service = WordPressService()
-        post_data = {
-            'title': blog_content['title'],
-            'content': blog_content['content'],
-            'status': 'draft',
-            'meta': {
-                'seo_title': blog_content['seo_title'],
-                'seo_description': blog_content['seo_description'],
-                'keywords': keyword + (', ' + secondary_keywords if secondary_keywords else '')
-            }
+        payload = {
+            'keyword': keyword,
+            'secondary_keywords': secondary_keywords,
+            'user_id': session.get('user_id'),
+            'bypass_cache': bool(data.get('bypass_cache'))
         }
+        if wants_background(data):
+            return enqueue_job('generate_blog', payload)
 
-        post_result = wordpress_service.create_post(post_data)
-
-        # Save to database
-        conn = sqlite3.connect('seo_automation.db')
-        c = conn.cursor()
-        c.execute('''INSERT INTO posts (wordpress_id, title, content, keywords, created_at)
-                     VALUES (?, ?, ?, ?, ?)''',
-                  (post_result['id'], post_data['title'], post_data['content'],
-                   keyword + (', ' + secondary_keywords if secondary_keywords else ''),
-                   datetime.now()))
-        conn.commit()
-        conn.close()
-
-        logger.info(f"Blog post generated and posted: {post_result['id']}")
-        return jsonify({
-            'post_id': post_result['id'],
-            'title': post_data['title'],
-            'status': 'draft'
-        })
+        return jsonify(generate_and_publish(**payload))
 
     except Exception as e:
         logger.error(f"Error generating blog: {str(e)}")
         return jsonify({'error': str(e)}), 500
+
+
+@blog_bp.route('/generate_blog/bulk', methods=['POST'])
+@token_required
+def generate_blog_bulk():
+    """Queue blog posts for a keyword list.
+
+    Accepts JSON ``{"keywords": [...]}`` (strings or ``{keyword,
+    secondary_keywords}`` objects) or ``{"csv": "..."}``, a ``file`` upload,
+    or a ``text/csv`` body. Runs as a job by default; poll the returned
+    status URL for progress and per-keyword outcomes. ``?async=0`` runs it
+    inline and returns the summary.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        csv_text = data.get('csv')
+        if 'file' in request.files:
+            csv_text = request.files['file'].read().decode('utf-8-sig')
+        elif request.mimetype == 'text/csv':
+            csv_text = request.get_data(as_text=True)
+
+        items = parse_keyword_list(data.get('keywords'), csv_text)
+        if not items:
+            return jsonify({'error': 'At least one keyword is required'}), 400
+
+        max_keywords = int(os.getenv('BULK_BLOG_MAX_KEYWORDS', 500))
+        if len(items) > max_keywords:
+            return jsonify({'error': f'At most {max_keywords} keywords per request'}), 400
+
+        payload = {
+            'items': items,
+            'user_id': session.get('user_id'),
+            'bypass_cache': bool(data.get('bypass_cache'))
+        }
+        if wants_background(data, default=True):
+            # Behind single-post jobs, which someone is usually waiting on
+            return enqueue_job('bulk_blog', payload, priority=-1)
+
+        return jsonify(generate_bulk(**payload))
+
+    except Exception as e:
+        logger.error(f"Error generating bulk blogs: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@blog_bp.route('/generate_blog/stream', methods=['POST'])
+@token_required
+def generate_blog_stream():
+    """Stream the generation as server-sent events, then create the draft.
+
+    Events: ``token`` ({text}) for each chunk of the completion, ``status``
+    while the draft is created, then ``done`` ({post_id, title, status}) or
+    ``error`` ({error}).
+    """
+    data = request.get_json(silent=True) or {}
+    keyword = data.get('keyword')
+    secondary_keywords = data.get('secondary_keywords', '')
+
+    if not keyword:
+        return jsonify({'error': 'Keyword is required'}), 400
+
+    user_id = session.get('user_id')
+    openai_service = OpenAIService(user_id=user_id)
+    if not openai_service.api_key:
+        return jsonify({'error': 'OpenAI API key not configured'}), 400
+
+    def events():
+        parts = []
+        try:
+            for delta in openai_service.stream_blog_post(keyword, secondary_keywords,
+                                                         bypass_cache=bool(data.get('bypass_cache'))):
+                parts.append(delta)
+                yield sse('token', {'text': delta})
+
+            blog_content = openai_service.parse_blog_post(''.join(parts), keyword)
+            yield sse('status', {'message': 'Creating WordPress draft'})
+            post_result, post_data, warning = publish_blog_post(blog_content, keyword, secondary_keywords, user_id)
+
+            logger.info(f"Blog post streamed and posted: {post_result['id']}")
+            done = {'post_id': post_result['id'], 'title': post_data['title'], 'status': 'draft'}
+            if warning:
+                done['warning'] = warning
+            yield sse('done', done)
+
+        except Exception as e:
+            logger.error(f"Error streaming blog: {str(e)}")
+            yield sse('error', {'error': str(e)})
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep nginx-style proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -2,10 +2,31 @@ from flask import Blueprint, request, jsonify
 from app.services.google_service import GoogleService
 from app.utils.auth import token_required
 from app.utils.logger import get_logger
+from app.routes.jobs import enqueue_job, wants_background
 
 gbp_bp = Blueprint('gbp', __name__)
 logger = get_logger()
 
+
+def publish_gbp_post(content, image_url=None, cta_url=None):
+    """Publish to Google Business Profile (shared by the route and the job worker)"""
+    google_service = GoogleService()
+    post_data = {
+        'content': content,
+        'image_url': image_url,
+        'cta_url': cta_url
+    }
+
+    result = google_service.create_gbp_post(post_data)
+
+    logger.info(f"GBP post created: {result.get('post_id')}")
+    return {
+        'post_id': result.get('post_id'),
+        'status': 'published',
+        'message': 'Successfully published to Google Business Profile'
+    }
+
+
 @gbp_bp.route('/gbp_post', methods=['POST'])
 @token_required
 def create_gbp_post():
@@ -21,22 +42,12 @@ def create_gbp_post():
         if len(content) > 1500:  # GBP limit
             return jsonify({'error': 'Content must be 1500 characters or less'}), 400
 
-        google_service = GoogleService()
-        post_data = {
-            'content': content,
-            'image_url': image_url,
-            'cta_url': cta_url
-        }
-
-        result = google_service.create_gbp_post(post_data)
+        payload = {'content': content, 'image_url': image_url, 'cta_url': cta_url}
+        if wants_background(data):
+            return enqueue_job('gbp_post', payload)
 
-        logger.info(f"GBP post created: {result.get('post_id')}")
-        return jsonify({
-            'post_id': result.get('post_id'),
-            'status': 'published',
-            'message': 'Successfully published to Google Business Profile'
-        })
+        return jsonify(publish_gbp_post(**payload))
 
     except Exception as e:
         logger.error(f"Error creating GBP post: {str(e)}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
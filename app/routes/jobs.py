@@ -0,0 +1,52 @@
+from flask import Blueprint, request, jsonify, session
+from app.models import job_manager
+from app.utils.auth import token_required
+from app.utils.logger import get_logger
+import os
+
+jobs_bp = Blueprint('jobs', __name__)
+logger = get_logger()
+
+
+def job_tenant():
+    """Fairness partition for queued work: the signed-in user, else a shared bucket"""
+    return str(session.get('user_id', 'default'))
+
+
+def wants_background(data=None, default=None):
+    """True when the caller asked for a job (``?async=1`` or ``"async": true``)"""
+    value = request.args.get('async')
+    if value is None and isinstance(data, dict):
+        value = data.get('async')
+    if value is None and default is not None:
+        return default
+    if value is None:
+        return os.getenv('JOBS_ASYNC_BY_DEFAULT', 'false').lower() == 'true'
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def enqueue_job(kind, payload, priority=0):
+    """Queue ``kind`` for the workers and answer 202 with where to poll"""
+    job_id = job_manager.enqueue(kind, payload, tenant=job_tenant(), priority=priority)
+    logger.info(f"Job {job_id} queued: {kind}")
+    return jsonify({'job_id': job_id, 'status': 'queued', 'status_url': f'/api/jobs/{job_id}'}), 202
+
+
+@jobs_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def get_job(job_id):
+    try:
+        job = job_manager.get_job(job_id)
+        # Signed-in users only see their own jobs
+        if job is None or ('user_id' in session and session.get('role') != 'admin'
+                           and job['tenant'] != job_tenant()):
+            return jsonify({'error': 'Job not found'}), 404
+
+        for field in ('run_after', 'created_at', 'started_at', 'finished_at'):
+            if job[field] is not None:
+                job[field] = job[field].isoformat()
+        return jsonify(job)
+
+    except Exception as e:
+        logger.error(f"Error getting job {job_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
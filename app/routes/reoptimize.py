@@ -2,13 +2,79 @@ from flask import Blueprint, request, jsonify, session
 from app.services.wordpress_service import WordPressService
 from app.services.semrush_service import SEMrushService
 from app.services.openai_service import OpenAIService
+from app.models import keyword_ranking_manager, post_manager, ranking_history_manager
 from app.utils.auth import token_required
 from app.utils.logger import get_logger
-import sqlite3
+from app.routes.jobs import enqueue_job, wants_background
 
 reoptimize_bp = Blueprint('reoptimize', __name__)
 logger = get_logger()
 
+
+def reoptimize(post_id, keywords='', user_id=None, state=None, save_state=None):
+    """Re-optimize a post if it ranks outside the top 10 (shared by the route and the job worker).
+
+    ``save_state`` is called with ``state`` once WordPress has the rewritten
+    post and again once it is stored locally; passing that state back in on
+    a retry skips the steps already done, so a retried job never rewrites a
+    post twice.
+    """
+    state = dict(state or {})
+    if 'updated' not in state:
+        # Check SEMrush ranking (cached per day, recorded in the ranking history)
+        semrush_service = SEMrushService(ranking_store=keyword_ranking_manager,
+                                         ranking_history=ranking_history_manager)
+        keyword = keywords or 'default'
+        ranking_data = semrush_service.get_keyword_rankings([keyword]).get(keyword, {'position': 100})
+
+        if ranking_data.get('position', 100) <= 10:
+            return {
+                'message': 'Post is already well-ranked, no optimization needed',
+                'current_position': ranking_data.get('position')
+            }
+
+        # Fetch existing post
+        wordpress_service = WordPressService()
+        existing_post = wordpress_service.get_post(post_id)
+
+        # Re-optimize with OpenAI
+        openai_service = OpenAIService(user_id=user_id)
+        optimized_content = openai_service.reoptimize_content(
+            existing_post['content'],
+            keywords or existing_post.get('keywords', '')
+        )
+
+        # Update post
+        update_data = {
+            'title': optimized_content['title'],
+            'content': optimized_content['content'],
+            'meta': {
+                'seo_title': optimized_content['seo_title'],
+                'seo_description': optimized_content['seo_description']
+            }
+        }
+
+        wordpress_service.update_post(post_id, update_data)
+        state['updated'] = {'post_id': post_id, 'title': optimized_content['title'],
+                            'content': optimized_content['content'], 'position': ranking_data.get('position', 'N/A')}
+        if save_state:
+            save_state(state)
+
+    updated = state['updated']
+    if not state.get('recorded'):
+        # Update database
+        post_manager.update_post(post_id, updated['content'], keywords or None, updated['title'])
+        state['recorded'] = True
+        if save_state:
+            save_state(state)
+
+    logger.info(f"Post re-optimized: {post_id}")
+    return {
+        'post_id': post_id,
+        'ranking_change': f"Optimized for better ranking (was position {updated['position']})"
+    }
+
+
 @reoptimize_bp.route('/reoptimize', methods=['POST'])
 @token_required
 def reoptimize_post():
@@ -20,52 +86,11 @@ def reoptimize_post():
         if not post_id:
             return jsonify({'error': 'Post ID is required'}), 400
 
-        # Check SEMrush ranking
-        semrush_service = SEMrushService()
-        ranking_data = semrush_service.get_keyword_ranking(keywords or 'default')
-
-        if ranking_data.get('position', 100) > 10:  # If not in top 10
-            # Fetch existing post
-            wordpress_service = WordPressService()
-            existing_post = wordpress_service.get_post(post_id)
-
-            # Re-optimize with OpenAI
-            openai_service = OpenAIService(user_id=session.get('user_id'))
-            optimized_content = openai_service.reoptimize_content(
-                existing_post['content'],
-                keywords or existing_post.get('keywords', '')
-            )
-
-            # Update post
-            update_data = {
-                'title': optimized_content['title'],
-                'content': optimized_content['content'],
-                'meta': {
-                    'seo_title': optimized_content['seo_title'],
-                    'seo_description': optimized_content['seo_description']
-                }
-            }
+        payload = {'post_id': post_id, 'keywords': keywords, 'user_id': session.get('user_id')}
+        if wants_background(data):
+            return enqueue_job('reoptimize', payload)
 
-            wordpress_service.update_post(post_id, update_data)
-
-            # Update database
-            conn = sqlite3.connect('seo_automation.db')
-            c = conn.cursor()
-            c.execute('''UPDATE posts SET content = ?, keywords = ? WHERE wordpress_id = ?''',
-                      (optimized_content['content'], keywords, post_id))
-            conn.commit()
-            conn.close()
-
-            logger.info(f"Post re-optimized: {post_id}")
-            return jsonify({
-                'post_id': post_id,
-                'ranking_change': f"Optimized for better ranking (was position {ranking_data.get('position', 'N/A')})"
-            })
-        else:
-            return jsonify({
-                'message': 'Post is already well-ranked, no optimization needed',
-                'current_position': ranking_data.get('position')
-            })
+        return jsonify(reoptimize(**payload))
 
     except Exception as e:
         logger.error(f"Error re-optimizing post: {str(e)}")
@@ -1,39 +1,73 @@
-from flask import Blueprint, request, jsonify
-from app.services.wordpress_service import WordPressService
-from app.services.semrush_service import SEMrushService
-from app.services.google_service import GoogleService
+from flask import Blueprint, Response, request, jsonify
 from app.services.report_service import ReportService
+from app.services.stats_collector import stats_collector
 from app.utils.auth import token_required
 from app.utils.logger import get_logger
+from app.utils.stats_cache import StatsCache
+import hashlib
+import json
 
 report_bp = Blueprint('report', __name__)
 logger = get_logger()
 
+# Dashboards poll these endpoints; serve cached stats and refresh in the background
+stats_cache = StatsCache.from_env()
+
+
+# Every loader reads the site-wide services configured in the environment,
+# so all users share one cache entry; partition by user only once a loader
+# reads per-user data
+STATS_SCOPE = 'site'
+
+
+def is_partial(stats):
+    return bool(stats.get('partial'))
+
+
+def conditional_json(payload, cache_state):
+    """JSON response with a content ETag; answers 304 when If-None-Match matches"""
+    body = json.dumps(payload, sort_keys=True, default=str)
+    response = Response(body, mimetype='application/json')
+    response.set_etag(hashlib.sha1(body.encode('utf-8')).hexdigest())
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['X-Cache'] = cache_state.upper()
+    return response.make_conditional(request)
+
+
+def build_report():
+    # Get data from all services in parallel; slow sources come back stale
+    collected = stats_collector.collect()
+
+    # Generate comprehensive report
+    report_service = ReportService()
+    report = report_service.generate_report(collected['data'])
+    report['sources'] = collected['sources']
+    report['partial'] = any(source['status'] != 'ok' for source in collected['sources'].values())
+    return report
+
+
+def build_dashboard_stats():
+    # Simplified stats for dashboard
+    collected = stats_collector.collect(['wordpress', 'semrush'])
+    wordpress_stats = collected['data']['wordpress']
+    semrush_stats = collected['data']['semrush']
+
+    return {
+        'total_posts': wordpress_stats.get('total_posts', 0),
+        'keywords_tracked': semrush_stats.get('total_keywords', 0),
+        'monthly_traffic': semrush_stats.get('organic_traffic', 0),
+        'conversions': semrush_stats.get('conversions', 0),
+        'partial': any(source['status'] != 'ok' for source in collected['sources'].values())
+    }
+
+
 @report_bp.route('/report', methods=['GET'])
 @token_required
 def generate_report():
     try:
-        # Get data from all services
-        wordpress_service = WordPressService()
-        semrush_service = SEMrushService()
-        google_service = GoogleService()
-
-        wordpress_data = wordpress_service.get_stats()
-        semrush_data = semrush_service.get_stats()
-        ga4_data = google_service.get_ga4_stats()
-        gbp_data = google_service.get_gbp_stats()
-
-        # Generate comprehensive report
-        report_service = ReportService()
-        report = report_service.generate_report({
-            'wordpress': wordpress_data,
-            'semrush': semrush_data,
-            'ga4': ga4_data,
-            'gbp': gbp_data
-        })
-
-        logger.info("Report generated successfully")
-        return jsonify(report)
+        report, cache_state = stats_cache.get(STATS_SCOPE, 'report', build_report, partial=is_partial)
+        logger.info(f"Report served ({cache_state})")
+        return conditional_json(report, cache_state)
 
     except Exception as e:
         logger.error(f"Error generating report: {str(e)}")
@@ -43,20 +77,10 @@ def generate_report():
 @token_required
 def get_dashboard_stats():
     try:
-        # Simplified stats for dashboard
-        wordpress_service = WordPressService()
-        semrush_service = SEMrushService()
-
-        wordpress_stats = wordpress_service.get_stats()
-        semrush_stats = semrush_service.get_stats()
-
-        return jsonify({
-            'total_posts': wordpress_stats.get('total_posts', 0),
-            'keywords_tracked': semrush_stats.get('total_keywords', 0),
-            'monthly_traffic': semrush_stats.get('organic_traffic', 0),
-            'conversions': semrush_stats.get('conversions', 0)
-        })
+        stats, cache_state = stats_cache.get(STATS_SCOPE, 'dashboard_stats', build_dashboard_stats,
+                                              partial=is_partial)
+        return conditional_json(stats, cache_state)
 
     except Exception as e:
         logger.error(f"Error getting dashboard stats: {str(e)}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
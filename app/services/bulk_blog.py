@@ -0,0 +1,230 @@
+import csv
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.logger import get_logger
+from app.utils.openai_clients import openai_clients
+
+logger = get_logger()
+
+
+def parse_keyword_list(keywords=None, csv_text=None):
+    """Normalize a bulk request into ``[{'keyword', 'secondary_keywords'}]``.
+
+    ``keywords`` is a JSON list of strings or ``{"keyword", "secondary_keywords"}``
+    objects; ``csv_text`` has one keyword per row with the secondary keywords
+    in an optional second column (a ``keyword`` header row is skipped).
+    Blank rows and repeated keywords (case-insensitive) are dropped.
+    """
+    rows = []
+    for entry in keywords or []:
+        if isinstance(entry, dict):
+            rows.append((entry.get('keyword'), entry.get('secondary_keywords')))
+        else:
+            rows.append((entry, None))
+
+    if csv_text:
+        for n, record in enumerate(csv.reader(io.StringIO(csv_text))):
+            if not record:
+                continue
+            if n == 0 and record[0].strip().lower() == 'keyword':
+                continue
+            rows.append((record[0], record[1] if len(record) > 1 else None))
+
+    items = []
+    seen = set()
+    for keyword, secondary in rows:
+        keyword = str(keyword or '').strip()
+        if not keyword or keyword.lower() in seen:
+            continue
+        seen.add(keyword.lower())
+        items.append({'keyword': keyword, 'secondary_keywords': str(secondary or '').strip()})
+    return items
+
+
+def blog_draft(blog_content, keyword, secondary_keywords=''):
+    """WordPress draft payload for a generated blog post"""
+    return {
+        'title': blog_content['title'],
+        'content': blog_content['content'],
+        'status': 'draft',
+        'meta': {
+            'seo_title': blog_content['seo_title'],
+            'seo_description': blog_content['seo_description'],
+            'keywords': keyword + (', ' + secondary_keywords if secondary_keywords else '')
+        }
+    }
+
+
+class BulkBlogGenerator:
+    """Generate and draft blog posts for a keyword list, ``batch_size`` at a time.
+
+    Each batch is generated concurrently (bounded by the OpenAI client
+    registry's per-key and global limits), its WordPress drafts are created
+    on ``publish_workers`` threads, and the drafted posts are handed to
+    ``record_posts`` in one call. ``progress`` receives a snapshot with the
+    per-item outcomes after every batch. Generation errors fail the item
+    rather than drafting the placeholder post.
+
+    ``checkpoint``, when given, replaces ``progress`` with a durable store:
+    it also receives a snapshot as soon as a batch's drafts exist, before
+    they are recorded, and its errors abort the run, since a retry that
+    cannot see the drafts already created would create them again.
+    """
+
+    def __init__(self, openai_service, wordpress_service, record_posts, batch_size=None, publish_workers=None,
+                 bypass_cache=False, progress=None, checkpoint=None):
+        self.openai = openai_service
+        self.wordpress = wordpress_service
+        self.record_posts = record_posts
+        self.batch_size = batch_size or int(os.getenv('BULK_BLOG_BATCH_SIZE', 10))
+        self.publish_workers = publish_workers or int(os.getenv('BULK_BLOG_PUBLISH_WORKERS', 4))
+        self.bypass_cache = bypass_cache
+        self.progress = progress
+        self.checkpoint = checkpoint
+        self._seconds = {'generate': 0.0, 'publish': 0.0, 'record': 0.0}
+
+    def _generate(self, batch):
+        started = time.monotonic()
+        results = openai_clients.run_all([
+            self.openai.agenerate_blog_post(item['keyword'], item['secondary_keywords'], self.bypass_cache,
+                                            fallback=False)
+            for item in batch
+        ])
+        self._seconds['generate'] += time.monotonic() - started
+
+        generated = []
+        for item, result in zip(batch, results):
+            if isinstance(result, Exception):
+                item.update(status='failed', stage='generate', error=str(result))
+            else:
+                item['draft'] = blog_draft(result, item['keyword'], item['secondary_keywords'])
+                generated.append(item)
+        return generated
+
+    def _create_draft(self, item):
+        try:
+            item['post_id'] = self.wordpress.create_post(item['draft'])['id']
+            item['status'] = 'unrecorded'
+        except Exception as e:
+            item.update(status='failed', stage='publish', error=str(e))
+
+    def _publish(self, batch):
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=min(self.publish_workers, len(batch)) or 1,
+                                thread_name_prefix='bulk-blog-publish') as executor:
+            list(executor.map(self._create_draft, batch))
+        self._seconds['publish'] += time.monotonic() - started
+        return [item for item in batch if 'post_id' in item]
+
+    def _record(self, batch):
+        started = time.monotonic()
+        try:
+            self.record_posts([{'wordpress_id': item['post_id'], 'title': item['draft']['title'],
+                                'content': item['draft']['content'], 'keywords': item['draft']['meta']['keywords']}
+                               for item in batch])
+            for item in batch:
+                item['status'] = 'draft'
+        except Exception as e:
+            # The drafts exist in WordPress; only the local record is missing
+            logger.error(f"Error recording {len(batch)} bulk posts: {str(e)}")
+            for item in batch:
+                item.update(status='failed', stage='record', error=str(e))
+        self._seconds['record'] += time.monotonic() - started
+
+    @staticmethod
+    def _outcome(item):
+        outcome = {'keyword': item['keyword'], 'status': item['status']}
+        if 'post_id' in item:
+            outcome['post_id'] = item['post_id']
+        if 'draft' in item:
+            outcome['title'] = item['draft']['title']
+            if 'post_id' in item and item['status'] != 'draft':
+                # Drafted but not recorded: a retry records it from this
+                outcome['draft'] = item['draft']
+        if 'error' in item:
+            outcome.update(stage=item['stage'], error=item['error'])
+        return outcome
+
+    def _summary(self, total, outcomes, started):
+        elapsed = time.monotonic() - started
+        succeeded = sum(1 for outcome in outcomes if outcome['status'] == 'draft')
+        failed = sum(1 for outcome in outcomes if outcome['status'] == 'failed')
+        return {
+            'total': total,
+            'processed': len(outcomes),
+            'succeeded': succeeded,
+            'failed': failed,
+            'elapsed_seconds': round(elapsed, 3),
+            'posts_per_minute': round(succeeded * 60 / elapsed, 2) if elapsed else 0.0,
+            'stage_seconds': {stage: round(seconds, 3) for stage, seconds in self._seconds.items()},
+            'items': outcomes,
+        }
+
+    def _report(self, snapshot):
+        if not self.progress:
+            return
+        try:
+            self.progress(snapshot)
+        except Exception as e:
+            # Progress is informational; failing the run here would get it retried
+            logger.error(f"Error reporting bulk blog progress: {str(e)}")
+
+    def _save(self, snapshot):
+        if self.checkpoint:
+            self.checkpoint(snapshot)
+        else:
+            self._report(snapshot)
+
+    def _resume(self, items, previous, outcomes):
+        """Split ``items`` into those an earlier run never drafted and those
+        whose drafts it created but did not record; carried-over outcomes
+        are appended to ``outcomes``"""
+        drafted = {outcome['keyword'].lower(): outcome for outcome in (previous or {}).get('items', [])
+                   if outcome['status'] == 'draft' or 'post_id' in outcome}
+        remaining, unrecorded = [], []
+        for item in items:
+            outcome = drafted.get(item['keyword'].lower())
+            if outcome is None:
+                remaining.append(item)
+            elif outcome['status'] != 'draft' and 'draft' in outcome:
+                unrecorded.append(dict(item, post_id=outcome['post_id'], draft=outcome['draft'], status='unrecorded'))
+            else:
+                outcomes.append(outcome)
+        if len(remaining) < len(items):
+            logger.info(f"Bulk blog run resuming: {len(items) - len(remaining)} of {len(items)} keywords "
+                        f"already drafted")
+        return remaining, unrecorded
+
+    def run(self, items, previous=None):
+        """Generate, draft and record ``items``; returns the run summary.
+
+        ``previous`` is the last checkpoint of an interrupted run of the same
+        items: keywords it already drafted in WordPress are carried over, or
+        only recorded, instead of being drafted again.
+        """
+        started = time.monotonic()
+        outcomes = []
+        remaining, unrecorded = self._resume(items, previous, outcomes)
+        if unrecorded:
+            self._record(unrecorded)
+            outcomes.extend(self._outcome(item) for item in unrecorded)
+            self._save(self._summary(len(items), outcomes, started))
+
+        for offset in range(0, len(remaining), self.batch_size):
+            batch = [dict(item) for item in remaining[offset:offset + self.batch_size]]
+            published = self._publish(self._generate(batch))
+            if published:
+                if self.checkpoint:
+                    self.checkpoint(self._summary(len(items), outcomes + [self._outcome(item) for item in batch],
+                                                  started))
+                self._record(published)
+
+            outcomes.extend(self._outcome(item) for item in batch)
+            self._save(self._summary(len(items), outcomes, started))
+
+        summary = self._summary(len(items), outcomes, started)
+        logger.info(f"Bulk blog run: {summary['succeeded']}/{summary['total']} drafted in "
+                    f"{summary['elapsed_seconds']}s ({summary['posts_per_minute']} posts/min)")
+        return summary
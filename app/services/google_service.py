@@ -1,10 +1,15 @@
 import requests
 import os
 from app.utils.logger import get_logger
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from app.utils.http import http_clients, may_have_been_sent
+from app.utils.token_cache import shared_token_cache
 from datetime import datetime, timedelta
 
+
+class GBPPostUnconfirmed(Exception):
+    """A GBP post request failed after it was sent; Google may have created the post"""
+
+
 class GoogleService:
     def __init__(self):
         self.client_id = os.getenv('GOOGLE_CLIENT_ID')
@@ -15,16 +20,19 @@ class GoogleService:
         self.gbp_location_id = os.getenv('GBP_LOCATION_ID')
         self.logger = get_logger()
 
-        # Setup session with retries
-        self.session = requests.Session()
-        retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-        adapter = HTTPAdapter(max_retries=retry)
-        self.session.mount('http://', adapter)
-        self.session.mount('https://', adapter)
+        # Shared keep-alive session with retries and timeouts
+        self.session = http_clients.session('google')
 
-    def _get_access_token(self):
+        # One access token per set of credentials, shared by every instance
+        self.token_url = os.getenv('GOOGLE_TOKEN_URL', 'https://oauth2.googleapis.com/token')
+        self.token_cache = shared_token_cache(
+            (self.token_url, self.client_id, self.refresh_token),
+            self._fetch_access_token,
+            refresh_margin=int(os.getenv('GOOGLE_TOKEN_REFRESH_MARGIN', 300))
+        )
+
+    def _fetch_access_token(self):
         try:
-            url = 'https://oauth2.googleapis.com/token'
             data = {
                 'client_id': self.client_id,
                 'client_secret': self.client_secret,
@@ -32,15 +40,24 @@ class GoogleService:
                 'grant_type': 'refresh_token'
             }
 
-            response = self.session.post(url, data=data)
+            response = self.session.post(self.token_url, data=data)
             response.raise_for_status()
 
-            return response.json()['access_token']
+            result = response.json()
+            return result['access_token'], result.get('expires_in', 3600)
 
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Google OAuth error: {str(e)}")
             raise Exception(f"Failed to get access token: {str(e)}")
 
+    def _get_access_token(self):
+        return self.token_cache.get_token()
+
+    def _check_token_rejected(self, response):
+        if response.status_code == 401:
+            # Revoked or rotated early; fetch a fresh one next time
+            self.token_cache.invalidate()
+
     def create_gbp_post(self, post_data):
         try:
             access_token = self._get_access_token()
@@ -66,6 +83,7 @@ class GoogleService:
             data = {k: v for k, v in data.items() if v is not None}
 
             response = self.session.post(url, json=data, headers=headers)
+            self._check_token_rejected(response)
             response.raise_for_status()
 
             result = response.json()
@@ -77,6 +95,8 @@ class GoogleService:
 
         except requests.exceptions.RequestException as e:
             self.logger.error(f"GBP API error: {str(e)}")
+            if may_have_been_sent(e):
+                raise GBPPostUnconfirmed(f"Failed to create GBP post: {str(e)}")
             raise Exception(f"Failed to create GBP post: {str(e)}")
 
     def get_ga4_stats(self):
@@ -104,6 +124,7 @@ class GoogleService:
             }
 
             response = self.session.post(url, json=data, headers=headers)
+            self._check_token_rejected(response)
             response.raise_for_status()
 
             result = response.json()
@@ -1,9 +1,18 @@
-import openai
+import asyncio
+import json
 import os
-from app.utils.logger import get_logger
+import textwrap
 import time
+from app.utils.logger import get_logger
+from app.utils.content_chunks import chunk_by_headings, count_tokens, tokenizer_name
+from app.utils.generation_cache import generation_cache, generation_key
+from app.utils.openai_clients import openai_clients
 from app.models import api_key_manager
 
+# Bump a template's version whenever its prompt changes, so cached
+# generations made from the old wording are no longer served
+PROMPT_VERSIONS = {'blog_post': 1, 'gbp_content': 1}
+
 class OpenAIService:
     def __init__(self, user_id=None):
         self.logger = get_logger()
@@ -21,13 +30,40 @@ class OpenAIService:
         # Fallback to environment variable
         return os.getenv('OPENAI_API_KEY')
 
-    def generate_blog_post(self, keyword, secondary_keywords=''):
-        if not self.api_key:
-            raise ValueError("OpenAI API key not configured")
+    async def _generate(self, template, inputs, prompt, parse=None, bypass_cache=False, **request):
+        """Completion for ``prompt``, served from the generation cache when possible.
 
-        try:
-            openai.api_key = self.api_key
-            prompt = f"""
+        ``inputs`` are what the prompt was built from and form the cache key
+        together with the template version and request parameters. Only
+        replies that ``parse`` accepts are cached. ``bypass_cache`` forces a
+        fresh generation (which then replaces the cached one).
+        """
+        key = generation_key(request['model'], template, PROMPT_VERSIONS[template], inputs,
+                             request.get('temperature'), request.get('max_tokens'))
+        cached = generation_cache.get(key, bypass=bypass_cache)
+        if cached is not None:
+            return parse(cached) if parse else cached
+
+        started = time.monotonic()
+        response = await openai_clients.complete(
+            self.api_key,
+            messages=[{"role": "user", "content": prompt}],
+            **request
+        )
+        content = response.choices[0].message.content.strip()
+        result = parse(content) if parse else content
+
+        usage = getattr(response, 'usage', None)
+        generation_cache.set(key, content, tokens=getattr(usage, 'total_tokens', None),
+                             latency=round(time.monotonic() - started, 3))
+        return result
+
+    # Model settings shared by the blocking and streaming blog paths
+    BLOG_POST_REQUEST = {'model': "gpt-4", 'max_tokens': 3000, 'temperature': 0.7}
+
+    @staticmethod
+    def _blog_post_prompt(keyword, secondary_keywords):
+        return f"""
             Write a comprehensive, SEO-optimized blog post about "{keyword}".
             Additional keywords to include: {secondary_keywords}
 
@@ -43,85 +79,212 @@ class OpenAIService:
             Format the response as JSON with keys: title, content, seo_title, seo_description, faq
             """
 
-            response = openai.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=3000,
-                temperature=0.7
-            )
+    @staticmethod
+    def _fallback_blog_post(keyword):
+        return {
+            'title': f"Complete Guide to {keyword}",
+            'content': f"<h1>Complete Guide to {keyword}</h1><p>This is a comprehensive guide about {keyword}...</p>",
+            'seo_title': f"{keyword} - Complete Guide 2025",
+            'seo_description': f"Learn everything about {keyword} with this comprehensive guide.",
+            'faq': "<h2>Frequently Asked Questions</h2><p>Q: What is {keyword}?<br>A: {keyword} is...</p>"
+        }
 
-            content = response.choices[0].message.content.strip()
+    def generate_blog_post(self, keyword, secondary_keywords='', bypass_cache=False):
+        return openai_clients.run(self.agenerate_blog_post(keyword, secondary_keywords, bypass_cache))
 
+    async def agenerate_blog_post(self, keyword, secondary_keywords='', bypass_cache=False, fallback=True):
+        """Blog post for ``keyword``; on API errors the placeholder post is
+        returned, or with ``fallback=False`` the error is raised"""
+        if not self.api_key:
+            raise ValueError("OpenAI API key not configured")
+
+        try:
             # Parse JSON response
-            import json
-            result = json.loads(content)
+            result = await self._generate(
+                'blog_post', {'keyword': keyword, 'secondary_keywords': secondary_keywords},
+                self._blog_post_prompt(keyword, secondary_keywords),
+                parse=json.loads,
+                bypass_cache=bypass_cache,
+                **self.BLOG_POST_REQUEST
+            )
 
             self.logger.info(f"Blog post generated for keyword: {keyword}")
             return result
 
         except Exception as e:
             self.logger.error(f"OpenAI blog generation error: {str(e)}")
+            if not fallback:
+                raise
             # Fallback content
-            return {
-                'title': f"Complete Guide to {keyword}",
-                'content': f"<h1>Complete Guide to {keyword}</h1><p>This is a comprehensive guide about {keyword}...</p>",
-                'seo_title': f"{keyword} - Complete Guide 2025",
-                'seo_description': f"Learn everything about {keyword} with this comprehensive guide.",
-                'faq': "<h2>Frequently Asked Questions</h2><p>Q: What is {keyword}?<br>A: {keyword} is...</p>"
-            }
+            return self._fallback_blog_post(keyword)
 
-    def reoptimize_content(self, existing_content, keywords):
+    def stream_blog_post(self, keyword, secondary_keywords='', bypass_cache=False):
+        """Yield the raw completion text for a blog post as it is generated.
+
+        A cached generation is yielded in one piece. The joined text is the
+        same JSON document ``generate_blog_post`` parses; pass it to
+        ``parse_blog_post``.
+        """
         if not self.api_key:
             raise ValueError("OpenAI API key not configured")
 
+        inputs = {'keyword': keyword, 'secondary_keywords': secondary_keywords}
+        key = generation_key(self.BLOG_POST_REQUEST['model'], 'blog_post', PROMPT_VERSIONS['blog_post'], inputs,
+                             self.BLOG_POST_REQUEST['temperature'], self.BLOG_POST_REQUEST['max_tokens'])
+        cached = generation_cache.get(key, bypass=bypass_cache)
+        if cached is not None:
+            yield cached
+            return
+
+        started = time.monotonic()
+        parts = []
+        for delta in openai_clients.stream(
+                self.api_key,
+                messages=[{"role": "user", "content": self._blog_post_prompt(keyword, secondary_keywords)}],
+                **self.BLOG_POST_REQUEST):
+            parts.append(delta)
+            yield delta
+
+        content = ''.join(parts).strip()
         try:
-            openai.api_key = self.api_key
-            prompt = f"""
-            Re-optimize the following blog post content for better SEO performance.
-            Target keywords: {keywords}
+            json.loads(content)
+        except ValueError:
+            return
+        generation_cache.set(key, content, latency=round(time.monotonic() - started, 3))
 
-            Original content:
-            {existing_content}
+    def parse_blog_post(self, content, keyword):
+        """Parse a streamed blog post, falling back like ``generate_blog_post`` does"""
+        try:
+            result = json.loads(content)
+            self.logger.info(f"Blog post generated for keyword: {keyword}")
+            return result
+        except ValueError as e:
+            self.logger.error(f"OpenAI blog generation error: {str(e)}")
+            return self._fallback_blog_post(keyword)
 
-            Requirements:
-            - Improve keyword density and placement
-            - Enhance readability and engagement
-            - Update statistics if needed
-            - Maintain original length approximately
-            - Improve meta title and description
+    def reoptimize_content(self, existing_content, keywords):
+        return openai_clients.run(self.areoptimize_content(existing_content, keywords))
 
-            Return as JSON with keys: title, content, seo_title, seo_description
-            """
+    # Model settings for re-optimization; each chunk asks for at most
+    # REOPTIMIZE_MAX_TOKENS back
+    REOPTIMIZE_REQUEST = {'model': "gpt-4", 'temperature': 0.6}
+    REOPTIMIZE_MAX_TOKENS = 2500
+
+    # Dedented once here, so the indentation is not paid for once per chunk
+    REOPTIMIZE_PROMPT = textwrap.dedent("""
+        Re-optimize {scope} for better SEO performance.
+        Target keywords: {keywords}
+
+        Original content:
+        {content}
+
+        Requirements:
+        - Improve keyword density and placement
+        - Enhance readability and engagement
+        - Update statistics if needed
+        - Maintain original length approximately
+        - Keep the HTML structure
+        - Improve meta title and description
+
+        Return as JSON with keys: {keys}
+        """).strip()
 
-            response = openai.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=2500,
-                temperature=0.6
+    @classmethod
+    def _reoptimize_prompt(cls, content, keywords, part=0, parts=1):
+        if parts == 1:
+            scope = "the following blog post content"
+            keys = "title, content, seo_title, seo_description"
+        else:
+            scope = f"part {part + 1} of {parts} of a blog post (rewrite only this part, keeping its headings)"
+            keys = "title, content, seo_title, seo_description" if part == 0 else "content"
+        return cls.REOPTIMIZE_PROMPT.format(scope=scope, keywords=keywords, content=content, keys=keys)
+
+    async def _reoptimize_chunk(self, prompt, chunk_tokens):
+        response = await openai_clients.complete(
+            self.api_key,
+            messages=[{"role": "user", "content": prompt}],
+            # JSON-escaped HTML comes back somewhat longer than it went in
+            max_tokens=min(self.REOPTIMIZE_MAX_TOKENS, int(chunk_tokens * 1.5) + 400),
+            **self.REOPTIMIZE_REQUEST
+        )
+        return json.loads(response.choices[0].message.content.strip())
+
+    async def areoptimize_content(self, existing_content, keywords):
+        """Re-optimize a post section by section.
+
+        The post is split at headings into chunks of REOPTIMIZE_CHUNK_TOKENS
+        whose prompts carry compacted markup (see ``app.utils.content_chunks``);
+        they are rewritten concurrently and joined back together, and a chunk
+        whose rewrite fails keeps its original HTML untouched. The title and
+        meta come from the first chunk: when it fails they are ``None``,
+        meaning the post keeps its current ones. ``token_usage`` in the result
+        compares the prompt tokens sent with a single prompt carrying the
+        raw content.
+        """
+        if not self.api_key:
+            raise ValueError("OpenAI API key not configured")
+
+        model = self.REOPTIMIZE_REQUEST['model']
+        try:
+            budget = int(os.getenv('REOPTIMIZE_CHUNK_TOKENS', 1500))
+            chunks = chunk_by_headings(existing_content, budget, model)
+            if not chunks:
+                raise ValueError("Post has no content to re-optimize")
+
+            prompts = [self._reoptimize_prompt(chunk.compact, keywords, part, len(chunks))
+                       for part, chunk in enumerate(chunks)]
+            results = await asyncio.gather(
+                *(self._reoptimize_chunk(prompt, count_tokens(chunk.compact, model))
+                  for prompt, chunk in zip(prompts, chunks)),
+                return_exceptions=True
             )
+            failed = [result for result in results if isinstance(result, Exception)]
+            if len(failed) == len(results):
+                raise failed[0]
+            for error in failed:
+                self.logger.error(f"OpenAI re-optimization chunk error: {str(error)}")
 
-            content = response.choices[0].message.content.strip()
-            import json
-            result = json.loads(content)
+            head = results[0] if not isinstance(results[0], Exception) else {}
+            naive_tokens = count_tokens(self._reoptimize_prompt(existing_content, keywords), model)
+            sent_tokens = sum(count_tokens(prompt, model) for prompt in prompts)
+            result = {
+                'title': head.get('title') or None,
+                'content': ''.join(chunk.original if isinstance(rewrite, Exception) else rewrite['content']
+                                   for chunk, rewrite in zip(chunks, results)),
+                'seo_title': head.get('seo_title') or None,
+                'seo_description': head.get('seo_description') or None,
+                'token_usage': {
+                    'chunks': len(chunks),
+                    'failed_chunks': len(failed),
+                    'tokenizer': tokenizer_name(model),
+                    'naive_prompt_tokens': naive_tokens,
+                    'prompt_tokens': sent_tokens,
+                    'tokens_saved': naive_tokens - sent_tokens,
+                }
+            }
 
-            self.logger.info(f"Content re-optimized for keywords: {keywords}")
+            self.logger.info(f"Content re-optimized for keywords: {keywords} ({len(chunks)} chunks, "
+                             f"{sent_tokens} prompt tokens, {naive_tokens - sent_tokens} saved)")
             return result
 
         except Exception as e:
             self.logger.error(f"OpenAI re-optimization error: {str(e)}")
+            # Leave the post as it was rather than publish placeholder metadata
             return {
-                'title': "Re-optimized Content",
+                'title': None,
                 'content': existing_content,
-                'seo_title': f"Optimized Content - {keywords}",
-                'seo_description': f"Re-optimized content for better SEO performance with keywords: {keywords}"
+                'seo_title': None,
+                'seo_description': None
             }
 
-    def generate_gbp_content(self, topic, max_length=150):
+    def generate_gbp_content(self, topic, max_length=150, bypass_cache=False):
+        return openai_clients.run(self.agenerate_gbp_content(topic, max_length, bypass_cache))
+
+    async def agenerate_gbp_content(self, topic, max_length=150, bypass_cache=False):
         if not self.api_key:
             raise ValueError("OpenAI API key not configured")
 
         try:
-            openai.api_key = self.api_key
             prompt = f"""
             Create engaging content for Google Business Profile post about: {topic}
 
@@ -134,15 +297,14 @@ class OpenAIService:
             Return as plain text.
             """
 
-            response = openai.chat.completions.create(
+            content = await self._generate(
+                'gbp_content', {'topic': topic, 'max_length': max_length}, prompt,
+                bypass_cache=bypass_cache,
                 model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
                 max_tokens=200,
                 temperature=0.8
             )
 
-            content = response.choices[0].message.content.strip()
-
             self.logger.info(f"GBP content generated for topic: {topic}")
             return content
 
@@ -0,0 +1,244 @@
+import os
+import queue
+import threading
+import time
+from datetime import date
+from app.utils.logger import get_logger
+from app.utils.rate_limit import TokenBucket
+
+logger = get_logger()
+
+_STOP = object()
+
+
+class Stage:
+    """One step of the pipeline: ``handler(task)`` with its own workers, rate limit and retries"""
+
+    def __init__(self, name, handler, workers=1, rate=None, burst=None, retries=2, backoff=1.0):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.limiter = TokenBucket(rate, capacity=burst) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._stats = {'processed': 0, 'failed': 0, 'retries': 0, 'busy_seconds': 0.0, 'max_seconds': 0.0}
+
+    @classmethod
+    def from_env(cls, name, handler, workers=1, rate=None):
+        prefix = f'REOPTIMIZE_{name.upper()}'
+        rate = float(os.getenv(f'{prefix}_RATE', rate or 0)) or None
+        return cls(name, handler,
+                   workers=int(os.getenv(f'{prefix}_WORKERS', workers)),
+                   rate=rate,
+                   retries=int(os.getenv('REOPTIMIZE_RETRIES', 2)),
+                   backoff=float(os.getenv('REOPTIMIZE_RETRY_BACKOFF', 1.0)))
+
+    def process(self, task):
+        """Run the handler, retrying with exponential backoff; the last error is raised"""
+        attempt = 0
+        while True:
+            if self.limiter:
+                self.limiter.acquire()
+            started = time.monotonic()
+            try:
+                result = self.handler(task)
+                self._record(time.monotonic() - started)
+                self._count('processed')
+                return result
+            except Exception:
+                self._record(time.monotonic() - started)
+                if attempt >= self.retries:
+                    self._count('failed')
+                    raise
+                self._count('retries')
+                time.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _record(self, elapsed):
+        with self._lock:
+            self._stats['busy_seconds'] += elapsed
+            self._stats['max_seconds'] = max(self._stats['max_seconds'], elapsed)
+
+    def stats(self):
+        with self._lock:
+            calls = self._stats['processed'] + self._stats['failed'] + self._stats['retries']
+            return {
+                'processed': self._stats['processed'],
+                'failed': self._stats['failed'],
+                'retries': self._stats['retries'],
+                'avg_ms': round(self._stats['busy_seconds'] / calls * 1000) if calls else 0,
+                'max_ms': round(self._stats['max_seconds'] * 1000),
+            }
+
+
+class Pipeline:
+    """Runs tasks through ``stages`` with a bounded queue in front of each stage.
+
+    Every stage has its own worker threads, so a slow service only holds up
+    its own stage while the others keep working; full queues push back on the
+    stage before them. A task that exhausts its retries is reported to
+    ``on_failure`` and dropped; one that clears the last stage goes to
+    ``on_success``.
+    """
+
+    def __init__(self, stages, queue_size=None, on_success=None, on_failure=None):
+        self.stages = stages
+        self.queue_size = queue_size or int(os.getenv('REOPTIMIZE_QUEUE_SIZE', 50))
+        self.on_success = on_success or (lambda task: None)
+        self.on_failure = on_failure or (lambda task, stage, error: None)
+
+    def run(self, tasks):
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        remaining = [stage.workers for stage in self.stages]
+        lock = threading.Lock()
+
+        def worker(index):
+            stage, inbox = self.stages[index], queues[index]
+            while True:
+                task = inbox.get()
+                if task is _STOP:
+                    break
+                try:
+                    task = stage.process(task)
+                except Exception as e:
+                    logger.error(f"Re-optimization stage '{stage.name}' failed: {str(e)}")
+                    self._safely(self.on_failure, task, stage.name, e)
+                    continue
+                if task is None:
+                    continue
+                if index + 1 < len(self.stages):
+                    queues[index + 1].put(task)
+                else:
+                    self._safely(self.on_success, task)
+
+            # The last worker of a stage to finish shuts the next stage down
+            with lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last and index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1].workers):
+                    queues[index + 1].put(_STOP)
+
+        threads = [threading.Thread(target=worker, args=(index,), daemon=True,
+                                    name=f'reoptimize-{stage.name}-{n}')
+                   for index, stage in enumerate(self.stages) for n in range(stage.workers)]
+        for thread in threads:
+            thread.start()
+        for task in tasks:
+            queues[0].put(task)
+        for _ in range(self.stages[0].workers):
+            queues[0].put(_STOP)
+        for thread in threads:
+            thread.join()
+
+        return {stage.name: stage.stats() for stage in self.stages}
+
+    @staticmethod
+    def _safely(callback, *args):
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"Re-optimization callback failed: {str(e)}")
+
+
+class ReoptimizationEngine:
+    """Daily re-optimization: rank -> fetch -> rewrite -> publish.
+
+    Rankings are looked up in one batched call (cached, coalesced and rate
+    limited by SEMrushService); posts ranking worse than ``threshold`` then
+    flow through the WordPress fetch, OpenAI rewrite and WordPress publish
+    stages. Each finished or failed post is checkpointed under ``run_key``,
+    so rerunning the same day skips posts that were already published.
+    """
+
+    def __init__(self, semrush_service, wordpress_service, openai_service, checkpoints=None,
+                 threshold=20, run_key=None):
+        self.semrush = semrush_service
+        self.wordpress = wordpress_service
+        self.openai = openai_service
+        self.checkpoints = checkpoints
+        self.threshold = threshold
+        self.run_key = run_key or date.today().isoformat()
+
+    def build_pipeline(self, on_success, on_failure):
+        return Pipeline([
+            Stage.from_env('fetch', self._fetch, workers=4, rate=5),
+            Stage.from_env('rewrite', self._rewrite, workers=2, rate=1),
+            Stage.from_env('publish', self._publish, workers=2, rate=2),
+        ], on_success=on_success, on_failure=on_failure)
+
+    def _fetch(self, task):
+        task['post'] = self.wordpress.get_post(task['wordpress_id'])
+        return task
+
+    def _rewrite(self, task):
+        task['optimized'] = self.openai.reoptimize_content(task['post']['content'], task['keywords'])
+        return task
+
+    def _publish(self, task):
+        optimized = task['optimized']
+        self.wordpress.update_post(task['wordpress_id'], {
+            'content': optimized['content'],
+            'meta': {
+                'seo_title': optimized['seo_title'],
+                'seo_description': optimized['seo_description']
+            }
+        })
+        return task
+
+    def run(self, posts):
+        """Re-optimize ``(id, wordpress_id, keywords)`` posts; returns a run summary"""
+        started = time.monotonic()
+        done = self.checkpoints.get_completed(self.run_key) if self.checkpoints else set()
+
+        tasks = []
+        for post_id, wordpress_id, keywords in posts:
+            if not keywords or post_id in done:
+                continue
+            tasks.append({'post_id': post_id, 'wordpress_id': wordpress_id, 'keywords': keywords,
+                          'primary_keyword': keywords.split(',')[0].strip()})
+
+        rank_started = time.monotonic()
+        rankings = self.semrush.get_keyword_rankings([task['primary_keyword'] for task in tasks])
+        rank_seconds = time.monotonic() - rank_started
+        candidates = [task for task in tasks
+                      if rankings.get(task['primary_keyword'], {'position': 0}).get('position', 100) > self.threshold]
+
+        outcome = {'published': 0, 'failed': 0, 'tokens_saved': 0}
+        outcome_lock = threading.Lock()
+
+        def on_success(task):
+            with outcome_lock:
+                outcome['published'] += 1
+                outcome['tokens_saved'] += task['optimized'].get('token_usage', {}).get('tokens_saved', 0)
+            self._checkpoint(task, 'published')
+            logger.info(f"Re-optimized post {task['wordpress_id']} for keyword: {task['primary_keyword']}")
+
+        def on_failure(task, stage, error):
+            with outcome_lock:
+                outcome['failed'] += 1
+            self._checkpoint(task, 'failed', stage, str(error))
+
+        stages = self.build_pipeline(on_success, on_failure).run(candidates)
+        elapsed = time.monotonic() - started
+        return {
+            'run_key': self.run_key,
+            'posts': len(posts),
+            'already_done': len(done),
+            'candidates': len(candidates),
+            'published': outcome['published'],
+            'failed': outcome['failed'],
+            'prompt_tokens_saved': outcome['tokens_saved'],
+            'elapsed_seconds': round(elapsed, 3),
+            'posts_per_minute': round(outcome['published'] / elapsed * 60, 1) if elapsed > 0 else 0,
+            'stages': {'rank': {'processed': len(tasks), 'elapsed_ms': round(rank_seconds * 1000)}, **stages},
+        }
+
+    def _checkpoint(self, task, status, stage=None, error=None):
+        if self.checkpoints:
+            self.checkpoints.record(self.run_key, task['post_id'], status, stage, error)
@@ -1,21 +1,70 @@
 import requests
+import csv
 import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime
 from app.utils.logger import get_logger
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from app.utils.http import http_clients
+from app.utils.rate_limit import RateLimitTimeout, TokenBucket
+
+# Shared by every SEMrushService in the process: SEMrush limits per API key
+semrush_rate_limiter = TokenBucket(float(os.getenv('SEMRUSH_RATE_LIMIT', 10)),
+                                   capacity=float(os.getenv('SEMRUSH_RATE_BURST', 10)))
+_lookup_executor = None
+_lookup_lock = threading.Lock()
+_in_flight = {}
+
+
+def _get_lookup_executor():
+    global _lookup_executor
+    with _lookup_lock:
+        if _lookup_executor is None:
+            _lookup_executor = ThreadPoolExecutor(max_workers=int(os.getenv('SEMRUSH_MAX_CONCURRENCY', 4)),
+                                                  thread_name_prefix='semrush')
+        return _lookup_executor
+
+OrganicKeyword = namedtuple('OrganicKeyword', 'keyword position search_volume cpc competition')
+
+
+def _number(value, cast):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return cast(0)
+
+
+def parse_organic_lines(lines):
+    """Parse SEMrush's semicolon-separated export (header first) into ``OrganicKeyword``"""
+    header_seen = False
+    for row in csv.reader(lines, delimiter=';'):
+        if not row:
+            continue
+        if not header_seen:
+            # "ERROR 50 :: NOTHING FOUND" is how an empty page is reported
+            if row[0].startswith('ERROR'):
+                return
+            header_seen = True
+            continue
+        keyword, position, volume, cpc, competition = (row + [''] * 5)[:5]
+        yield OrganicKeyword(keyword, _number(position, int), _number(volume, int),
+                             _number(cpc, float), _number(competition, float))
+
 
 class SEMrushService:
-    def __init__(self):
+    def __init__(self, ranking_store=None, ranking_history=None):
         self.api_key = os.getenv('SEMRUSH_API_KEY')
+        # Persistent (keyword, database, day) cache; see KeywordRankingManager
+        self.ranking_store = ranking_store
+        # Time series of fetched positions; see RankingHistoryManager
+        self.ranking_history = ranking_history
         self.base_url = 'https://api.semrush.com'
         self.logger = get_logger()
 
-        # Setup session with retries
-        self.session = requests.Session()
-        retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-        adapter = HTTPAdapter(max_retries=retry)
-        self.session.mount('http://', adapter)
-        self.session.mount('https://', adapter)
+        # Shared keep-alive session with retries and timeouts
+        self.session = http_clients.session('semrush')
 
     def get_keyword_ranking(self, keyword, database='us'):
         try:
@@ -27,6 +76,7 @@ class SEMrushService:
                 'export_columns': 'Ph,Po,Pp,Pd,Nq,Cp,Co,Nr,Td'
             }
 
+            semrush_rate_limiter.acquire(timeout=60)
             response = self.session.get(url, params=params)
             response.raise_for_status()
 
@@ -44,51 +94,187 @@ class SEMrushService:
 
             return {'keyword': keyword, 'position': 0, 'error': 'No data found'}
 
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, RateLimitTimeout) as e:
             self.logger.error(f"SEMrush API error: {str(e)}")
             return {'keyword': keyword, 'position': 0, 'error': str(e)}
 
+    def get_keyword_rankings(self, keywords, database='us'):
+        """Rankings for many keywords with as few SEMrush calls as possible.
+
+        Keywords are deduplicated case-insensitively, answered from today's
+        ranking cache where possible, and the rest are fetched with bounded
+        concurrency under the shared rate limiter. A keyword already being
+        fetched by another thread is awaited rather than requested twice.
+        Returns ``{keyword: result}`` for every keyword passed in.
+        """
+        normalized = {}
+        for keyword in keywords:
+            if keyword and keyword.strip():
+                normalized.setdefault(keyword.strip().lower(), []).append(keyword)
+        if not normalized:
+            return {}
+
+        day = date.today()
+        results = self.ranking_store.get_rankings(list(normalized), database, day) if self.ranking_store else {}
+
+        futures = {}
+        for key in normalized:
+            if key in results:
+                continue
+            with _lookup_lock:
+                future = _in_flight.get((key, database))
+                owner = future is None
+                if owner:
+                    future = _in_flight[(key, database)] = Future()
+            futures[key] = future
+            if owner:
+                _get_lookup_executor().submit(self._fetch_ranking, key, database, future)
+
+        fetched = {}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                results[key] = {'keyword': key, 'position': 0, 'error': str(e)}
+            if 'error' not in results[key]:
+                fetched[key] = results[key]
+
+        if fetched and self.ranking_store:
+            self.ranking_store.save_rankings(fetched, database, day)
+        if fetched and self.ranking_history:
+            self.ranking_history.record_rankings(fetched, database)
+
+        self.logger.info(f"Keyword rankings: {len(keywords)} requested, {len(normalized)} unique, "
+                         f"{len(normalized) - len(futures)} cached, {len(futures)} fetched")
+        return {original: results[key] for key, originals in normalized.items() for original in originals}
+
+    def _fetch_ranking(self, keyword, database, future):
+        try:
+            future.set_result(self.get_keyword_ranking(keyword, database))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with _lookup_lock:
+                _in_flight.pop((keyword, database), None)
+
     def get_domain_organic_keywords(self, domain, database='us', limit=100):
         try:
-            url = f"{self.base_url}/analytics/organic"
+            return [keyword._asdict() for keyword in
+                    self.iter_domain_organic_keywords(domain, database, page_size=limit, max_rows=limit)]
+
+        except (requests.exceptions.RequestException, RateLimitTimeout) as e:
+            self.logger.error(f"SEMrush organic keywords error: {str(e)}")
+            return []
+
+    def iter_domain_organic_keywords(self, domain, database='us', page_size=None, start_offset=0, max_rows=None):
+        """Yield ``OrganicKeyword`` tuples for ``domain``, one page at a time.
+
+        Pages are requested with ``display_offset`` and parsed line by line
+        from the streamed response, so memory stays bounded by one line no
+        matter how many keywords the domain has. Stops after a short page,
+        an empty result, or ``max_rows`` rows.
+        """
+        page_size = page_size or int(os.getenv('SEMRUSH_ORGANIC_PAGE_SIZE', 10000))
+        offset, yielded = start_offset, 0
+        while max_rows is None or yielded < max_rows:
+            limit = page_size if max_rows is None else min(page_size, max_rows - yielded)
             params = {
                 'key': self.api_key,
                 'domain': domain,
                 'database': database,
                 'display_limit': limit,
+                'display_offset': offset,
                 'export_columns': 'Ph,Po,Nq,Cp,Co'
             }
 
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
+            semrush_rate_limiter.acquire(timeout=60)
+            page_rows = 0
+            with self.session.get(f"{self.base_url}/analytics/organic", params=params, stream=True) as response:
+                response.raise_for_status()
+                for keyword in parse_organic_lines(response.iter_lines(decode_unicode=True)):
+                    page_rows += 1
+                    yield keyword
 
-            data = response.json()
-            keywords = []
-            for item in data:
-                keywords.append({
-                    'keyword': item.get('Ph'),
-                    'position': int(item.get('Po', 0)),
-                    'search_volume': int(item.get('Nq', 0)),
-                    'cpc': float(item.get('Cp', 0)),
-                    'competition': item.get('Co')
-                })
-
-            return keywords
-
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"SEMrush organic keywords error: {str(e)}")
-            return []
+            offset += page_rows
+            yielded += page_rows
+            if page_rows < limit:
+                return
+
+    def ingest_domain_organic_keywords(self, domain, database='us', sink=None, checkpoints=None,
+                                       batch_size=1000, page_size=None):
+        """Stream every organic keyword of ``domain`` into ``sink`` in batches.
 
-    def get_stats(self):
+        ``sink(rows, database, captured_at)`` receives lists of
+        ``OrganicKeyword``; by default the ranking history. After each batch
+        the next offset is saved to ``checkpoints`` so an interrupted run
+        resumes where it stopped; when SEMrush fails mid-run (an HTTP error or
+        a rate-limit timeout) the rows already fetched are stored and
+        checkpointed before the error is raised. Returns a throughput summary.
+        """
+        if sink is None or checkpoints is None:
+            from app.models import organic_ingest_checkpoint_manager, ranking_history_manager
+            sink = sink or ranking_history_manager.record_samples
+            checkpoints = checkpoints or organic_ingest_checkpoint_manager
+
+        checkpoint = checkpoints.get_checkpoint(domain, database)
+        resumed = checkpoint is not None and checkpoint['completed_at'] is None
+        offset = checkpoint['next_offset'] if resumed else 0
+        total = checkpoint['rows_ingested'] if resumed else 0
+        captured_at = datetime.now()
+
+        started = time.monotonic()
+        rows = batches = 0
+        batch = []
         try:
-            # Mock stats for demonstration - in real implementation,
-            # this would aggregate data from multiple keyword queries
-            return {
-                'total_keywords': 150,
-                'organic_traffic': 25000,
-                'average_position': 12.5,
-                'conversions': 1250
-            }
+            for keyword in self.iter_domain_organic_keywords(domain, database, page_size, start_offset=offset):
+                batch.append(keyword)
+                if len(batch) >= batch_size:
+                    self._sink_batch(sink, batch, database, captured_at, offset + rows)
+                    rows, batches = rows + len(batch), batches + 1
+                    checkpoints.save_checkpoint(domain, database, offset + rows, total + rows)
+                    batch = []
+        except (requests.exceptions.RequestException, RateLimitTimeout) as e:
+            self.logger.error(f"SEMrush organic keywords error for {domain} at offset {offset + rows + len(batch)}: "
+                              f"{str(e)}")
+            if batch:
+                self._sink_batch(sink, batch, database, captured_at, offset + rows)
+                rows += len(batch)
+                checkpoints.save_checkpoint(domain, database, offset + rows, total + rows)
+            raise
+        if batch:
+            self._sink_batch(sink, batch, database, captured_at, offset + rows)
+            rows, batches = rows + len(batch), batches + 1
+        checkpoints.save_checkpoint(domain, database, offset + rows, total + rows, completed=True)
+
+        elapsed = time.monotonic() - started
+        summary = {
+            'domain': domain,
+            'rows': rows,
+            'batches': batches,
+            'resumed_from': offset if resumed else None,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(rows / elapsed, 1) if elapsed > 0 else float(rows),
+        }
+        self.logger.info(f"Organic keywords ingested for {domain}: {rows} rows in {batches} batches, "
+                         f"{summary['rows_per_second']} rows/s")
+        return summary
+
+    @staticmethod
+    def _sink_batch(sink, batch, database, captured_at, offset):
+        # The checkpoint must not move past rows that were not stored; a batch
+        # with only blank keywords has nothing to store and is fine to skip
+        if not any(row.keyword and row.keyword.strip() for row in batch):
+            return
+        if not sink(batch, database, captured_at):
+            raise RuntimeError(f"Organic keyword batch at offset {offset} was not stored")
+
+    def get_stats(self, database='us'):
+        """Ranking stats computed from the stored history; no SEMrush calls"""
+        try:
+            history = self.ranking_history
+            if history is None:
+                from app.models import ranking_history_manager as history
+            return history.get_summary(database, days=int(os.getenv('SEMRUSH_STATS_WINDOW_DAYS', 30)))
 
         except Exception as e:
             self.logger.error(f"SEMrush stats error: {str(e)}")
@@ -97,4 +283,4 @@ class SEMrushService:
                 'organic_traffic': 0,
                 'average_position': 0,
                 'conversions': 0
-            }
\ No newline at end of file
+            }
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from app.services.wordpress_service import WordPressService
+from app.services.semrush_service import SEMrushService
+from app.services.google_service import GoogleService
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+
+def default_sources():
+    """Report data sources, keyed by the names ReportService.generate_report expects"""
+    google_service = GoogleService()
+    return {
+        'wordpress': WordPressService().get_stats,
+        'semrush': SEMrushService().get_stats,
+        'ga4': google_service.get_ga4_stats,
+        'gbp': google_service.get_gbp_stats,
+    }
+
+
+class StatsCollector:
+    """Fetches every report source in parallel with a deadline per source.
+
+    A source that errors or misses its deadline does not fail the report:
+    its last good result is served instead and marked ``stale`` (or
+    ``unavailable`` if it has never succeeded). Calls that time out keep
+    running in the shared pool and refresh the last good value when they
+    finish. Total latency is roughly the slowest source, capped by its
+    deadline, instead of the sum of all of them.
+    """
+
+    def __init__(self, sources=None, timeout=None, max_workers=None):
+        self.sources = sources
+        self.timeout = timeout if timeout is not None else float(os.getenv('REPORT_SOURCE_TIMEOUT', 10))
+        self.max_workers = max_workers or int(os.getenv('REPORT_COLLECTOR_WORKERS', 8))
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._last_good = {}
+
+    def deadline_for(self, name):
+        return float(os.getenv(f'REPORT_{name.upper()}_TIMEOUT', self.timeout))
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='stats-collector')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _call(self, name, fn):
+        started = time.monotonic()
+        result = fn()
+        with self._lock:
+            self._last_good[name] = (result, datetime.now())
+        return result, time.monotonic() - started
+
+    def collect(self, names=None):
+        """Return ``{'data': {source: stats}, 'sources': {source: status}}``"""
+        sources = self.sources if self.sources is not None else default_sources()
+        if names is not None:
+            sources = {name: sources[name] for name in names}
+
+        executor = self._get_executor()
+        started = time.monotonic()
+        futures = {name: executor.submit(self._call, name, fn) for name, fn in sources.items()}
+
+        data, statuses = {}, {}
+        for name, future in futures.items():
+            remaining = self.deadline_for(name) - (time.monotonic() - started)
+            try:
+                data[name], elapsed = future.result(timeout=max(0, remaining))
+                statuses[name] = {'status': 'ok', 'elapsed_ms': round(elapsed * 1000)}
+            except FutureTimeoutError:
+                logger.warning(f"Report source '{name}' missed its {self.deadline_for(name)}s deadline")
+                data[name], statuses[name] = self._fallback(name, 'timeout')
+            except Exception as e:
+                logger.error(f"Report source '{name}' failed: {str(e)}")
+                data[name], statuses[name] = self._fallback(name, str(e))
+
+        return {'data': data, 'sources': statuses}
+
+    def _fallback(self, name, reason):
+        with self._lock:
+            last_good = self._last_good.get(name)
+        if last_good is None:
+            return {}, {'status': 'unavailable', 'error': reason}
+        result, fetched_at = last_good
+        return result, {'status': 'stale', 'error': reason, 'as_of': fetched_at.isoformat()}
+
+
+stats_collector = StatsCollector()
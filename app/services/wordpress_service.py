@@ -1,8 +1,7 @@
 import requests
 import os
 from app.utils.logger import get_logger
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from app.utils.http import http_clients
 
 class WordPressService:
     def __init__(self):
@@ -11,12 +10,8 @@ class WordPressService:
         self.app_password = os.getenv('WP_APP_PASSWORD')
         self.logger = get_logger()
 
-        # Setup session with retries
-        self.session = requests.Session()
-        retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-        adapter = HTTPAdapter(max_retries=retry)
-        self.session.mount('http://', adapter)
-        self.session.mount('https://', adapter)
+        # Shared keep-alive session with retries and timeouts
+        self.session = http_clients.session('wordpress')
 
     def _get_auth_headers(self):
         import base64
@@ -68,11 +63,13 @@ class WordPressService:
             headers = self._get_auth_headers()
             headers['Content-Type'] = 'application/json'
 
+            # Fields left as None keep their current value in WordPress
             data = {
                 'title': post_data.get('title'),
                 'content': post_data.get('content'),
-                'meta': post_data.get('meta', {})
+                'meta': {key: value for key, value in post_data.get('meta', {}).items() if value is not None}
             }
+            data = {key: value for key, value in data.items() if value is not None and value != {}}
 
             response = self.session.put(url, json=data, headers=headers)
             response.raise_for_status()
@@ -0,0 +1,177 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+import psycopg2
+from psycopg2.extras import execute_values
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+_STOP = object()
+
+
+class ActivityLogWriter:
+    """Write-behind queue for activity log rows and last-login timestamps.
+
+    Events are buffered in a bounded queue and flushed by a background thread
+    every ``batch_size`` events or ``flush_interval`` seconds, whichever comes
+    first, as one multi-row INSERT plus one set-based UPDATE. When the queue
+    is full the caller waits up to ``put_timeout`` seconds and then writes its
+    event synchronously, so memory stays bounded without losing events.
+    """
+
+    def __init__(self, db, batch_size=100, flush_interval=0.5, max_queue=10000,
+                 put_timeout=0.05, max_retries=3):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._atexit_registered = False
+        self._stats = {'enqueued': 0, 'flushed': 0, 'batches': 0, 'sync_writes': 0, 'dropped': 0}
+
+    @classmethod
+    def from_env(cls, db):
+        return cls(
+            db,
+            batch_size=int(os.getenv('ACTIVITY_LOG_BATCH_SIZE', 100)),
+            flush_interval=int(os.getenv('ACTIVITY_LOG_FLUSH_MS', 500)) / 1000,
+            max_queue=int(os.getenv('ACTIVITY_LOG_MAX_QUEUE', 10000)),
+        )
+
+    def log(self, user_id, action, details='', ip_address='unknown'):
+        self._put(('activity', (user_id, action, details, ip_address, datetime.now())))
+
+    def touch_last_login(self, user_id):
+        self._put(('login', (user_id, datetime.now())))
+
+    def _put(self, event):
+        self._ensure_started()
+        try:
+            self._queue.put(event, timeout=self.put_timeout)
+            with self._lock:
+                self._stats['enqueued'] += 1
+        except queue.Full:
+            # Back-pressure: the caller pays for its own write
+            with self._lock:
+                self._stats['sync_writes'] += 1
+            self._write([event])
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Forked child: the parent's queued events are not ours to write
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                event = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                event = None
+
+            if event is _STOP:
+                self._write(batch)
+                return
+            if event is not None:
+                batch.append(event)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write(batch)
+                batch = []
+                deadline = None
+
+    def _execute(self, events):
+        activity_rows = [payload for kind, payload in events if kind == 'activity']
+        last_logins = {}
+        for kind, payload in events:
+            if kind == 'login':
+                user_id, logged_in_at = payload
+                last_logins[user_id] = max(logged_in_at, last_logins.get(user_id, logged_in_at))
+
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            if activity_rows:
+                execute_values(c, '''INSERT INTO activity_logs (user_id, action, details, ip_address, created_at)
+                                     VALUES %s''', activity_rows, page_size=self.batch_size)
+            if last_logins:
+                execute_values(c, '''UPDATE users SET last_login = v.logged_in_at
+                                     FROM (VALUES %s) AS v (id, logged_in_at)
+                                     WHERE users.id = v.id''',
+                               list(last_logins.items()), template='(%s, %s::timestamp)')
+
+    def _write(self, events):
+        if not events:
+            return
+
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self._execute(events)
+                with self._lock:
+                    self._stats['flushed'] += len(events)
+                    self._stats['batches'] += 1
+                return
+            except psycopg2.IntegrityError as e:
+                # A bad row (e.g. an event for a just-deleted user) fails the
+                # same way every time; go straight to isolating it
+                logger.error(f"Error flushing activity logs: {str(e)}")
+                break
+            except Exception as e:
+                logger.error(f"Error flushing activity logs (attempt {attempt}): {str(e)}")
+                time.sleep(min(0.1 * 2 ** attempt, 2))
+
+        if len(events) == 1:
+            with self._lock:
+                self._stats['dropped'] += 1
+            return
+
+        # Write the batch one event at a time so only the offending events are lost
+        for event in events:
+            try:
+                self._execute([event])
+                with self._lock:
+                    self._stats['flushed'] += 1
+            except Exception as e:
+                logger.error(f"Dropping activity event {event[0]} for user {event[1][0]}: {str(e)}")
+                with self._lock:
+                    self._stats['dropped'] += 1
+
+    def close(self, timeout=5):
+        """Flush pending events and stop the writer thread (registered with atexit)"""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("Activity log queue still full at shutdown; pending events may be lost")
+            return
+        thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        return stats
@@ -0,0 +1,166 @@
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded, thread-safe LRU cache whose entries expire after ``ttl`` seconds.
+
+    ``get_or_load`` guards against stale fills: if the key is invalidated while
+    the loader is running, the loaded value is returned but not cached.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, name=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data = OrderedDict()
+        self._generations = {}
+        self._generation = 0
+        self._cleared_at = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return value
+                del self._data[key]
+            self._stats['misses'] += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for ``key`` or compute and cache it"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            generation = (self._generations.get(key, 0), self._cleared_at)
+        value = loader()
+        with self._lock:
+            if (self._generations.get(key, 0), self._cleared_at) == generation:
+                self._store(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            # Generations let get_or_load detect an invalidation that races
+            # with a load. Trimming can only make an in-flight fill be skipped,
+            # never let a stale one through.
+            self._generation += 1
+            if len(self._generations) > self.maxsize * 2:
+                self._generations = {k: v for k, v in self._generations.items() if k in self._data}
+            self._generations[key] = self._generation
+            self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._cleared_at = self._generation
+            self._generations.clear()
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._data)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class CacheInvalidationListener:
+    """Applies cross-worker cache invalidations delivered via Postgres NOTIFY.
+
+    Writers publish ``<cache name>:<key>`` on the configured channel inside
+    their transaction; every worker running a listener drops that key from
+    its local cache once the transaction commits.
+    """
+
+    def __init__(self, connect, channel, caches, reconnect_delay=5):
+        self.connect = connect
+        self.channel = channel
+        self.caches = caches
+        self.reconnect_delay = reconnect_delay
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='cache-invalidation', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def handle(self, payload):
+        name, _, key = payload.partition(':')
+        cache = self.caches.get(name)
+        if cache is None:
+            return
+        if not key:
+            cache.clear()
+            return
+        cache.invalidate(int(key) if key.isdigit() else key)
+
+    def _run(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self.connect()
+                conn.autocommit = True
+                c = conn.cursor()
+                c.execute(f'LISTEN "{self.channel}"')
+                # Anything could have changed while we were disconnected
+                for cache in self.caches.values():
+                    cache.clear()
+                logger.info(f"Listening for cache invalidations on channel {self.channel}")
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.handle(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {str(e)}")
+                self._stop.wait(self.reconnect_delay)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+def cache_from_env(name):
+    """Build a TTLCache sized from CACHE_MAX_ENTRIES / CACHE_TTL"""
+    return TTLCache(
+        maxsize=int(os.getenv('CACHE_MAX_ENTRIES', 1024)),
+        ttl=float(os.getenv('CACHE_TTL', 60)),
+        name=name,
+    )
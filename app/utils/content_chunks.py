@@ -0,0 +1,215 @@
+import html
+import math
+import re
+from collections import namedtuple
+from functools import lru_cache
+from html.parser import HTMLParser
+
+# Attributes worth sending to the model; classes, styles and data-*
+# attributes from the editor only cost tokens. The compacted copy is only
+# ever a prompt: what gets published keeps the original markup.
+KEEP_ATTRIBUTES = {'href', 'src', 'alt', 'title', 'rel', 'target', 'id', 'width', 'height'}
+VOID_TAGS = {'area', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+DROP_TAGS = {'script', 'style', 'noscript'}
+SECTION_HEADING = re.compile(r'<h[1-3][\s>]')
+# Collapse ASCII whitespace only, so &nbsp; survives
+WHITESPACE = re.compile(r'[ \t\n\r\f\v]+')
+
+Chunk = namedtuple('Chunk', 'compact original')
+
+
+@lru_cache(maxsize=8)
+def _encoding(model):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')
+
+
+def tokenizer_name(model='gpt-4'):
+    """'tiktoken' when exact counts are available, else 'estimate'"""
+    return 'tiktoken' if _encoding(model) else 'estimate'
+
+
+def count_tokens(text, model='gpt-4'):
+    """Tokens ``text`` costs with ``model``.
+
+    Exact with the optional ``tiktoken`` package; otherwise estimated at four
+    characters per token, which is close for English prose and markup.
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+class _Compactor(HTMLParser):
+    """Re-serializes HTML without comments, scripts, editor attributes or
+    redundant whitespace, cut into top-level blocks.
+
+    For every block the offset where its original markup ends is kept too,
+    so the source can be cut into the same blocks byte for byte. A closing
+    block-editor comment (``<!-- /wp:... -->``) right after a block belongs
+    to that block.
+    """
+
+    def __init__(self, source):
+        super().__init__(convert_charrefs=True)
+        self.source = source
+        self.blocks = []
+        self.ends = []
+        self._parts = []
+        self._depth = 0
+        self._dropping = 0
+        self._pre = 0
+        self._line_starts = [0] + [m.end() for m in re.finditer('\n', source)]
+        self._trailing = False
+
+    def _offset(self):
+        line, column = self.getpos()
+        return self._line_starts[line - 1] + column
+
+    def _flush(self, end):
+        block = ''.join(self._parts).strip()
+        self._parts = []
+        if block:
+            self.blocks.append(block)
+            self.ends.append(end)
+            self._trailing = True
+
+    def _open(self, tag, attrs, void):
+        self._trailing = False
+        kept = ''.join(f' {name}="{html.escape(value, quote=True)}"'
+                       for name, value in attrs if name in KEEP_ATTRIBUTES and value)
+        self._parts.append(f'<{tag}{kept}>')
+        if void:
+            if self._depth == 0:
+                self._flush(self._offset() + len(self.get_starttag_text()))
+            return
+        if tag == 'pre':
+            self._pre += 1
+        self._depth += 1
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_TAGS:
+            self._dropping += 1
+        elif not self._dropping:
+            self._open(tag, attrs, tag in VOID_TAGS)
+
+    def handle_startendtag(self, tag, attrs):
+        if not self._dropping and tag not in DROP_TAGS:
+            self._open(tag, attrs, True)
+
+    def handle_endtag(self, tag):
+        self._trailing = False
+        if tag in DROP_TAGS:
+            self._dropping = max(0, self._dropping - 1)
+            return
+        if self._dropping or tag in VOID_TAGS:
+            return
+        self._parts.append(f'</{tag}>')
+        if tag == 'pre':
+            self._pre = max(0, self._pre - 1)
+        self._depth = max(0, self._depth - 1)
+        if self._depth == 0:
+            self._flush(self.source.index('>', self._offset()) + 1)
+
+    def handle_comment(self, data):
+        if self._trailing and self._depth == 0 and data.strip().startswith('/'):
+            self.ends[-1] = self.source.index('-->', self._offset()) + 3
+
+    def handle_data(self, data):
+        if self._dropping:
+            return
+        if not self._pre:
+            data = WHITESPACE.sub(' ', data)
+            if self._depth == 0 and not data.strip():
+                return
+        self._trailing = False
+        self._parts.append(html.escape(data, quote=False))
+
+    def close(self):
+        super().close()
+        self._flush(len(self.source))
+
+
+def split_blocks(content):
+    """Top-level blocks of ``content`` as ``Chunk(compact, original)`` pairs.
+
+    Joining the originals gives back ``content`` exactly.
+    """
+    content = content or ''
+    parser = _Compactor(content)
+    parser.feed(content)
+    parser.close()
+
+    chunks = []
+    start = 0
+    for n, (block, end) in enumerate(zip(parser.blocks, parser.ends)):
+        if n == len(parser.blocks) - 1:
+            end = len(content)
+        chunks.append(Chunk(block, content[start:end]))
+        start = end
+    return chunks
+
+
+def compact_blocks(content):
+    """Top-level blocks of ``content`` as compact HTML"""
+    return [chunk.compact for chunk in split_blocks(content)]
+
+
+def compact_html(content):
+    """``content`` with the markup cut down to what affects the rendered post"""
+    return ''.join(compact_blocks(content))
+
+
+def _join(chunks):
+    return Chunk(''.join(chunk.compact for chunk in chunks), ''.join(chunk.original for chunk in chunks))
+
+
+def _pack(pieces, budget, model):
+    """Greedily join ``pieces`` into chunks of at most ``budget`` compact tokens"""
+    chunks = []
+    current, used = [], 0
+    for piece in pieces:
+        tokens = count_tokens(piece.compact, model)
+        if current and used + tokens > budget:
+            chunks.append(_join(current))
+            current, used = [], 0
+        current.append(piece)
+        used += tokens
+    if current:
+        chunks.append(_join(current))
+    return chunks
+
+
+def chunk_by_headings(content, budget, model='gpt-4'):
+    """Split ``content`` into ``Chunk(compact, original)`` pairs of at most
+    ``budget`` tokens of compact HTML.
+
+    Sections start at each h1-h3 and are kept whole where they fit; whole
+    sections are packed together up to the budget, and a section that is
+    larger on its own is split between its blocks. A single block larger
+    than the budget becomes its own chunk. The originals join back into
+    ``content`` byte for byte.
+    """
+    sections = []
+    for block in split_blocks(content):
+        if not sections or SECTION_HEADING.match(block.compact):
+            sections.append([])
+        sections[-1].append(block)
+
+    pieces = []
+    for blocks in sections:
+        section = _join(blocks)
+        if count_tokens(section.compact, model) > budget:
+            pieces.extend(_pack(blocks, budget, model))
+        else:
+            pieces.append(section)
+    return _pack(pieces, budget, model)
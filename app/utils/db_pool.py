@@ -0,0 +1,271 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import extensions
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class _PooledConnection:
+    __slots__ = ('conn', 'created_at', 'last_used', 'uses')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+        self.uses = 0
+
+
+class ConnectionPool:
+    """Thread-safe PostgreSQL connection pool.
+
+    Connections are checked for liveness on checkout and recycled after
+    ``max_uses`` checkouts or ``max_lifetime`` seconds. The pool is bound to
+    the process that created it; after a fork the child starts with an empty
+    pool instead of sharing the parent's sockets.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, max_uses=1000, max_lifetime=3600,
+                 timeout=30, ping_after=30, connect=None):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size: minconn must be <= maxconn and maxconn >= 1")
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_uses = max_uses
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._connect = connect or psycopg2.connect
+        self._cond = threading.Condition()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self._closed = False
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'recycled': 0,
+            'health_check_failures': 0,
+        }
+
+    @classmethod
+    def from_env(cls, dsn, connect=None):
+        """Build a pool sized from DB_POOL_* environment variables"""
+        return cls(
+            dsn,
+            minconn=int(os.getenv('DB_POOL_MIN', 1)),
+            maxconn=int(os.getenv('DB_POOL_MAX', 10)),
+            max_uses=int(os.getenv('DB_POOL_MAX_USES', 1000)),
+            max_lifetime=float(os.getenv('DB_POOL_MAX_LIFETIME', 3600)),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', 30)),
+            ping_after=float(os.getenv('DB_POOL_PING_AFTER', 30)),
+            connect=connect,
+        )
+
+    def _check_pid(self):
+        # Called with the lock held. Connections inherited across fork() must
+        # never be used or closed by the child, so simply forget them.
+        if self._pid != os.getpid():
+            self._reset_state()
+
+    def _open(self):
+        return _PooledConnection(self._connect(self.dsn))
+
+    def _close_quietly(self, pooled):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, pooled, now):
+        if self.max_uses and pooled.uses >= self.max_uses:
+            return True
+        if self.max_lifetime and now - pooled.created_at >= self.max_lifetime:
+            return True
+        return False
+
+    def _is_healthy(self, pooled, now):
+        conn = pooled.conn
+        if conn.closed:
+            return False
+        if self.ping_after is not None and now - pooled.last_used < self.ping_after:
+            return True
+        try:
+            c = conn.cursor()
+            c.execute('SELECT 1')
+            c.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def warm_up(self):
+        """Open connections until the pool holds at least ``minconn``"""
+        while True:
+            with self._cond:
+                self._check_pid()
+                if self._size >= self.minconn:
+                    return
+                self._size += 1
+            try:
+                pooled = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+
+    def getconn(self):
+        """Check out a healthy connection, waiting up to ``timeout`` seconds"""
+        deadline = None
+        waited_since = None
+        while True:
+            pooled = None
+            create = False
+            with self._cond:
+                self._check_pid()
+                if self._closed:
+                    raise PoolTimeoutError("Connection pool is closed")
+                if self._idle:
+                    pooled = self._idle.pop()
+                elif self._size < self.maxconn:
+                    self._size += 1
+                    create = True
+                else:
+                    if waited_since is None:
+                        waited_since = time.monotonic()
+                        deadline = waited_since + self.timeout
+                        self._stats['waits'] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {self.timeout}s waiting for a database connection")
+                    self._cond.wait(remaining)
+                    continue
+
+            now = time.monotonic()
+            key = None
+            if create:
+                try:
+                    pooled = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                if self._is_expired(pooled, now):
+                    key = 'recycled'
+                elif not self._is_healthy(pooled, now):
+                    key = 'health_check_failures'
+            if key is not None:
+                self._close_quietly(pooled)
+                with self._cond:
+                    self._stats[key] += 1
+                    self._size -= 1
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                self._stats['misses' if create else 'hits'] += 1
+                if waited_since is not None:
+                    waited = time.monotonic() - waited_since
+                    self._stats['wait_time_total'] += waited
+                    self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+                pooled.uses += 1
+                self._in_use[id(pooled.conn)] = pooled
+            return pooled.conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, closing it if it should not be reused"""
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            pooled = self._in_use.pop(id(conn), None)
+        if pooled is None:
+            logger.warning("Attempted to return a connection that does not belong to the pool")
+            return
+
+        now = time.monotonic()
+        reusable = not discard and not conn.closed and not self._is_expired(pooled, now)
+        if reusable and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                reusable = False
+
+        with self._cond:
+            if reusable and not self._closed:
+                pooled.last_used = now
+                self._idle.append(pooled)
+            else:
+                if not discard and not conn.closed:
+                    self._stats['recycled'] += 1
+                self._size -= 1
+            self._cond.notify()
+        if not (reusable and not self._closed):
+            self._close_quietly(pooled)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a ``with`` block"""
+        conn = self.getconn()
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def closeall(self):
+        """Close idle connections and refuse further checkouts"""
+        with self._cond:
+            self._check_pid()
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            self._close_quietly(pooled)
+
+    def stats(self):
+        """Return a snapshot of pool counters"""
+        with self._cond:
+            self._check_pid()
+            stats = dict(self._stats)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'minconn': self.minconn,
+                'maxconn': self.maxconn,
+            })
+        checkouts = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / checkouts, 4) if checkouts else 0.0
+        stats['wait_time_avg'] = stats['wait_time_total'] / stats['waits'] if stats['waits'] else 0.0
+        return stats
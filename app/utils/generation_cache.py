@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+
+def generation_key(model, template, version, inputs, temperature, max_tokens=None):
+    """Content address for a completion: same model, prompt template and inputs -> same key"""
+    payload = json.dumps({
+        'model': model,
+        'template': template,
+        'version': version,
+        'inputs': inputs,
+        'temperature': temperature,
+        'max_tokens': max_tokens,
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class GenerationCache:
+    """Disk-backed cache of model generations, shared by every worker on the host.
+
+    Each entry is one JSON file named by its content address, written
+    atomically (temp file + rename). Entries expire after ``ttl`` seconds;
+    when the directory grows past ``max_bytes`` the least recently used
+    entries (by file mtime, bumped on every hit) are removed. Disabled
+    (``directory=None``) every lookup is a miss and nothing is stored.
+    """
+
+    def __init__(self, directory=None, ttl=86400, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+        self._stats = {'hits': 0, 'misses': 0, 'bypassed': 0, 'stores': 0, 'expired': 0, 'evictions': 0,
+                       'tokens_saved': 0, 'latency_saved_seconds': 0.0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            directory=os.getenv('GENERATION_CACHE_DIR') or None,
+            ttl=float(os.getenv('GENERATION_CACHE_TTL', 86400)),
+            max_bytes=int(os.getenv('GENERATION_CACHE_MAX_MB', 256)) * 1024 * 1024,
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def get(self, key, bypass=False):
+        """Return the cached text for ``key`` or None"""
+        if not self.enabled:
+            return None
+        if bypass:
+            self._count('bypassed')
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Generation cache read failed for {key}: {str(e)}")
+            self._count('misses')
+            return None
+
+        if entry['created_at'] + self.ttl < time.time():
+            self._remove(path)
+            self._count('expired')
+            self._count('misses')
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self._stats['hits'] += 1
+            self._stats['tokens_saved'] += entry.get('tokens') or 0
+            self._stats['latency_saved_seconds'] += entry.get('latency') or 0.0
+        return entry['text']
+
+    def set(self, key, text, tokens=None, latency=None):
+        """Store ``text`` with the tokens and seconds it cost to generate"""
+        if not self.enabled:
+            return
+
+        path = self._path(key)
+        body = json.dumps({'text': text, 'created_at': time.time(), 'tokens': tokens, 'latency': latency})
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Generation cache write failed for {key}: {str(e)}")
+            return
+
+        self._count('stores')
+        with self._lock:
+            if self._size is not None:
+                self._size += len(body)
+            over_budget = self._size is None or self._size > self.max_bytes
+        if over_budget:
+            self._evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        """Drop the least recently used entries until the directory is under ``max_bytes``"""
+        entries = self._entries()
+        now = time.time()
+        size = 0
+        live = []
+        for mtime, entry_size, path in entries:
+            # A stale .tmp left by a crashed writer is garbage too
+            if path.endswith('.tmp') and mtime + 60 < now:
+                self._remove(path)
+                continue
+            live.append((mtime, entry_size, path))
+            size += entry_size
+
+        evicted = 0
+        live.sort()
+        for mtime, entry_size, path in live:
+            if size <= self.max_bytes:
+                break
+            self._remove(path)
+            size -= entry_size
+            evicted += 1
+
+        with self._lock:
+            self._size = size
+            self._stats['evictions'] += evicted
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['enabled'] = self.enabled
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['latency_saved_seconds'] = round(stats['latency_saved_seconds'], 3)
+        return stats
+
+
+generation_cache = GenerationCache.from_env()
@@ -0,0 +1,149 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.retry import Retry
+
+# Per-service defaults; each can be overridden with HTTP_<SERVICE>_TIMEOUT,
+# HTTP_<SERVICE>_CONNECT_TIMEOUT and HTTP_<SERVICE>_RETRIES
+SERVICE_DEFAULTS = {
+    'wordpress': {'timeout': 30, 'connect_timeout': 5, 'retries': 3},
+    'semrush': {'timeout': 30, 'connect_timeout': 5, 'retries': 3},
+    'google': {'timeout': 30, 'connect_timeout': 5, 'retries': 3},
+}
+DEFAULT_CONFIG = {'timeout': 30, 'connect_timeout': 5, 'retries': 3}
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default (connect, read) timeout to every request"""
+
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+# Failures that happen before a request is written to the socket
+NOT_SENT_ERRORS = (requests.exceptions.ConnectTimeout, requests.exceptions.SSLError,
+                   requests.exceptions.ProxyError, requests.exceptions.InvalidURL,
+                   requests.exceptions.MissingSchema, requests.exceptions.InvalidSchema,
+                   requests.exceptions.InvalidHeader)
+
+
+def may_have_been_sent(error):
+    """Whether the server may have received the request that raised ``error``.
+
+    Connect timeouts, refused connections, DNS and TLS failures and bad URLs
+    happen before anything is sent, and an HTTP error status means the server
+    answered and rejected it. Anything else (read timeouts, dropped
+    connections, unreadable responses) may have reached the server.
+    """
+    if isinstance(error, NOT_SENT_ERRORS + (requests.exceptions.HTTPError,)):
+        return False
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = getattr(error.args[0], 'reason', error.args[0]) if error.args else None
+        return not isinstance(reason, NewConnectionError)
+    return True
+
+
+class HTTPClientRegistry:
+    """Process-wide ``requests.Session`` per external service.
+
+    Sessions (and the urllib3 keep-alive pools and TLS sessions behind them)
+    live for the whole process instead of one service instance, so routes
+    that build service objects per request still reuse connections. urllib3
+    pools are thread-safe; services must not mutate shared session state
+    such as ``session.headers`` or cookies.
+    """
+
+    def __init__(self, pool_connections=None, pool_maxsize=None):
+        self.pool_connections = pool_connections or int(os.getenv('HTTP_POOL_CONNECTIONS', 10))
+        self.pool_maxsize = pool_maxsize or int(os.getenv('HTTP_POOL_MAXSIZE', 10))
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def config(self, service):
+        config = dict(SERVICE_DEFAULTS.get(service, DEFAULT_CONFIG))
+        prefix = f'HTTP_{service.upper()}_'
+        config['timeout'] = float(os.getenv(prefix + 'TIMEOUT', os.getenv('HTTP_TIMEOUT', config['timeout'])))
+        config['connect_timeout'] = float(os.getenv(prefix + 'CONNECT_TIMEOUT', config['connect_timeout']))
+        config['retries'] = int(os.getenv(prefix + 'RETRIES', config['retries']))
+        return config
+
+    def _build(self, service):
+        config = self.config(service)
+        retry = Retry(total=config['retries'], backoff_factor=1,
+                      status_forcelist=[429, 500, 502, 503, 504])
+        adapter = TimeoutHTTPAdapter(
+            timeout=(config['connect_timeout'], config['timeout']),
+            max_retries=retry,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def session(self, service):
+        """Shared session for ``service`` (created on first use)"""
+        if self._pid != os.getpid():
+            # Sockets inherited across fork must not be shared with the parent
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._sessions = {}
+                    self._pid = os.getpid()
+        session = self._sessions.get(service)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(service)
+                if session is None:
+                    session = self._sessions[service] = self._build(service)
+        return session
+
+    def stats(self):
+        """Requests and new connections per service and host.
+
+        ``reused`` counts requests that went out on an already-open
+        keep-alive connection.
+        """
+        with self._lock:
+            sessions = dict(self._sessions)
+        stats = {}
+        for service, session in sessions.items():
+            hosts = {}
+            adapter = session.get_adapter('https://')
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                hosts[f'{key.key_scheme}://{key.key_host}:{key.key_port}'] = {
+                    'requests': pool.num_requests,
+                    'connections_opened': pool.num_connections,
+                    'reused': max(0, pool.num_requests - pool.num_connections),
+                    'idle': pool.pool.qsize() if pool.pool is not None else 0,
+                }
+            total_requests = sum(host['requests'] for host in hosts.values())
+            total_reused = sum(host['reused'] for host in hosts.values())
+            stats[service] = {
+                'requests': total_requests,
+                'reused': total_reused,
+                'reuse_rate': round(total_reused / total_requests, 4) if total_requests else 0.0,
+                'hosts': hosts,
+            }
+        return stats
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+
+
+http_clients = HTTPClientRegistry()
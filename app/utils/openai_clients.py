@@ -0,0 +1,175 @@
+import asyncio
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+
+class OpenAIClientRegistry:
+    """Process-wide ``AsyncOpenAI`` client per API key, driven by one event loop.
+
+    Clients (and their keep-alive connection pools) are cached per key, least
+    recently used first out once ``max_clients`` is reached, so the global
+    ``openai.api_key`` is never touched. All completions run on a dedicated
+    event-loop thread: sync callers block on :meth:`run`, and coroutines
+    awaited on any other loop are handed over to it. Concurrency is capped
+    per key (``per_key_limit``) and across keys (``global_limit``).
+    """
+
+    def __init__(self, max_clients=None, per_key_limit=None, global_limit=None, timeout=None, max_retries=None,
+                 client_factory=None):
+        self.max_clients = max_clients or int(os.getenv('OPENAI_CLIENT_CACHE_SIZE', 64))
+        self.per_key_limit = per_key_limit or int(os.getenv('OPENAI_MAX_CONCURRENCY_PER_KEY', 4))
+        self.global_limit = global_limit or int(os.getenv('OPENAI_MAX_CONCURRENCY', 16))
+        self.timeout = timeout or float(os.getenv('OPENAI_TIMEOUT', 120))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('OPENAI_MAX_RETRIES', 2))
+        self.client_factory = client_factory or self._build_client
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._reset()
+
+    def _reset(self):
+        self._clients = OrderedDict()
+        self._global = None
+        self._stats = {'completions': 0, 'errors': 0, 'in_flight': 0, 'queued': 0,
+                       'clients_created': 0, 'clients_evicted': 0}
+
+    def _build_client(self, api_key):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=api_key, timeout=self.timeout, max_retries=self.max_retries)
+
+    @property
+    def loop(self):
+        """The registry's event loop, started on first use (and again after fork)"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Clients inherited across fork hold the parent's sockets and loop
+                    self._reset()
+                    self._loop = asyncio.new_event_loop()
+                    threading.Thread(target=self._loop.run_forever, daemon=True, name='openai-loop').start()
+                    self._pid = os.getpid()
+        return self._loop
+
+    def run(self, coro, timeout=None):
+        """Run ``coro`` on the registry loop and block for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def run_all(self, coros, timeout=None):
+        """Run coroutines concurrently; results (or exceptions) come back in order"""
+        async def gather():
+            return await asyncio.gather(*coros, return_exceptions=True)
+        return self.run(gather(), timeout)
+
+    def _entry(self, api_key):
+        # Only called on the registry loop, so no lock is needed around the cache
+        entry = self._clients.get(api_key)
+        if entry is not None:
+            self._clients.move_to_end(api_key)
+            return entry
+
+        entry = self._clients[api_key] = {
+            'client': self.client_factory(api_key),
+            'semaphore': asyncio.Semaphore(self.per_key_limit),
+        }
+        self._stats['clients_created'] += 1
+        while len(self._clients) > self.max_clients:
+            _, evicted = self._clients.popitem(last=False)
+            self._stats['clients_evicted'] += 1
+            if hasattr(evicted['client'], 'close'):
+                self._loop.create_task(self._close_when_idle(evicted))
+        return entry
+
+    async def _close_when_idle(self, entry):
+        # Take every slot so requests still running on the client finish first
+        for _ in range(self.per_key_limit):
+            await entry['semaphore'].acquire()
+        result = entry['client'].close()
+        if asyncio.iscoroutine(result):
+            await result
+
+    async def _complete(self, api_key, **kwargs):
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.global_limit)
+        entry = self._entry(api_key)
+        self._stats['queued'] += 1
+        started = False
+        try:
+            # Per-key slot first, so one busy key cannot hold global slots while it waits
+            async with entry['semaphore'], self._global:
+                self._stats['queued'] -= 1
+                self._stats['in_flight'] += 1
+                started = True
+                try:
+                    response = await entry['client'].chat.completions.create(**kwargs)
+                    self._stats['completions'] += 1
+                    return response
+                except Exception:
+                    self._stats['errors'] += 1
+                    raise
+                finally:
+                    self._stats['in_flight'] -= 1
+        finally:
+            if not started:
+                self._stats['queued'] -= 1
+
+    async def _stream(self, api_key, emit, **kwargs):
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.global_limit)
+        entry = self._entry(api_key)
+        async with entry['semaphore'], self._global:
+            self._stats['in_flight'] += 1
+            try:
+                response = await entry['client'].chat.completions.create(stream=True, **kwargs)
+                async for chunk in response:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        emit(delta)
+                self._stats['completions'] += 1
+            except Exception:
+                self._stats['errors'] += 1
+                raise
+            finally:
+                self._stats['in_flight'] -= 1
+
+    def stream(self, api_key, **kwargs):
+        """Yield the text deltas of a streamed completion as they arrive.
+
+        The request runs on the registry loop under the same caps as
+        :meth:`complete`; closing the generator early (e.g. the HTTP client
+        went away) cancels it.
+        """
+        chunks = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._stream(api_key, lambda delta: chunks.put(delta), **kwargs), self.loop)
+        future.add_done_callback(lambda _: chunks.put(None))
+        try:
+            while True:
+                delta = chunks.get()
+                if delta is None:
+                    break
+                yield delta
+            future.result()
+        finally:
+            future.cancel()
+
+    async def complete(self, api_key, **kwargs):
+        """``chat.completions.create`` with ``api_key``'s client, under the concurrency caps"""
+        loop = self.loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return await self._complete(api_key, **kwargs)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._complete(api_key, **kwargs), loop))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['clients'] = len(self._clients)
+        return stats
+
+
+openai_clients = OpenAIClientRegistry()
@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool already has ``max_pending`` jobs queued"""
+
+    def __init__(self, retry_after=1):
+        super().__init__('Too many concurrent login attempts, please retry shortly')
+        self.retry_after = retry_after
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _checkpw(password, password_hash):
+    return bcrypt.checkpw(password, password_hash)
+
+
+class PasswordHasher:
+    """Runs bcrypt in a small process pool instead of the request thread.
+
+    At most ``max_pending`` hash/verify jobs may be queued or running at once;
+    beyond that callers get ``PasswordHasherBusy`` immediately rather than
+    tying up a web worker thread. ``workers=0`` hashes inline.
+    """
+
+    def __init__(self, rounds=12, workers=2, max_pending=None, timeout=10, retry_after=1):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending if max_pending is not None else max(workers, 1) * 4
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._stats = {'hashed': 0, 'verified': 0, 'rejected': 0, 'rehashed': 0}
+
+    @classmethod
+    def from_env(cls):
+        workers = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+        max_pending = os.getenv('PASSWORD_HASH_MAX_PENDING')
+        return cls(
+            rounds=int(os.getenv('BCRYPT_ROUNDS', 12)),
+            workers=workers,
+            max_pending=int(max_pending) if max_pending else None,
+            timeout=float(os.getenv('PASSWORD_HASH_TIMEOUT', 10)),
+        )
+
+    def _get_executor(self):
+        if self._executor is not None and self._pid == os.getpid():
+            return self._executor
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # spawn, not fork: forking a threaded gunicorn worker is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+                self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise PasswordHasherBusy(self.retry_after)
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            return self._get_executor().submit(fn, *args).result(timeout=self.timeout)
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        password_hash = self._run(_hashpw, password.encode('utf-8'), self.rounds)
+        with self._lock:
+            self._stats['hashed'] += 1
+        return password_hash
+
+    def verify(self, password, password_hash):
+        ok = self._run(_checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+        with self._lock:
+            self._stats['verified'] += 1
+        return ok
+
+    def needs_rehash(self, password_hash):
+        """True when ``password_hash`` was made with a different cost factor"""
+        try:
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def record_rehash(self):
+        with self._lock:
+            self._stats['rehashed'] += 1
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False)
+        self._executor = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(workers=self.workers, rounds=self.rounds, max_pending=self.max_pending)
+        return stats
@@ -0,0 +1,56 @@
+import threading
+import time
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a token could not be acquired within the timeout"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, bursts up to ``capacity``"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {'acquired': 0, 'waited': 0, 'wait_time_total': 0.0}
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                self._stats['acquired'] += 1
+                return True
+            return False
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until ``tokens`` are available; raises RateLimitTimeout after ``timeout``"""
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self._stats['acquired'] += 1
+                    waited = now - started
+                    if waited > 0.001:
+                        self._stats['waited'] += 1
+                        self._stats['wait_time_total'] += waited
+                    return
+                sleep_for = (tokens - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + sleep_for > deadline:
+                raise RateLimitTimeout(f'rate limit: no token within {timeout}s')
+            time.sleep(sleep_for)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
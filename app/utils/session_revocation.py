@@ -0,0 +1,75 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class RevocationList:
+    """In-memory set of revoked session tokens.
+
+    Entries are kept until the session would have expired anyway, after which
+    the JWT itself is rejected and the entry can be pruned. ``watermark`` is
+    the newest ``revoked_at`` seen in the database and drives incremental
+    refreshes.
+    """
+
+    def __init__(self, refresh_interval=30, overlap=timedelta(seconds=60)):
+        self.refresh_interval = refresh_interval
+        # Re-read a window before the watermark so revocations whose
+        # transactions committed out of order are not missed
+        self.overlap = overlap
+        self.watermark = None
+        self._revoked = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._next_refresh = 0.0
+
+    def __len__(self):
+        return len(self._revoked)
+
+    def __contains__(self, session_token):
+        # A plain dict lookup is atomic under the GIL; no lock on the hot path
+        return session_token in self._revoked
+
+    def revoke(self, session_token, expires_at=None):
+        with self._lock:
+            self._revoked[session_token] = expires_at
+
+    def merge(self, rows):
+        """Add ``(session_token, expires_at, revoked_at)`` rows from the database"""
+        with self._lock:
+            for session_token, expires_at, revoked_at in rows:
+                self._revoked[session_token] = expires_at
+                if revoked_at and (self.watermark is None or revoked_at > self.watermark):
+                    self.watermark = revoked_at
+
+    def refresh_since(self):
+        """Lower bound on ``revoked_at`` for the next incremental refresh"""
+        if self.watermark is None:
+            return None
+        return self.watermark - self.overlap
+
+    def prune(self, now=None):
+        now = now or datetime.now()
+        with self._lock:
+            self._revoked = {token: expires_at for token, expires_at in self._revoked.items()
+                             if expires_at is None or expires_at > now}
+
+    def refresh_if_due(self, loader):
+        """Call ``loader(since)`` at most once per ``refresh_interval`` seconds.
+
+        Only one thread refreshes; others keep validating against the current
+        set instead of queueing behind the query.
+        """
+        if time.monotonic() < self._next_refresh:
+            return False
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            if time.monotonic() < self._next_refresh:
+                return False
+            self._next_refresh = time.monotonic() + self.refresh_interval
+            self.merge(loader(self.refresh_since()))
+            self.prune()
+            return True
+        finally:
+            self._refresh_lock.release()
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+
+class InMemoryStatsBackend:
+    """Per-process backend; each worker keeps its own copy"""
+
+    def __init__(self):
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.time():
+                del self._entries[key]
+                return None
+            return entry[0] if entry else None
+
+    def set(self, key, entry, ttl):
+        with self._lock:
+            self._entries[key] = (entry, time.time() + ttl)
+
+    def try_lock(self, key, ttl):
+        with self._lock:
+            if self._locks.get(key, 0) > time.time():
+                return False
+            self._locks[key] = time.time() + ttl
+            return True
+
+    def unlock(self, key):
+        with self._lock:
+            self._locks.pop(key, None)
+
+
+class RedisStatsBackend:
+    """Shared backend for any Redis-compatible server (Redis, Valkey, KeyDB...)"""
+
+    def __init__(self, url, prefix='stats:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("STATS_CACHE_BACKEND=redis requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key, entry, ttl):
+        self.client.setex(self.prefix + key, max(1, int(ttl)), json.dumps(entry, default=str))
+
+    def try_lock(self, key, ttl):
+        # Only one worker across the fleet revalidates a given key
+        return bool(self.client.set(self.prefix + 'lock:' + key, '1', nx=True, ex=max(1, int(ttl))))
+
+    def unlock(self, key):
+        self.client.delete(self.prefix + 'lock:' + key)
+
+
+class StatsCache:
+    """Stale-while-revalidate cache for expensive, slowly changing stats.
+
+    Entries younger than ``ttl`` are served as-is. Older entries (up to
+    ``stale_ttl``) are still served immediately while one background refresh
+    runs, so only the very first request for a key waits on the loader.
+    Values the ``partial`` predicate passed to ``get`` flags (a source timed
+    out) are only fresh for ``partial_ttl``, so they are retried soon.
+    Values must be JSON-serializable.
+    """
+
+    def __init__(self, backend=None, ttl=60, stale_ttl=3600, refresh_workers=2, partial_ttl=5):
+        self.backend = backend or InMemoryStatsBackend()
+        self.ttl = ttl
+        self.partial_ttl = min(partial_ttl, ttl)
+        self.stale_ttl = max(stale_ttl, ttl)
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='stats-refresh')
+        self._fill_locks = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+    @classmethod
+    def from_env(cls):
+        backend = None
+        if os.getenv('STATS_CACHE_BACKEND', 'memory').lower() == 'redis':
+            backend = RedisStatsBackend(os.getenv('STATS_CACHE_REDIS_URL') or os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+        return cls(
+            backend=backend,
+            ttl=float(os.getenv('STATS_CACHE_TTL', 60)),
+            stale_ttl=float(os.getenv('STATS_CACHE_STALE_TTL', 3600)),
+            partial_ttl=float(os.getenv('STATS_CACHE_PARTIAL_TTL', 5)),
+        )
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, scope, name, loader, partial=None):
+        """Return ``(value, state)`` where state is 'hit', 'stale' or 'miss'.
+
+        ``scope`` partitions the cache by whose data the loader reads.
+        """
+        key = f'{scope}:{name}'
+        entry = self._read(key)
+        if entry is not None:
+            if time.time() - entry['stored_at'] < entry.get('ttl', self.ttl):
+                self._count('hits')
+                return entry['value'], 'hit'
+            self._count('stale_hits')
+            self._revalidate(key, loader, partial)
+            return entry['value'], 'stale'
+
+        # Cold key: one caller per process loads it, the others wait
+        with self._lock:
+            fill_lock = self._fill_locks.setdefault(key, threading.Lock())
+        with fill_lock:
+            entry = self._read(key)
+            if entry is not None:
+                self._count('hits')
+                return entry['value'], 'hit'
+            self._count('misses')
+            return self._load(key, loader, partial), 'miss'
+
+    def _read(self, key):
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logger.error(f"Stats cache read failed for {key}: {str(e)}")
+            return None
+
+    def _load(self, key, loader, partial=None):
+        value = loader()
+        ttl = self.partial_ttl if partial and partial(value) else self.ttl
+        try:
+            self.backend.set(key, {'value': value, 'stored_at': time.time(), 'ttl': ttl}, self.stale_ttl)
+        except Exception as e:
+            logger.error(f"Stats cache write failed for {key}: {str(e)}")
+        return value
+
+    def _revalidate(self, key, loader, partial=None):
+        try:
+            if not self.backend.try_lock(key, self.ttl):
+                return
+        except Exception as e:
+            logger.error(f"Stats cache lock failed for {key}: {str(e)}")
+            return
+
+        def refresh():
+            try:
+                self._load(key, loader, partial)
+                self._count('refreshes')
+            except Exception as e:
+                self._count('refresh_errors')
+                logger.error(f"Background stats refresh failed for {key}: {str(e)}")
+            finally:
+                try:
+                    self.backend.unlock(key)
+                except Exception:
+                    pass
+
+        self._executor.submit(refresh)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,116 @@
+import threading
+import time
+from app.utils.logger import get_logger
+
+logger = get_logger()
+
+
+class AccessTokenCache:
+    """Caches an OAuth access token until shortly before it expires.
+
+    ``fetch`` returns ``(access_token, expires_in_seconds)``. Once a token is
+    within ``refresh_margin`` seconds of expiry, callers keep getting the
+    current token while a single background thread fetches the next one.
+    Only when there is no usable token do callers block, and then only one
+    of them hits the token endpoint; the rest wait for its result.
+    """
+
+    def __init__(self, fetch, refresh_margin=300, wait_timeout=30):
+        self.fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.wait_timeout = wait_timeout
+        self._cond = threading.Condition()
+        self._token = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._refreshing = False
+        self._generation = 0
+        self._last_error = None
+        self._stats = {'hits': 0, 'refreshes': 0, 'background_refreshes': 0, 'waits': 0, 'errors': 0}
+
+    def get_token(self):
+        with self._cond:
+            now = time.monotonic()
+            if self._token and now < self._refresh_at:
+                self._stats['hits'] += 1
+                return self._token
+            if self._token and now < self._expires_at:
+                # Still valid: serve it and refresh ahead of expiry
+                self._stats['hits'] += 1
+                if not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh, kwargs={'background': True},
+                                     name='token-refresh', daemon=True).start()
+                return self._token
+
+            if self._refreshing:
+                # Someone else is already fetching; wait for their result
+                self._stats['waits'] += 1
+                generation = self._generation
+                self._cond.wait_for(lambda: self._generation != generation, timeout=self.wait_timeout)
+                if self._token and time.monotonic() < self._expires_at:
+                    return self._token
+                if self._last_error is not None:
+                    raise self._last_error
+            self._refreshing = True
+
+        return self._refresh()
+
+    def _refresh(self, background=False):
+        token, expires_in, error = None, 0, None
+        try:
+            token, expires_in = self.fetch()
+        except Exception as e:
+            error = e
+
+        with self._cond:
+            self._refreshing = False
+            self._generation += 1
+            self._last_error = error
+            if error is None:
+                self._store(token, expires_in)
+                self._stats['background_refreshes' if background else 'refreshes'] += 1
+            else:
+                self._stats['errors'] += 1
+            self._cond.notify_all()
+
+        if error is not None:
+            if background:
+                # The current token is still valid; the next caller retries
+                logger.warning(f"Background token refresh failed: {str(error)}")
+                return None
+            raise error
+        return token
+
+    def _store(self, token, expires_in):
+        now = time.monotonic()
+        expires_in = float(expires_in)
+        self._token = token
+        self._expires_at = now + expires_in
+        # Short-lived tokens refresh halfway through their lifetime
+        self._refresh_at = self._expires_at - min(self.refresh_margin, expires_in / 2)
+
+    def invalidate(self):
+        """Forget the current token, e.g. after the API rejected it with 401"""
+        with self._cond:
+            self._token = None
+            self._expires_at = self._refresh_at = 0.0
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['expires_in'] = max(0, round(self._expires_at - time.monotonic())) if self._token else 0
+        return stats
+
+
+_shared_caches = {}
+_shared_lock = threading.Lock()
+
+
+def shared_token_cache(key, fetch, **kwargs):
+    """Process-wide AccessTokenCache for ``key`` (e.g. token URL + client + refresh token)"""
+    with _shared_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = _shared_caches[key] = AccessTokenCache(fetch, **kwargs)
+        return cache
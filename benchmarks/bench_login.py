@@ -0,0 +1,81 @@
+"""Login throughput: bcrypt inline in request threads vs the bounded worker pool.
+
+Each client thread verifies a password in a loop, standing in for concurrent
+POST /login requests. A probe thread measures how long a trivial request
+waits to be scheduled meanwhile; rejected logins are the ones that would
+have been answered with 429.
+
+    python benchmarks/bench_login.py --clients 8 --rounds 12 --seconds 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.passwords import PasswordHasher, PasswordHasherBusy
+
+
+def measure(hasher, password_hash, clients, seconds):
+    stop = threading.Event()
+    counts = {'ok': 0, 'rejected': 0}
+    latencies = []
+    probe_delays = []
+    lock = threading.Lock()
+
+    def client():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                assert hasher.verify('benchmark-password', password_hash)
+                key = 'ok'
+            except PasswordHasherBusy:
+                key = 'rejected'
+                time.sleep(0.01)
+            with lock:
+                counts[key] += 1
+                if key == 'ok':
+                    latencies.append(time.perf_counter() - start)
+
+    def probe():
+        while not stop.is_set():
+            start = time.perf_counter()
+            time.sleep(0.01)
+            probe_delays.append(time.perf_counter() - start - 0.01)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)] + [threading.Thread(target=probe)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 20 else max(latencies, default=0)
+    return counts['ok'] / seconds, counts['rejected'], p95, max(probe_delays, default=0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8, help='concurrent login threads')
+    parser.add_argument('--rounds', type=int, default=12, help='bcrypt cost factor')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='hashing processes')
+    parser.add_argument('--seconds', type=float, default=5.0, help='duration per mode')
+    args = parser.parse_args()
+
+    password_hash = PasswordHasher(rounds=args.rounds, workers=0).hash('benchmark-password')
+    modes = [
+        ('inline', PasswordHasher(rounds=args.rounds, workers=0, max_pending=args.clients)),
+        ('pool', PasswordHasher(rounds=args.rounds, workers=args.workers)),
+    ]
+
+    print(f"{'mode':>8} {'logins/s':>9} {'rejected':>9} {'p95 ms':>8} {'probe max ms':>13}")
+    for name, hasher in modes:
+        if hasher.workers:
+            hasher.verify('benchmark-password', password_hash)  # start the workers
+        rate, rejected, p95, probe = measure(hasher, password_hash, args.clients, args.seconds)
+        hasher.shutdown()
+        print(f"{name:>8} {rate:>9.1f} {rejected:>9} {p95 * 1000:>8.1f} {probe * 1000:>13.1f}")
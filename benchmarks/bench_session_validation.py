@@ -0,0 +1,54 @@
+"""Session validation throughput: per-call database lookup vs stateless JWT.
+
+Uses a stub database that sleeps for a simulated round trip on every query,
+so the numbers show how much of validation cost is the database.
+
+    python benchmarks/bench_session_validation.py --rtt-ms 1 --seconds 2
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from app.models import SessionManager
+from app.utils.session_revocation import RevocationList
+from benchmarks.stubs import RoundTripDatabase
+
+
+class ActiveSessionDatabase(RoundTripDatabase):
+    def row_exists(self, params):
+        return True
+
+
+def measure(mode, rtt, seconds):
+    db = ActiveSessionDatabase(rtt)
+    manager = SessionManager(db, revocations=RevocationList(refresh_interval=30))
+    manager.validation_mode = mode
+    token = jwt.encode({'user_id': 1, 'session_token': 'bench',
+                        'exp': datetime.utcnow() + timedelta(hours=1)},
+                       manager.jwt_secret, algorithm='HS256')
+
+    validations = 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        assert manager.validate_session(token)['valid']
+        validations += 1
+    elapsed = time.perf_counter() - start
+    return validations / elapsed, db.round_trips, validations
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rtt-ms', type=float, default=1.0, help='simulated round-trip latency')
+    parser.add_argument('--seconds', type=float, default=2.0, help='duration per mode')
+    args = parser.parse_args()
+
+    print(f"{'mode':>10} {'validations/s':>14} {'db queries':>11} {'validations':>12}")
+    for mode in ('database', 'stateless'):
+        rate, queries, total = measure(mode, args.rtt_ms / 1000, args.seconds)
+        print(f"{mode:>10} {rate:>14,.0f} {queries:>11} {total:>12}")
@@ -0,0 +1,61 @@
+"""Round-trip benchmark for saving user settings.
+
+Compares the legacy SELECT-then-UPDATE/INSERT loop with the single
+INSERT ... ON CONFLICT statement used by UserSettingsManager. No database is
+needed: statements are counted by a stub cursor that sleeps for a simulated
+network round trip on every execute.
+
+    python benchmarks/bench_settings_upsert.py --rtt-ms 2
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import UserSettingsManager
+from app.utils.cache import TTLCache
+from benchmarks.stubs import RoundTripDatabase
+
+
+def legacy_update_settings_bulk(db, user_id, settings_dict):
+    """The pre-upsert implementation: a SELECT and a write per key"""
+    with db.connection() as conn:
+        c = conn.cursor()
+        for setting_key, setting_value in settings_dict.items():
+            c.execute('SELECT id FROM user_settings WHERE user_id = %s AND setting_key = %s', (user_id, setting_key))
+            if c.fetchone():
+                c.execute('UPDATE user_settings SET setting_value = %s WHERE user_id = %s AND setting_key = %s',
+                          (setting_value, user_id, setting_key))
+            else:
+                c.execute('INSERT INTO user_settings (user_id, setting_key, setting_value) VALUES (%s, %s, %s)',
+                          (user_id, setting_key, setting_value))
+
+
+def run(sizes, rtt):
+    print(f"{'keys':>6} {'legacy trips':>13} {'upsert trips':>13} {'legacy ms':>10} {'upsert ms':>10}")
+    for size in sizes:
+        settings = {f'setting_{i}': f'value_{i}' for i in range(size)}
+
+        legacy_db = RoundTripDatabase(rtt)
+        start = time.perf_counter()
+        legacy_update_settings_bulk(legacy_db, 1, settings)
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        upsert_db = RoundTripDatabase(rtt)
+        manager = UserSettingsManager(upsert_db, cache=TTLCache(maxsize=10, ttl=60))
+        start = time.perf_counter()
+        manager.update_user_settings_bulk(1, settings)
+        upsert_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{size:>6} {legacy_db.round_trips:>13} {upsert_db.round_trips:>13} "
+              f"{legacy_ms:>10.1f} {upsert_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rtt-ms', type=float, default=1.0, help='simulated round-trip latency')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 25, 50, 100])
+    args = parser.parse_args()
+    run(args.sizes, args.rtt_ms / 1000)
@@ -6,12 +6,15 @@ from dotenv import load_dotenv
 from app.routes.blog import blog_bp
 from app.routes.reoptimize import reoptimize_bp
 from app.routes.gbp import gbp_bp
-from app.routes.report import report_bp
+from app.routes.report import report_bp, stats_cache
 from app.routes.auth import auth_bp
+from app.routes.jobs import jobs_bp
 from app.utils.logger import setup_logger, log_and_notify
 from app.utils.auth import token_required
-from app.models import db_manager, user_manager
-import sqlite3
+from app.models import db_manager, user_manager, start_cache_invalidation_listener
+from app.utils.http import http_clients
+from app.utils.openai_clients import openai_clients
+from app.utils.generation_cache import generation_cache
 from datetime import datetime
 from scheduler import start_scheduler
 
@@ -28,22 +31,33 @@ app.config['SESSION_KEY_PREFIX'] = os.getenv('SESSION_KEY_PREFIX', 'seo_automati
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-super-secret-key-change-this-in-production')
 Session(app)
 
+# Spawned helper processes (the bcrypt pool) re-run this script as
+# __mp_main__ when it is started with `python main.py`; they must not
+# initialize the database or start their own scheduler or listener
+IS_SPAWNED_CHILD = __name__ == '__mp_main__'
+
 # Setup logging
 logger = setup_logger()
 
 # Initialize database (now handled by models.py)
-try:
-    db_manager.init_database()  # Explicitly initialize database
-    logger.info("Database initialization completed")
-except Exception as e:
-    logger.error(f"Database initialization failed: {str(e)}")
-    # Continue without database for now
+if not IS_SPAWNED_CHILD:
+    try:
+        if db_manager.init_database():  # One-time, versioned schema check
+            logger.info("Database initialization completed")
+    except Exception as e:
+        logger.error(f"Database initialization failed: {str(e)}")
+        # Continue without database for now
+
+# Cross-worker invalidation for the API key / settings caches (opt-in)
+if not IS_SPAWNED_CHILD:
+    start_cache_invalidation_listener()
 
 # Register blueprints
 app.register_blueprint(blog_bp, url_prefix='/api')
 app.register_blueprint(reoptimize_bp, url_prefix='/api')
 app.register_blueprint(gbp_bp, url_prefix='/api')
 app.register_blueprint(report_bp, url_prefix='/api')
+app.register_blueprint(jobs_bp, url_prefix='/api')
 app.register_blueprint(auth_bp, url_prefix='')
 
 @app.before_request
@@ -88,6 +102,19 @@ def reports():
 def settings():
     return render_template('settings.html')
 
+@app.route('/api/health')
+def health():
+    return jsonify({
+        'status': 'ok',
+        'database_pool': db_manager.pool_stats(),
+        'activity_log': user_manager.activity_writer.stats() if user_manager.activity_writer else {},
+        'password_hashing': user_manager.hasher.stats(),
+        'http_clients': http_clients.stats(),
+        'openai_clients': openai_clients.stats(),
+        'generation_cache': generation_cache.stats(),
+        'stats_cache': stats_cache.stats()
+    })
+
 
 @app.route('/<path:filename>')
 def serve_static(filename):
@@ -111,7 +138,7 @@ def handle_exception(error):
     return jsonify({'error': 'An unexpected error occurred'}), 500
 
 # Start background scheduler (only in development, disable for production)
-if os.getenv('ENVIRONMENT') != 'production' and os.getenv('RENDER') != 'true':
+if not IS_SPAWNED_CHILD and os.getenv('ENVIRONMENT') != 'production' and os.getenv('RENDER') != 'true':
     scheduler = start_scheduler()
 else:
     scheduler = None
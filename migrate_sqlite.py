@@ -0,0 +1,73 @@
+"""One-shot copy of posts from the legacy SQLite file into Postgres.
+
+    python migrate_sqlite.py [--sqlite seo_automation.db] [--batch-size 1000]
+
+Rows are streamed from SQLite in batches and inserted with one statement per
+batch, so memory stays flat however large the file is. Posts whose
+``wordpress_id`` is already in Postgres are skipped, so an interrupted run
+can simply be started again.
+"""
+import argparse
+import sqlite3
+import time
+from dotenv import load_dotenv
+from app.utils.logger import setup_logger
+
+load_dotenv()
+logger = setup_logger()
+
+LEGACY_POST_COLUMNS = ('user_id', 'wordpress_id', 'title', 'content', 'keywords', 'status',
+                       'created_at', 'updated_at')
+
+
+def migrate_posts(sqlite_path, posts, batch_size=1000):
+    """Copy every legacy post into ``posts`` (a PostManager); returns a summary"""
+    started = time.monotonic()
+    read = inserted = 0
+
+    source = sqlite3.connect(sqlite_path)
+    try:
+        # Older files predate some columns; select what exists and pad the rest
+        available = {row[1] for row in source.execute('PRAGMA table_info(posts)')}
+        if not available:
+            raise RuntimeError(f'{sqlite_path} has no posts table')
+        select = ', '.join(col if col in available else 'NULL' for col in LEGACY_POST_COLUMNS)
+        cursor = source.execute(f'SELECT {select} FROM posts ORDER BY id')
+
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            read += len(batch)
+            inserted += posts.import_posts(batch)
+            logger.info(f"Migrated {read} posts ({inserted} new)")
+    finally:
+        source.close()
+
+    return {
+        'read': read,
+        'inserted': inserted,
+        'skipped': read - inserted,
+        'elapsed_seconds': round(time.monotonic() - started, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Copy posts from the legacy SQLite database into Postgres')
+    parser.add_argument('--sqlite', default='seo_automation.db', help='path to the SQLite file')
+    parser.add_argument('--batch-size', type=int, default=1000, help='rows per INSERT')
+    args = parser.parse_args(argv)
+
+    from app.models import db_manager, post_manager
+    if not db_manager.database_url:
+        logger.error("DATABASE_URL is not set; nothing to migrate into")
+        return 1
+    db_manager.init_database()
+
+    summary = migrate_posts(args.sqlite, post_manager, args.batch_size)
+    logger.info(f"Post migration finished: {summary}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -5,8 +5,12 @@ from app.services.wordpress_service import WordPressService
 from app.services.google_service import GoogleService
 from app.services.openai_service import OpenAIService
 from app.services.report_service import ReportService
+from app.services.stats_collector import stats_collector
+from app.services.reoptimization import ReoptimizationEngine
 from app.utils.logger import get_logger
-import sqlite3
+from app.utils.openai_clients import openai_clients
+from app.retention import run_retention
+import os
 from datetime import datetime
 
 logger = get_logger()
@@ -16,46 +20,26 @@ def check_keyword_rankings():
     try:
         logger.info("Starting daily keyword ranking check")
 
-        semrush_service = SEMrushService()
+        from app.models import (keyword_ranking_manager, post_manager, ranking_history_manager,
+                                reoptimization_checkpoint_manager)
+        semrush_service = SEMrushService(ranking_store=keyword_ranking_manager,
+                                         ranking_history=ranking_history_manager)
         wordpress_service = WordPressService()
         openai_service = OpenAIService()  # Admin/system level - uses env var
 
         # Get posts that need checking
-        conn = sqlite3.connect('seo_automation.db')
-        c = conn.cursor()
-        c.execute('''SELECT id, wordpress_id, keywords FROM posts
-                     WHERE created_at >= date('now', '-30 days')''')
-        posts = c.fetchall()
-        conn.close()
-
-        reoptimized_count = 0
-        for post in posts:
-            post_id, wp_id, keywords = post
-            if keywords:
-                # Check ranking for primary keyword
-                primary_keyword = keywords.split(',')[0].strip()
-                ranking = semrush_service.get_keyword_ranking(primary_keyword)
-
-                if ranking.get('position', 100) > 20:  # If not in top 20
-                    # Re-optimize the post
-                    existing_post = wordpress_service.get_post(wp_id)
-                    optimized = openai_service.reoptimize_content(
-                        existing_post['content'],
-                        keywords
-                    )
-
-                    wordpress_service.update_post(wp_id, {
-                        'content': optimized['content'],
-                        'meta': {
-                            'seo_title': optimized['seo_title'],
-                            'seo_description': optimized['seo_description']
-                        }
-                    })
-
-                    reoptimized_count += 1
-                    logger.info(f"Re-optimized post {wp_id} for keyword: {primary_keyword}")
-
-        logger.info(f"Daily ranking check completed. Re-optimized {reoptimized_count} posts")
+        posts = post_manager.get_recent_posts(days=30)
+
+        # Rank in one batch, then fetch/rewrite/publish in parallel stages
+        engine = ReoptimizationEngine(semrush_service, wordpress_service, openai_service,
+                                      checkpoints=reoptimization_checkpoint_manager)
+        summary = engine.run(posts)
+
+        logger.info(f"Daily ranking check completed. Re-optimized {summary['published']} of "
+                    f"{summary['candidates']} candidate posts ({summary['failed']} failed, "
+                    f"{summary['already_done']} done earlier) in {summary['elapsed_seconds']}s; "
+                    f"stages: {summary['stages']}")
+        return summary
 
     except Exception as e:
         logger.error(f"Error in daily ranking check: {str(e)}")
@@ -77,8 +61,14 @@ def upload_weekly_gbp_photos():
             "Special offers"
         ]
 
-        for topic in topics[:3]:  # Upload 3 posts per week
-            content = openai_service.generate_gbp_content(topic, 100)
+        # Upload 3 posts per week; the copy for all of them is generated concurrently
+        topics = topics[:3]
+        contents = openai_clients.run_all([openai_service.agenerate_gbp_content(topic, 100) for topic in topics])
+
+        for topic, content in zip(topics, contents):
+            if isinstance(content, Exception):
+                logger.error(f"GBP content generation failed for {topic}: {str(content)}")
+                continue
 
             # In a real implementation, you'd have a pool of images
             # For now, we'll skip the image upload
@@ -101,21 +91,14 @@ def generate_monthly_report():
     try:
         logger.info("Starting monthly report generation")
 
-        wordpress_service = WordPressService()
-        semrush_service = SEMrushService()
-        google_service = GoogleService()
         report_service = ReportService()
 
-        # Gather all data
-        data = {
-            'wordpress': wordpress_service.get_stats(),
-            'semrush': semrush_service.get_stats(),
-            'ga4': google_service.get_ga4_stats(),
-            'gbp': google_service.get_gbp_stats()
-        }
+        # Gather all data in parallel
+        collected = stats_collector.collect()
 
         # Generate report
-        report = report_service.generate_report(data)
+        report = report_service.generate_report(collected['data'])
+        report['sources'] = collected['sources']
 
         # Save monthly report
         filename = f"monthly_report_{datetime.now().strftime('%Y_%m')}.json"
@@ -129,6 +112,43 @@ def generate_monthly_report():
     except Exception as e:
         logger.error(f"Error in monthly report generation: {str(e)}")
 
+def ingest_organic_keywords():
+    """Weekly import of every organic keyword SEMRUSH_DOMAIN ranks for"""
+    try:
+        domain = os.getenv('SEMRUSH_DOMAIN')
+        if not domain:
+            return
+
+        logger.info(f"Starting organic keyword ingestion for {domain}")
+        return SEMrushService().ingest_domain_organic_keywords(
+            domain, database=os.getenv('SEMRUSH_DATABASE', 'us'),
+            batch_size=int(os.getenv('SEMRUSH_ORGANIC_BATCH_SIZE', 1000)))
+
+    except Exception as e:
+        # The checkpoint is kept, so the next run resumes from the last stored batch
+        logger.error(f"Error in organic keyword ingestion: {str(e)}")
+
+def apply_data_retention():
+    """Nightly cleanup of expired sessions and old activity log partitions"""
+    try:
+        from app.models import db_manager
+        if not db_manager.database_url:
+            return
+
+        logger.info("Starting data retention")
+        summary = run_retention(db_manager)
+        logger.info(f"Data retention completed in {summary['duration_seconds']}s: "
+                    f"{summary['sessions_deleted']} expired sessions, "
+                    f"{summary['revocations_deleted']} revocations, "
+                    f"{summary['rankings_deleted']} cached rankings, "
+                    f"{summary['activity_rows_deleted']} activity rows deleted; "
+                    f"partitions dropped {summary['partitions_dropped']}, "
+                    f"created {summary['partitions_created']}")
+        return summary
+
+    except Exception as e:
+        logger.error(f"Error in data retention: {str(e)}")
+
 def setup_scheduler():
     """Initialize and configure the scheduler"""
     scheduler = BackgroundScheduler()
@@ -157,6 +177,22 @@ def setup_scheduler():
         name='Monthly Report Generation'
     )
 
+    # Organic keyword import on Sundays at 4 AM
+    scheduler.add_job(
+        ingest_organic_keywords,
+        trigger=CronTrigger(day_of_week='sun', hour=4, minute=0),
+        id='organic_keyword_ingest',
+        name='Weekly Organic Keyword Ingestion'
+    )
+
+    # Retention sweep nightly at 3 AM (also creates upcoming log partitions)
+    scheduler.add_job(
+        apply_data_retention,
+        trigger=CronTrigger(hour=3, minute=0),
+        id='data_retention',
+        name='Session and Activity Log Retention'
+    )
+
     logger.info("Scheduler configured with automated tasks")
     return scheduler
 
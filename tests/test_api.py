@@ -95,4 +95,122 @@ def test_invalid_auth_token(client):
                           headers=headers)
 
     # Should return 401 for invalid token
-    assert response.status_code == 401
\ No newline at end of file
+    assert response.status_code == 401
+
+def test_admin_user_listing_requires_admin(client):
+    """Test that the admin user API rejects anonymous and non-admin sessions"""
+    assert client.get('/api/admin/users').status_code == 401
+
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['role'] = 'user'
+    assert client.get('/api/admin/users/export?format=csv').status_code == 403
+
+
+def test_dashboard_stats_support_etags(client, monkeypatch):
+    """Test that a repeated poll with the returned ETag gets 304 Not Modified"""
+    import app.routes.report as report_routes
+    from app.utils.stats_cache import StatsCache
+    monkeypatch.setenv('AUTH_TOKEN', 'etag-test-token')
+    monkeypatch.setattr(report_routes, 'stats_cache', StatsCache(ttl=60))
+    monkeypatch.setattr(report_routes, 'build_dashboard_stats', lambda: {'total_posts': 5})
+    headers = {'Authorization': 'Bearer etag-test-token'}
+
+    first = client.get('/api/dashboard_stats', headers=headers)
+    assert first.status_code == 200
+    assert first.get_json()['total_posts'] == 5
+
+    second = client.get('/api/dashboard_stats',
+                        headers={**headers, 'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+    assert second.headers['X-Cache'] == 'HIT'
+
+
+def test_blog_generation_streams_server_sent_events(client, monkeypatch):
+    """Test that tokens are forwarded as they arrive and the draft is created at the end"""
+    import app.routes.blog as blog_routes
+    monkeypatch.setenv('AUTH_TOKEN', 'stream-test-token')
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    chunks = ['{"title": "SEO", ', '"content": "<p>Hi</p>", ', '"seo_title": "S", "seo_description": "D"}']
+    monkeypatch.setattr(blog_routes.OpenAIService, 'stream_blog_post', lambda self, *args, **kwargs: iter(chunks))
+    published = []
+    monkeypatch.setattr(blog_routes, 'publish_blog_post',
+                        lambda content, keyword, secondary, user_id=None:
+                        published.append(content) or ({'id': 7}, content, None))
+
+    response = client.post('/api/generate_blog/stream', data=json.dumps({'keyword': 'seo'}),
+                           content_type='application/json',
+                           headers={'Authorization': 'Bearer stream-test-token'})
+
+    assert response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    assert body.count('event: token') == 3
+    assert 'event: done\ndata: {"post_id": 7, "title": "SEO", "status": "draft"}' in body
+    assert published[0]['content'] == '<p>Hi</p>'
+
+
+def test_draft_is_returned_with_a_warning_when_it_cannot_be_recorded(client, monkeypatch):
+    """Test that a missing database does not turn a created draft into an error"""
+    import app.routes.blog as blog_routes
+    monkeypatch.setenv('AUTH_TOKEN', 'record-test-token')
+    monkeypatch.setattr(blog_routes.post_manager.db, 'database_url', None)
+    monkeypatch.setattr(blog_routes.OpenAIService, 'generate_blog_post', lambda self, *args, **kwargs: {})
+    monkeypatch.setattr(blog_routes, 'create_draft', lambda content, keyword, secondary:
+                        ({'id': 7}, {'title': 'SEO', 'content': '<p>Hi</p>', 'meta': {'keywords': keyword}}))
+
+    response = client.post('/api/generate_blog', data=json.dumps({'keyword': 'seo'}),
+                           content_type='application/json',
+                           headers={'Authorization': 'Bearer record-test-token'})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['post_id'], body['status']) == (7, 'draft')
+    assert 'not recorded locally' in body['warning']
+
+
+def test_async_blog_generation_returns_a_job(client, monkeypatch):
+    """Test that ?async=1 queues the work and answers 202 with a job to poll"""
+    import app.routes.jobs as job_routes
+    monkeypatch.setenv('AUTH_TOKEN', 'job-test-token')
+    queued = []
+    monkeypatch.setattr(job_routes.job_manager, 'enqueue',
+                        lambda kind, payload, tenant, priority=0: queued.append((kind, payload, tenant)) or 42)
+
+    response = client.post('/api/generate_blog?async=1', data=json.dumps({'keyword': 'seo'}),
+                           content_type='application/json',
+                           headers={'Authorization': 'Bearer job-test-token'})
+
+    assert response.status_code == 202
+    assert response.get_json() == {'job_id': 42, 'status': 'queued', 'status_url': '/api/jobs/42'}
+    assert queued[0][0] == 'generate_blog'
+    assert queued[0][1]['keyword'] == 'seo'
+
+
+def test_bulk_blog_generation_queues_a_csv_upload(client, monkeypatch):
+    """Test that an uploaded keyword CSV becomes one low-priority bulk job"""
+    import io
+    import app.routes.jobs as job_routes
+    monkeypatch.setenv('AUTH_TOKEN', 'job-test-token')
+    queued = []
+    monkeypatch.setattr(job_routes.job_manager, 'enqueue',
+                        lambda kind, payload, tenant, priority=0: queued.append((kind, payload, priority)) or 7)
+
+    response = client.post('/api/generate_blog/bulk',
+                           data={'file': (io.BytesIO(b'keyword\nseo tools\nlocal seo\n'), 'keywords.csv')},
+                           content_type='multipart/form-data',
+                           headers={'Authorization': 'Bearer job-test-token'})
+
+    assert response.status_code == 202
+    kind, payload, priority = queued[0]
+    assert (kind, priority) == ('bulk_blog', -1)
+    assert [item['keyword'] for item in payload['items']] == ['seo tools', 'local seo']
+
+
+def test_admin_users_next_button_carries_the_cursor():
+    """Test that the next-page cursor survives HTML attribute quoting"""
+    from flask import render_template
+    from main import app
+    with app.test_request_context('/admin/users'):
+        html = render_template('admin_users.html', users=[], next_cursor='eyJpZCI6IDQyfQ==', filters={})
+
+    assert 'data-cursor="eyJpZCI6IDQyfQ==" onclick="goToPage(this.dataset.cursor)"' in html
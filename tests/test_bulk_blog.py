@@ -0,0 +1,123 @@
+import pytest
+from app.services.bulk_blog import BulkBlogGenerator, parse_keyword_list
+
+
+def test_keyword_lists_accept_json_and_csv_and_drop_duplicates():
+    items = parse_keyword_list(
+        ['seo tools', {'keyword': 'local seo', 'secondary_keywords': 'maps'}, ' '],
+        'keyword,secondary_keywords\nSEO Tools,dupe\nlink building,"outreach, guest posts"\n\n'
+    )
+
+    assert items == [
+        {'keyword': 'seo tools', 'secondary_keywords': ''},
+        {'keyword': 'local seo', 'secondary_keywords': 'maps'},
+        {'keyword': 'link building', 'secondary_keywords': 'outreach, guest posts'},
+    ]
+
+
+class FakeOpenAI:
+    async def agenerate_blog_post(self, keyword, secondary_keywords='', bypass_cache=False, fallback=True):
+        if keyword == 'broken':
+            if fallback:
+                return {'title': f'Complete Guide to {keyword}', 'content': '<p>...</p>',
+                        'seo_title': keyword, 'seo_description': keyword}
+            raise TimeoutError('Request timed out')
+        return {'title': keyword.title(), 'content': f'<p>{keyword}</p>',
+                'seo_title': keyword, 'seo_description': keyword}
+
+
+class FakeWordPress:
+    def __init__(self):
+        self.created = []
+
+    def create_post(self, post_data):
+        if post_data['title'] == 'Rejected':
+            raise Exception('Failed to create WordPress post: 403')
+        self.created.append(post_data)
+        return {'id': 100 + len(self.created)}
+
+
+def test_bulk_run_batches_inserts_and_reports_each_keyword():
+    wordpress = FakeWordPress()
+    inserts = []
+    snapshots = []
+    items = parse_keyword_list(['seo', 'broken', 'rejected', 'ppc', 'links'])
+
+    summary = BulkBlogGenerator(FakeOpenAI(), wordpress, inserts.append, batch_size=3, publish_workers=2,
+                                progress=snapshots.append).run(items)
+
+    assert (summary['total'], summary['succeeded'], summary['failed']) == (5, 3, 2)
+    # One multi-row insert per batch with anything drafted
+    assert [len(rows) for rows in inserts] == [1, 2]
+    assert [snapshot['processed'] for snapshot in snapshots] == [3, 5]
+
+    by_keyword = {item['keyword']: item for item in summary['items']}
+    assert by_keyword['broken']['stage'] == 'generate'
+    assert by_keyword['rejected']['stage'] == 'publish'
+    assert by_keyword['seo']['status'] == 'draft'
+    assert by_keyword['seo']['post_id'] in {row['wordpress_id'] for rows in inserts for row in rows}
+    assert set(summary['stage_seconds']) == {'generate', 'publish', 'record'}
+
+
+def test_failed_local_insert_is_reported_per_item():
+    def record_posts(rows):
+        raise Exception('database is locked')
+
+    summary = BulkBlogGenerator(FakeOpenAI(), FakeWordPress(), record_posts, batch_size=5).run(
+        parse_keyword_list(['seo', 'ppc']))
+
+    assert summary['failed'] == 2
+    assert {item['stage'] for item in summary['items']} == {'record'}
+    assert all('post_id' in item for item in summary['items'])
+
+
+def test_resumed_run_skips_keywords_already_drafted():
+    wordpress = FakeWordPress()
+    items = parse_keyword_list(['seo', 'ppc', 'links'])
+    previous = {'items': [{'keyword': 'seo', 'status': 'draft', 'post_id': 7, 'title': 'Seo'},
+                          {'keyword': 'ppc', 'status': 'failed', 'stage': 'record', 'post_id': 8, 'error': 'x'}]}
+
+    def broken_progress(snapshot):
+        raise ConnectionError('server closed the connection')
+
+    summary = BulkBlogGenerator(FakeOpenAI(), wordpress, lambda posts: None, batch_size=5,
+                                progress=broken_progress).run(items, previous=previous)
+
+    assert [post['title'] for post in wordpress.created] == ['Links']
+    assert [item['keyword'] for item in summary['items']] == ['seo', 'ppc', 'links']
+    assert (summary['succeeded'], summary['failed']) == (2, 1)
+
+
+def test_drafts_are_checkpointed_before_recording_and_recorded_on_retry():
+    wordpress = FakeWordPress()
+    items = parse_keyword_list(['seo', 'ppc'])
+    checkpoints = []
+
+    def crash(rows):
+        raise SystemExit('worker killed')
+
+    with pytest.raises(SystemExit):
+        BulkBlogGenerator(FakeOpenAI(), wordpress, crash, batch_size=5, checkpoint=checkpoints.append).run(items)
+    assert [item['status'] for item in checkpoints[-1]['items']] == ['unrecorded', 'unrecorded']
+
+    inserts = []
+    summary = BulkBlogGenerator(FakeOpenAI(), wordpress, inserts.append, batch_size=5,
+                                checkpoint=checkpoints.append).run(items, previous=checkpoints[-1])
+
+    assert len(wordpress.created) == 2
+    assert [row['wordpress_id'] for row in inserts[0]] == [101, 102]
+    assert (summary['succeeded'], summary['failed']) == (2, 0)
+    assert all('draft' not in item for item in summary['items'])
+
+
+def test_checkpoint_errors_stop_the_run():
+    wordpress = FakeWordPress()
+    inserts = []
+
+    def broken_checkpoint(snapshot):
+        raise ConnectionError('server closed the connection')
+
+    with pytest.raises(ConnectionError):
+        BulkBlogGenerator(FakeOpenAI(), wordpress, inserts.append, batch_size=1,
+                          checkpoint=broken_checkpoint).run(parse_keyword_list(['seo', 'ppc']))
+    assert (len(wordpress.created), inserts) == (1, [])
@@ -0,0 +1,48 @@
+import time
+from app.utils.cache import TTLCache, CacheInvalidationListener
+
+
+def test_lru_eviction():
+    """Test that the least recently used entry is evicted first"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire():
+    """Test that entries are dropped after the TTL"""
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache.set('a', 1)
+    time.sleep(0.02)
+
+    assert cache.get('a') is None
+
+
+def test_invalidation_during_load_is_not_cached():
+    """Test that a value loaded across an invalidation is not stored"""
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    def loader():
+        cache.invalidate('a')
+        return 'stale'
+
+    assert cache.get_or_load('a', loader) == 'stale'
+    assert cache.get('a') is None
+
+
+def test_listener_applies_notifications():
+    """Test that NOTIFY payloads invalidate the named cache"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set(42, 'keys')
+    listener = CacheInvalidationListener(None, 'cache_invalidation', {'api_keys': cache})
+
+    listener.handle('api_keys:42')
+    listener.handle('unknown:42')
+
+    assert cache.get(42) is None
@@ -0,0 +1,117 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.utils.content_chunks import chunk_by_headings, compact_html, count_tokens, split_blocks
+
+WORDPRESS_POST = '''
+<!-- wp:heading -->
+<h2 class="wp-block-heading" id="intro">Intro</h2>
+<!-- /wp:heading -->
+
+<!-- wp:paragraph -->
+<p class="has-text-color" style="color:#333">SEO   tools &amp; <a href="/x" data-id="9">links</a></p>
+<!-- /wp:paragraph -->
+<script>track()</script>
+'''
+
+
+def test_markup_is_compacted_without_changing_what_renders():
+    assert compact_html(WORDPRESS_POST) == ('<h2 id="intro">Intro</h2><p>SEO tools &amp; <a href="/x">links</a></p>')
+    assert count_tokens(compact_html(WORDPRESS_POST)) < count_tokens(WORDPRESS_POST) / 2
+
+
+def test_blocks_keep_their_original_markup_byte_for_byte():
+    post = WORDPRESS_POST + '<p>Read&nbsp;<a href="/y" rel="nofollow sponsored" target="_blank" class="x">more</a></p>\n'
+
+    blocks = split_blocks(post)
+
+    assert ''.join(block.original for block in blocks) == post
+    assert blocks[0].original == '\n<!-- wp:heading -->\n<h2 class="wp-block-heading" id="intro">Intro</h2>\n<!-- /wp:heading -->'
+    # Links keep the attributes that change how they behave
+    assert blocks[-1].compact == '<p>Read\xa0<a href="/y" rel="nofollow sponsored" target="_blank">more</a></p>'
+
+
+def section(n, paragraphs=3):
+    return f'<h2>Section {n}</h2>' + ''.join(f'<p>{"word " * 40}{n}.{i}</p>' for i in range(paragraphs))
+
+
+def test_chunks_follow_headings_within_the_budget():
+    post = ''.join(section(n) for n in range(4))
+    budget = count_tokens(section(0)) + 5
+
+    chunks = chunk_by_headings(post, budget)
+
+    assert [chunk.compact for chunk in chunks] == [section(n) for n in range(4)]
+    assert [chunk.original for chunk in chunks] == [section(n) for n in range(4)]
+    assert ''.join(chunk.original for chunk in chunk_by_headings(post, 10 ** 6)) == post
+
+
+def test_oversized_sections_split_between_blocks():
+    chunks = chunk_by_headings(section(0, paragraphs=6), count_tokens(section(0, paragraphs=2)) + 5)
+
+    assert len(chunks) == 3
+    assert chunks[0].compact.startswith('<h2>Section 0</h2>')
+    assert all(chunk.compact.endswith('</p>') for chunk in chunks)
+
+
+def block_editor_post():
+    post = ''.join(section(n, paragraphs=6) for n in range(3))
+    # Block-editor markup, as WordPress returns it
+    return WORDPRESS_POST + post.replace('<p>', '<!-- wp:paragraph -->\n<p class="has-medium-font-size">').replace(
+        '</p>', '</p>\n<!-- /wp:paragraph -->\n')
+
+
+def rewrite_except(failing):
+    async def complete(api_key, messages, **kwargs):
+        prompt = messages[0]['content']
+        if failing in prompt:
+            raise TimeoutError('upstream timeout')
+        original = prompt.split('Original content:')[1].split('Requirements:')[0].strip()
+        reply = {'content': original.replace('<p>', '<p>Optimized ')}
+        if 'part 1 of' in prompt:
+            reply.update(title='T', seo_title='S', seo_description='D')
+        message = SimpleNamespace(content=json.dumps(reply))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+    return complete
+
+
+def reoptimize(post, failing):
+    from app.services.openai_service import OpenAIService
+    with patch('app.services.openai_service.openai_clients.complete', side_effect=rewrite_except(failing)), \
+            patch.dict('os.environ', {'OPENAI_API_KEY': 'sk-env'}):
+        return OpenAIService().reoptimize_content(post, 'seo tools')
+
+
+def test_long_posts_are_rewritten_chunk_by_chunk(monkeypatch):
+    budget = count_tokens(section(0, paragraphs=6)) + 5
+    monkeypatch.setenv('REOPTIMIZE_CHUNK_TOKENS', str(budget))
+    post = block_editor_post()
+
+    result = reoptimize(post, 'Section 1')
+
+    usage = result['token_usage']
+    assert (usage['chunks'], usage['failed_chunks']) == (4, 1)
+    assert usage['tokens_saved'] > 0
+    assert result['title'] == 'T'
+    # The failed chunk is published exactly as it was, block comments and all
+    untouched = chunk_by_headings(post, budget)[2].original
+    assert '<!-- wp:paragraph -->' in untouched and 'Section 1' in untouched
+    assert untouched in result['content']
+    assert result['content'].count('<p>Optimized ') == 1 + 2 * 6
+
+
+def test_failed_head_chunk_keeps_the_posts_title_and_meta(monkeypatch):
+    from app.services.wordpress_service import WordPressService
+    monkeypatch.setenv('REOPTIMIZE_CHUNK_TOKENS', str(count_tokens(section(0, paragraphs=6)) + 5))
+
+    result = reoptimize(block_editor_post(), 'Intro')
+
+    assert result['token_usage']['failed_chunks'] == 1
+    assert (result['title'], result['seo_title'], result['seo_description']) == (None, None, None)
+
+    wordpress = WordPressService()
+    with patch.object(wordpress.session, 'put') as put:
+        wordpress.update_post(7, {'title': result['title'], 'content': result['content'],
+                                  'meta': {'seo_title': result['seo_title'],
+                                           'seo_description': result['seo_description']}})
+    assert put.call_args.kwargs['json'] == {'content': result['content']}
@@ -0,0 +1,126 @@
+import threading
+import time
+import pytest
+from psycopg2 import extensions
+from app.utils.db_pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise Exception("server closed the connection unexpectedly")
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def get_transaction_status(self):
+        return extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def opened():
+    return []
+
+
+@pytest.fixture
+def make_pool(opened):
+    def factory(**kwargs):
+        def connect(dsn):
+            conn = FakeConnection()
+            opened.append(conn)
+            return conn
+        return ConnectionPool('postgresql://test', connect=connect, **kwargs)
+    return factory
+
+
+def test_reuses_connections(make_pool, opened):
+    """Test that returned connections are handed out again"""
+    pool = make_pool(maxconn=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert len(opened) == 1
+    stats = pool.stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 1
+
+
+def test_recycles_after_max_uses(make_pool, opened):
+    """Test that connections are closed after max_uses checkouts"""
+    pool = make_pool(max_uses=2)
+
+    for _ in range(3):
+        with pool.connection():
+            pass
+
+    assert len(opened) == 2
+    assert opened[0].closed
+    assert pool.stats()['recycled'] == 1
+
+
+def test_health_check_discards_broken_connection(make_pool, opened):
+    """Test that a dead idle connection is replaced on checkout"""
+    pool = make_pool(ping_after=0)
+
+    with pool.connection() as conn:
+        pass
+    conn.broken = True
+
+    with pool.connection() as replacement:
+        pass
+
+    assert replacement is not conn
+    assert pool.stats()['health_check_failures'] == 1
+
+
+def test_times_out_when_exhausted(make_pool):
+    """Test that checkout fails fast once the pool is at max size"""
+    pool = make_pool(maxconn=1, timeout=0.05)
+    conn = pool.getconn()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.getconn()
+
+    pool.putconn(conn)
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_waiter_receives_returned_connection(make_pool, opened):
+    """Test that a blocked checkout is served when a connection is returned"""
+    pool = make_pool(maxconn=1, timeout=5)
+    conn = pool.getconn()
+    received = []
+
+    waiter = threading.Thread(target=lambda: received.append(pool.getconn()))
+    waiter.start()
+    while pool.stats()['waits'] == 0:
+        time.sleep(0.001)
+    pool.putconn(conn)
+    waiter.join(timeout=5)
+
+    assert received == [conn]
+    assert len(opened) == 1
+    assert pool.stats()['waits'] == 1
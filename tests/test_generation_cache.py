@@ -0,0 +1,99 @@
+import os
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.utils.generation_cache import GenerationCache, generation_key
+
+
+def key(**overrides):
+    params = {'model': 'gpt-4', 'template': 'blog_post', 'version': 1,
+              'inputs': {'keyword': 'seo'}, 'temperature': 0.7}
+    params.update(overrides)
+    return generation_key(**params)
+
+
+def test_key_covers_model_template_version_inputs_and_temperature():
+    assert key() == key()
+    assert len({key(), key(model='gpt-3.5-turbo'), key(version=2), key(inputs={'keyword': 'ppc'}),
+                key(temperature=0.2), key(template='gbp_content')}) == 6
+
+
+def test_hits_report_tokens_and_latency_saved(tmp_path):
+    cache = GenerationCache(str(tmp_path))
+    assert cache.get(key()) is None
+
+    cache.set(key(), '{"title": "SEO"}', tokens=1200, latency=8.5)
+    assert cache.get(key()) == '{"title": "SEO"}'
+    assert cache.get(key()) == '{"title": "SEO"}'
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (2, 1)
+    assert stats['hit_rate'] == 0.6667
+    assert stats['tokens_saved'] == 2400
+    assert stats['latency_saved_seconds'] == 17.0
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = GenerationCache(str(tmp_path), ttl=0.05)
+    cache.set(key(), 'text')
+    time.sleep(0.1)
+
+    assert cache.get(key()) is None
+    assert cache.stats()['expired'] == 1
+
+
+def test_bypass_skips_the_read(tmp_path):
+    cache = GenerationCache(str(tmp_path))
+    cache.set(key(), 'text')
+
+    assert cache.get(key(), bypass=True) is None
+    assert cache.stats()['bypassed'] == 1
+
+
+def test_least_recently_used_entries_are_evicted_over_budget(tmp_path):
+    cache = GenerationCache(str(tmp_path))
+    keys = [key(inputs={'keyword': f'kw {i}'}) for i in range(3)]
+    for i, k in enumerate(keys):
+        cache.set(k, 'x' * 80)
+        # Distinct mtimes so recency is unambiguous
+        os.utime(cache._path(k), (1000 + i, 1000 + i))
+    cache.get(keys[0])
+    cache.max_bytes = 3 * os.path.getsize(cache._path(keys[0])) + 10
+
+    cache.set(key(inputs={'keyword': 'new'}), 'x' * 80)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_disabled_cache_is_a_no_op():
+    cache = GenerationCache(None)
+    cache.set(key(), 'text')
+    assert cache.get(key()) is None
+    assert cache.stats()['enabled'] is False
+
+
+def test_repeated_blog_requests_reuse_the_generation(tmp_path):
+    from app.services.openai_service import OpenAIService
+    calls = []
+
+    async def complete(api_key, **kwargs):
+        calls.append(kwargs)
+        message = SimpleNamespace(content='{"title": "T", "content": "C", "seo_title": "S", '
+                                          '"seo_description": "D", "faq": "F"}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)],
+                               usage=SimpleNamespace(total_tokens=900))
+
+    cache = GenerationCache(str(tmp_path))
+    with patch('app.services.openai_service.generation_cache', cache), \
+            patch('app.services.openai_service.openai_clients.complete', side_effect=complete), \
+            patch.dict('os.environ', {'OPENAI_API_KEY': 'sk-env'}):
+        first = OpenAIService().generate_blog_post('seo tools')
+        second = OpenAIService().generate_blog_post('seo tools')
+        OpenAIService().generate_blog_post('seo tools', bypass_cache=True)
+
+    assert first == second
+    assert len(calls) == 2
+    assert cache.stats()['tokens_saved'] == 900
@@ -0,0 +1,81 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from app.utils.http import HTTPClientRegistry, may_have_been_sent
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/slow':
+            time.sleep(0.5)
+        body = b'ok'
+        try:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client already gave up (timeout test)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_sessions_are_shared_and_connections_reused(server):
+    """Test that separate borrowers of a service share one keep-alive connection"""
+    registry = HTTPClientRegistry()
+
+    first = registry.session('wordpress')
+    second = registry.session('wordpress')
+    assert first is second
+    assert registry.session('semrush') is not first
+
+    for _ in range(3):
+        first.get(server + '/').raise_for_status()
+        second.get(server + '/').raise_for_status()
+
+    stats = registry.stats()['wordpress']
+    assert stats['requests'] == 6
+    assert stats['reused'] == 5
+    registry.close()
+
+
+def test_default_timeout_is_applied(server, monkeypatch):
+    """Test that requests without an explicit timeout use the service timeout"""
+    monkeypatch.setenv('HTTP_WORDPRESS_TIMEOUT', '0.1')
+    monkeypatch.setenv('HTTP_WORDPRESS_RETRIES', '0')
+    registry = HTTPClientRegistry()
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        registry.session('wordpress').get(server + '/slow')
+    registry.close()
+
+
+def test_only_failures_after_sending_may_have_reached_the_server(server, monkeypatch):
+    """Test that refused connections are told apart from read timeouts"""
+    monkeypatch.setenv('HTTP_GOOGLE_RETRIES', '0')
+    registry = HTTPClientRegistry()
+    session = registry.session('google')
+
+    with pytest.raises(requests.exceptions.ConnectionError) as refused:
+        session.get('http://127.0.0.1:1/')
+    with pytest.raises(requests.exceptions.RequestException) as timed_out:
+        session.get(server + '/slow', timeout=(1, 0.1))
+
+    assert may_have_been_sent(refused.value) is False
+    assert may_have_been_sent(timed_out.value) is True
+    registry.close()
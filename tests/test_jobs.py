@@ -0,0 +1,223 @@
+import app.routes.blog as blog_routes
+from app.jobs import JOB_HANDLERS, JobWorker, PermanentJobError
+
+
+class FakeQueue:
+    """In-memory stand-in for JobManager: hands out the given jobs in order"""
+
+    def __init__(self, jobs, max_attempts=3, requeue=False):
+        self.jobs = list(jobs)
+        self.claimed = {job['id']: job for job in jobs}
+        self.requeue = requeue
+        self.max_attempts = max_attempts
+        self.completed = {}
+        self.failed = {}
+        self.progress = {}
+
+    def claim(self, worker_id):
+        if not self.jobs:
+            return None
+        job = self.jobs.pop(0)
+        job['attempts'] += 1
+        job['progress'] = self.progress.get(job['id'])
+        return job
+
+    def complete(self, job_id, result):
+        self.completed[job_id] = result
+
+    def fail(self, job_id, error, retry=True):
+        self.failed[job_id] = str(error)
+        if retry and self.requeue:
+            self.jobs.append(self.claimed[job_id])
+        return 'queued' if retry else 'failed'
+
+    def update_progress(self, job_id, progress):
+        self.progress[job_id] = progress
+
+    def requeue_stale(self, lock_timeout):
+        return 0
+
+
+def job(job_id, kind, payload=None):
+    return {'id': job_id, 'kind': kind, 'payload': payload or {}, 'tenant': 'default', 'attempts': 0}
+
+
+def test_handler_result_completes_the_job():
+    def handler(payload, ctx):
+        ctx.report_progress({'done': 1})
+        return {'echo': payload['keyword']}
+
+    queue = FakeQueue([job(1, 'echo', {'keyword': 'seo'})])
+    worker = JobWorker(queue, {'echo': handler}, concurrency=1, poll_interval=0)
+
+    assert worker.run_once() is True
+    assert worker.run_once() is False
+    assert queue.completed == {1: {'echo': 'seo'}}
+    assert queue.progress == {1: {'done': 1}}
+    assert worker.stats()['succeeded'] == 1
+
+
+def test_transient_errors_are_retried_and_permanent_ones_are_not():
+    def flaky(payload, ctx):
+        raise ConnectionError('rate limited')
+
+    def invalid(payload, ctx):
+        raise PermanentJobError('keyword is required')
+
+    queue = FakeQueue([job(1, 'flaky'), job(2, 'invalid'), job(3, 'unknown')])
+    worker = JobWorker(queue, {'flaky': flaky, 'invalid': invalid}, concurrency=1, poll_interval=0)
+    while worker.run_once():
+        pass
+
+    assert queue.failed == {1: 'rate limited', 2: 'keyword is required', 3: "No handler for job kind 'unknown'"}
+    assert worker.stats()['retried'] == 1
+    assert worker.stats()['failed'] == 2
+
+
+def test_retry_after_the_draft_was_created_does_not_draft_again(monkeypatch):
+    drafts = []
+    records = []
+
+    def create_draft(blog_content, keyword, secondary_keywords):
+        drafts.append(keyword)
+        return {'id': 500 + len(drafts)}, {'title': 'T', 'content': 'C', 'meta': {'keywords': keyword}}
+
+    def record_post(wordpress_id, post_data, user_id=None):
+        records.append(wordpress_id)
+        if len(records) == 1:
+            raise ConnectionError('server closed the connection')
+
+    monkeypatch.setattr(blog_routes.OpenAIService, 'generate_blog_post', lambda self, *args, **kwargs: {})
+    monkeypatch.setattr(blog_routes, 'create_draft', create_draft)
+    monkeypatch.setattr(blog_routes, 'record_post', record_post)
+
+    queue = FakeQueue([job(1, 'generate_blog', {'keyword': 'seo'})], requeue=True)
+    worker = JobWorker(queue, JOB_HANDLERS, concurrency=1, poll_interval=0)
+    while worker.run_once():
+        pass
+
+    assert drafts == ['seo']
+    assert records == [501, 501]
+    assert queue.completed[1] == {'post_id': 501, 'title': 'T', 'status': 'draft'}
+
+
+def test_retry_after_the_post_was_rewritten_does_not_rewrite_it_again(monkeypatch):
+    import app.routes.reoptimize as reoptimize_routes
+    lookups, updates, records = [], [], []
+
+    class SEMrush:
+        def __init__(self, **kwargs):
+            pass
+
+        def get_keyword_rankings(self, keywords):
+            lookups.append(keywords)
+            return {keywords[0]: {'position': 30}}
+
+    class WordPress:
+        def get_post(self, post_id):
+            return {'content': '<p>old</p>'}
+
+        def update_post(self, post_id, post_data):
+            updates.append(post_id)
+
+    def update_post(post_id, content, keywords=None, title=None):
+        records.append((post_id, content))
+        if len(records) == 1:
+            raise ConnectionError('server closed the connection')
+
+    monkeypatch.setattr(reoptimize_routes, 'SEMrushService', SEMrush)
+    monkeypatch.setattr(reoptimize_routes, 'WordPressService', WordPress)
+    monkeypatch.setattr(reoptimize_routes.OpenAIService, 'reoptimize_content',
+                        lambda self, content, keywords: {'title': 'T', 'content': '<p>new</p>',
+                                                         'seo_title': 'S', 'seo_description': 'D'})
+    monkeypatch.setattr(reoptimize_routes.post_manager, 'update_post', update_post)
+
+    queue = FakeQueue([job(1, 'reoptimize', {'post_id': 9, 'keywords': 'seo'})], requeue=True)
+    worker = JobWorker(queue, JOB_HANDLERS, concurrency=1, poll_interval=0)
+    while worker.run_once():
+        pass
+
+    assert (len(lookups), updates) == (1, [9])
+    assert records == [(9, '<p>new</p>'), (9, '<p>new</p>')]
+    assert queue.completed[1]['post_id'] == 9
+
+
+def test_unconfirmed_gbp_posts_are_not_retried_and_published_posts_are_not_repeated(monkeypatch):
+    import app.routes.gbp as gbp_routes
+    from app.services.google_service import GBPPostUnconfirmed
+    calls = []
+
+    def publish(content, image_url=None, cta_url=None):
+        calls.append(content)
+        if content == 'timeout':
+            raise GBPPostUnconfirmed('Failed to create GBP post: Read timed out')
+        return {'post_id': 'localPosts/1', 'status': 'published'}
+
+    monkeypatch.setattr(gbp_routes, 'publish_gbp_post', publish)
+    queue = FakeQueue([job(1, 'gbp_post', {'content': 'timeout'}), job(2, 'gbp_post', {'content': 'hi'})],
+                      requeue=True)
+    queue.progress[2] = {'published': {'post_id': 'localPosts/0', 'status': 'published'}}
+    worker = JobWorker(queue, JOB_HANDLERS, concurrency=1, poll_interval=0)
+    while worker.run_once():
+        pass
+
+    assert calls == ['timeout']
+    assert worker.stats()['failed'] == 1
+    assert queue.completed[2]['post_id'] == 'localPosts/0'
+
+
+def test_gbp_failures_before_sending_are_retried(monkeypatch):
+    import app.routes.gbp as gbp_routes
+    calls = []
+
+    def publish(content, image_url=None, cta_url=None):
+        calls.append(content)
+        if len(calls) == 1:
+            raise Exception('Failed to get access token: Connection refused')
+        return {'post_id': 'localPosts/1', 'status': 'published'}
+
+    monkeypatch.setattr(gbp_routes, 'publish_gbp_post', publish)
+    queue = FakeQueue([job(1, 'gbp_post', {'content': 'hi'})], requeue=True)
+    worker = JobWorker(queue, JOB_HANDLERS, concurrency=1, poll_interval=0)
+    while worker.run_once():
+        pass
+
+    assert calls == ['hi', 'hi']
+    assert worker.stats()['retried'] == 1
+    assert queue.completed[1]['post_id'] == 'localPosts/1'
+
+
+def test_failure_to_mark_done_is_not_treated_as_a_failed_job():
+    queue = FakeQueue([job(1, 'echo')])
+    attempts = []
+
+    def complete(job_id, result):
+        attempts.append(job_id)
+        raise ConnectionError('server closed the connection')
+
+    queue.complete = complete
+    worker = JobWorker(queue, {'echo': lambda payload, ctx: 'ok'}, concurrency=1, poll_interval=0,
+                       complete_retries=2)
+
+    assert worker.run_once() is True
+    assert queue.failed == {}
+    assert len(attempts) == 3
+
+
+def test_marking_done_is_retried():
+    queue = FakeQueue([job(1, 'echo')])
+    completed = queue.complete
+    attempts = []
+
+    def complete(job_id, result):
+        attempts.append(job_id)
+        if len(attempts) == 1:
+            raise ConnectionError('server closed the connection')
+        completed(job_id, result)
+
+    queue.complete = complete
+    worker = JobWorker(queue, {'echo': lambda payload, ctx: 'ok'}, concurrency=1, poll_interval=0)
+
+    assert worker.run_once() is True
+    assert queue.completed == {1: 'ok'}
+    assert worker.stats()['succeeded'] == 1
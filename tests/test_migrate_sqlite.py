@@ -0,0 +1,42 @@
+import sqlite3
+from migrate_sqlite import migrate_posts
+
+
+class FakePosts:
+    """Stands in for PostManager: records batches, treats known WordPress ids as duplicates"""
+
+    def __init__(self, existing=()):
+        self.seen = set(existing)
+        self.batches = []
+
+    def import_posts(self, rows):
+        self.batches.append(rows)
+        new = [row for row in rows if row[1] not in self.seen]
+        self.seen.update(row[1] for row in new)
+        return len(new)
+
+
+def make_legacy_db(path, count):
+    conn = sqlite3.connect(path)
+    # The oldest files have no status/updated_at columns
+    conn.execute('''CREATE TABLE posts (id INTEGER PRIMARY KEY AUTOINCREMENT, wordpress_id INTEGER,
+                    title TEXT, content TEXT, keywords TEXT, created_at TIMESTAMP)''')
+    conn.executemany('INSERT INTO posts (wordpress_id, title, content, keywords, created_at) VALUES (?, ?, ?, ?, ?)',
+                     [(100 + i, f'Post {i}', '<p></p>', 'seo', '2025-01-01 00:00:00') for i in range(count)])
+    conn.commit()
+    conn.close()
+
+
+def test_posts_are_streamed_in_batches_and_reruns_skip_copied_rows(tmp_path):
+    path = str(tmp_path / 'seo_automation.db')
+    make_legacy_db(path, 5)
+    posts = FakePosts(existing={100})
+
+    summary = migrate_posts(path, posts, batch_size=2)
+
+    assert (summary['read'], summary['inserted'], summary['skipped']) == (5, 4, 1)
+    assert [len(batch) for batch in posts.batches] == [2, 2, 1]
+    # Missing columns come through as NULL in the legacy column order
+    assert posts.batches[0][0] == (None, 100, 'Post 0', '<p></p>', 'seo', None, '2025-01-01 00:00:00', None)
+
+    assert migrate_posts(path, posts, batch_size=2)['inserted'] == 0
@@ -0,0 +1,49 @@
+from app.migrations import MIGRATIONS, LATEST_VERSION, apply_migrations
+
+
+class RecordingCursor:
+    def __init__(self, current_version):
+        self.current_version = current_version
+        self.statements = []
+
+    def execute(self, query, params=None):
+        self.statements.append((query, params))
+
+    def fetchone(self):
+        return (self.current_version,)
+
+
+class RecordingConnection:
+    def __init__(self, current_version=0):
+        self.cursor_instance = RecordingCursor(current_version)
+
+    def cursor(self):
+        return self.cursor_instance
+
+
+def test_migration_versions_are_sequential():
+    """Test that migrations are numbered 1..N without gaps or duplicates"""
+    versions = [version for version, _, _ in MIGRATIONS]
+    assert versions == list(range(1, len(MIGRATIONS) + 1))
+    assert LATEST_VERSION == versions[-1]
+
+
+def test_apply_migrations_from_empty_database():
+    """Test that every migration is applied and recorded on a fresh database"""
+    conn = RecordingConnection(current_version=None)
+
+    applied = apply_migrations(conn)
+
+    assert applied == [version for version, _, _ in MIGRATIONS]
+    recorded = [params[0] for query, params in conn.cursor_instance.statements
+                if query.startswith('INSERT INTO schema_migrations')]
+    assert recorded == applied
+
+
+def test_apply_migrations_is_noop_when_current():
+    """Test that an up-to-date database runs no DDL"""
+    conn = RecordingConnection(current_version=LATEST_VERSION)
+
+    assert apply_migrations(conn) == []
+    assert not any(query.lstrip().startswith('CREATE TABLE IF NOT EXISTS users')
+                   for query, _ in conn.cursor_instance.statements)
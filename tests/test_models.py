@@ -0,0 +1,302 @@
+from contextlib import contextmanager
+import psycopg2
+import pytest
+from datetime import datetime, timedelta
+import jwt
+from app.models import (APIKeyManager, DatabaseManager, PostManager, RankingHistoryManager, SessionManager, UserManager,
+                        UserSettingsManager)
+from app.utils.cache import TTLCache
+from app.utils.session_revocation import RevocationList
+from app.utils.activity_log import ActivityLogWriter
+from app.utils.passwords import PasswordHasher
+
+
+class CountingCursor:
+    connection = type('Conn', (), {'encoding': 'UTF8'})()
+
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = 1
+
+    def execute(self, query, params=None):
+        self.db.queries.append(query)
+
+    def copy_expert(self, sql, file):
+        self.db.queries.append(sql)
+        self.db.copied.append(file.read())
+
+    def mogrify(self, template, args):
+        return repr(args).encode()
+
+    def fetchall(self):
+        return self.db.rows
+
+    def fetchone(self):
+        return self.db.row
+
+
+class CountingDatabase:
+    database_url = 'postgresql://test'
+
+    def __init__(self, rows=None, row=None):
+        self.queries = []
+        self.copied = []
+        self.rows = rows or []
+        self.row = row
+
+    @contextmanager
+    def connection(self):
+        conn = type('Conn', (), {'cursor': lambda _self, name=None: CountingCursor(self)})()
+        yield conn
+
+    bulk_upsert = DatabaseManager.bulk_upsert
+
+    def notify_invalidation(self, cursor, cache_name, key):
+        pass
+
+
+def test_api_keys_are_cached_until_written():
+    """Test that API key reads hit the database once until a key is set"""
+    db = CountingDatabase(rows=[('openai', 'sk-test', True, None, None, 0)])
+    manager = APIKeyManager(db, cache=TTLCache(maxsize=10, ttl=60))
+
+    manager.get_user_api_keys(1)
+    manager.get_user_api_keys(1)
+    assert len(db.queries) == 1
+
+    manager.set_user_api_key(1, 'openai', 'sk-new')
+    reads_before = len(db.queries)
+    manager.get_user_api_keys(1)
+    assert len(db.queries) == reads_before + 1
+
+
+def test_bulk_settings_update_is_one_statement():
+    """Test that saving many settings issues a single upsert"""
+    db = CountingDatabase()
+    manager = UserSettingsManager(db, cache=TTLCache(maxsize=10, ttl=60))
+    settings = {f'setting_{i}': str(i) for i in range(25)}
+
+    result = manager.update_user_settings_bulk(1, settings)
+
+    assert result == {'success': True}
+    assert len(db.queries) == 1
+    assert b'ON CONFLICT (user_id, setting_key) DO UPDATE' in db.queries[0]
+
+
+def test_bulk_upsert_collapses_duplicate_keys():
+    """Test that rows repeating a conflict key are sent once, last value wins"""
+    db = CountingDatabase()
+    cursor = CountingCursor(db)
+
+    sent = DatabaseManager.bulk_upsert(
+        db, cursor, 'user_settings', ('user_id', 'setting_key', 'setting_value'),
+        [(1, 'theme', 'dark'), (1, 'theme', 'light'), (1, 'lang', 'en')],
+        ('user_id', 'setting_key')
+    )
+
+    assert sent == 2
+    assert b"'light'" in db.queries[0]
+    assert b"'dark'" not in db.queries[0]
+
+
+def make_session_manager(db):
+    manager = SessionManager(db, revocations=RevocationList(refresh_interval=3600))
+    manager.validation_mode = 'stateless'
+    return manager
+
+
+def make_token(manager, session_token):
+    payload = {'user_id': 1, 'session_token': session_token,
+               'exp': datetime.utcnow() + timedelta(days=1)}
+    return jwt.encode(payload, manager.jwt_secret, algorithm='HS256')
+
+
+def test_stateless_validation_skips_database():
+    """Test that repeated validations only query for revocations once"""
+    db = CountingDatabase()
+    manager = make_session_manager(db)
+    token = make_token(manager, 'session-a')
+
+    for _ in range(100):
+        assert manager.validate_session(token) == {'valid': True, 'user_id': 1}
+
+    assert len(db.queries) == 1
+
+
+def test_destroyed_session_is_rejected():
+    """Test that a session destroyed in this worker is invalid immediately"""
+    db = CountingDatabase()
+    manager = make_session_manager(db)
+    token = make_token(manager, 'session-b')
+
+    manager.destroy_session(1, 'session-b')
+
+    assert manager.validate_session(token)['valid'] is False
+
+
+def test_revocations_from_other_workers_are_loaded():
+    """Test that tombstones in the database are picked up on refresh"""
+    future = datetime.now() + timedelta(days=1)
+    db = CountingDatabase(rows=[('session-c', future, datetime.now())])
+    manager = make_session_manager(db)
+
+    assert manager.validate_session(make_token(manager, 'session-c'))['valid'] is False
+    assert manager.validate_session(make_token(manager, 'session-d'))['valid'] is True
+
+
+def test_activity_writer_batches_events():
+    """Test that buffered activity and logins are flushed as two statements"""
+    db = CountingDatabase()
+    writer = ActivityLogWriter(db, batch_size=50, flush_interval=10)
+
+    for i in range(50):
+        writer.log(1, 'login', f'event {i}')
+        if i % 2 == 0:
+            writer.touch_last_login(1)
+    writer.close()
+
+    assert writer.stats()['flushed'] == 75
+    inserts = [q for q in db.queries if b'INSERT INTO activity_logs' in q]
+    updates = [q for q in db.queries if b'UPDATE users SET last_login' in q]
+    assert len(inserts) == 2
+    assert len(updates) == 2
+
+
+def test_activity_writer_drops_only_the_failing_events():
+    """Test that one bad row does not take the rest of its batch with it"""
+    class RejectingCursor(CountingCursor):
+        def execute(self, query, params=None):
+            super().execute(query, params)
+            if b'deleted-user' in query:
+                raise psycopg2.IntegrityError('violates foreign key constraint')
+
+    db = CountingDatabase()
+    db.connection = contextmanager(lambda: (yield type('Conn', (), {'cursor': lambda _self: RejectingCursor(db)})()))
+    writer = ActivityLogWriter(db)
+
+    writer._write([('activity', (1, 'login', '', 'ip', datetime.now())),
+                   ('activity', (2, 'login', 'deleted-user', 'ip', datetime.now())),
+                   ('login', (3, datetime.now()))])
+
+    stats = writer.stats()
+    assert (stats['flushed'], stats['dropped']) == (2, 1)
+
+
+def test_activity_writer_applies_back_pressure():
+    """Test that a full queue makes the caller write its own event"""
+    db = CountingDatabase()
+    writer = ActivityLogWriter(db, max_queue=1, put_timeout=0)
+    writer._ensure_started = lambda: None  # keep the consumer stopped
+
+    writer.log(1, 'first')
+    writer.log(1, 'second')
+
+    assert writer.stats()['sync_writes'] == 1
+    assert len(db.queries) == 1
+
+
+def test_login_rehashes_password_when_cost_changes():
+    """Test that a hash made with an old cost factor is upgraded on login"""
+    old_hash = PasswordHasher(rounds=4, workers=0).hash('secret')
+    db = CountingDatabase(row=(1, 'alice', 'alice@example.com', old_hash, 'user', True))
+    writer = ActivityLogWriter(db)
+    manager = UserManager(db, activity_writer=writer, hasher=PasswordHasher(rounds=5, workers=0))
+
+    result = manager.authenticate_user('alice', 'secret')
+    writer.close()
+
+    assert result['success'] is True
+    assert any('SET password_hash' in q for q in db.queries if isinstance(q, str))
+    assert manager.hasher.stats()['rehashed'] == 1
+
+
+def user_rows(count):
+    start = datetime(2026, 1, 1)
+    return [(i, f'user{i}', f'user{i}@example.com', 'user', True,
+             start - timedelta(minutes=i), None, 'free') for i in range(count)]
+
+
+def test_list_users_returns_keyset_cursor():
+    """Test that a full page yields a cursor that resumes after its last row"""
+    db = CountingDatabase(rows=user_rows(11))
+    manager = UserManager(db, activity_writer=ActivityLogWriter(db))
+
+    page = manager.list_users(limit=10, role='admin', search='50%_off')
+
+    assert len(page['users']) == 10
+    assert UserManager.decode_user_cursor(page['next_cursor']) == (datetime(2026, 1, 1) - timedelta(minutes=9), 9)
+    query = db.queries[-1]
+    assert 'ORDER BY created_at DESC, id DESC LIMIT %s' in query
+    assert 'OFFSET' not in query
+
+    db.rows = user_rows(3)
+    last_page = manager.list_users(limit=10, after=page['next_cursor'])
+    assert last_page['next_cursor'] is None
+    assert '(created_at, id) < (%s, %s)' in db.queries[-1]
+
+
+def test_list_users_escapes_search_wildcards():
+    """Test that % and _ typed into search are matched literally"""
+    clauses, params = UserManager._user_filters(search='50%_off')
+    assert params == ['%50\\%\\_off%', '%50\\%\\_off%']
+
+
+def test_invalid_user_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        UserManager.decode_user_cursor('not-a-cursor')
+
+
+def test_ranking_history_is_ingested_with_one_copy():
+    """Test that a batch is one COPY plus a fixed number of set-based statements"""
+    db = CountingDatabase()
+    manager = RankingHistoryManager(db)
+    results = {f'keyword {i}': {'position': i, 'search_volume': 100 * i, 'cpc': 1.5} for i in range(50)}
+    results['quota'] = {'position': 0, 'error': 'quota exceeded'}
+
+    sent = manager.record_rankings(results, captured_at=datetime(2026, 3, 1, 6, 0))
+
+    assert sent == 50
+    assert len(db.copied) == 1
+    assert db.copied[0].count('\n') == 50
+    assert 'quota' not in db.copied[0]
+    assert len(db.queries) == 5
+    assert 'ON CONFLICT (keyword_id, day) DO UPDATE' in db.queries[-1]
+
+
+def test_ranking_summary_is_computed_from_rollups():
+    """Test that stats come from stored positions, ignoring unranked keywords in the average"""
+    db = CountingDatabase(rows=[(1, 2, 1000), (0, 1, 500), (15, 1, 200)])
+    manager = RankingHistoryManager(db, conversion_rate=0.05)
+
+    summary = manager.get_summary()
+
+    assert summary == {'total_keywords': 4, 'organic_traffic': 281, 'average_position': 5.7, 'conversions': 14}
+
+
+def test_bulk_post_records_are_one_statement():
+    """Test that recording a batch of drafts issues a single multi-row insert"""
+    db = CountingDatabase(rows=[(11,), (12,), (13,)])
+    posts = [{'wordpress_id': 100 + i, 'title': f'Post {i}', 'content': '<p></p>', 'keywords': 'seo'}
+             for i in range(3)]
+
+    assert PostManager(db).create_posts(posts, user_id=4) == [11, 12, 13]
+    assert len(db.queries) == 1
+    assert db.queries[0].startswith(b'INSERT INTO posts')
+
+
+def test_post_updates_are_one_statement():
+    """Test that re-optimized content for many posts is written in one update"""
+    db = CountingDatabase()
+    updated = PostManager(db).update_posts([(101, '<p>new</p>', 'seo', None), (102, '<p>new</p>', None, 'T')])
+
+    assert updated == 1  # CountingCursor.rowcount
+    assert len(db.queries) == 1
+    assert b'FROM (VALUES' in db.queries[0]
+
+
+def test_post_writes_need_the_database():
+    db = CountingDatabase()
+    db.database_url = None
+    with pytest.raises(RuntimeError):
+        PostManager(db).create_post(100, 'T', '<p></p>', 'seo')
+    assert PostManager(db).get_recent_posts() == []
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+import openai
+from app.utils.openai_clients import OpenAIClientRegistry
+
+
+class FakeAsyncClient:
+    """Stands in for AsyncOpenAI: records which key served each call and peak concurrency"""
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def __init__(self, api_key, delay=0.05, reply='ok'):
+        self.api_key = api_key
+        self.delay = delay
+        self.reply = reply
+        self.closed = False
+        self.active_for_key = 0
+        self.peak_for_key = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+            self.active_for_key += 1
+            self.peak_for_key = max(self.peak_for_key, self.active_for_key)
+        await asyncio.sleep(self.delay)
+        with cls.lock:
+            cls.active -= 1
+            self.active_for_key -= 1
+        message = SimpleNamespace(content=self.reply if isinstance(self.reply, str) else json.dumps(self.reply))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], api_key=self.api_key)
+
+    async def close(self):
+        self.closed = True
+
+
+def registry(client_kwargs=None, **kwargs):
+    clients = {}
+
+    def factory(api_key):
+        clients[api_key] = FakeAsyncClient(api_key, **(client_kwargs or {}))
+        return clients[api_key]
+
+    FakeAsyncClient.active = FakeAsyncClient.peak = 0
+    return OpenAIClientRegistry(client_factory=factory, **kwargs), clients
+
+
+def test_each_key_gets_its_own_cached_client():
+    openai_clients, clients = registry(max_clients=2)
+
+    first = openai_clients.run(openai_clients.complete('sk-a', model='m', messages=[]))
+    openai_clients.run(openai_clients.complete('sk-a', model='m', messages=[]))
+    second = openai_clients.run(openai_clients.complete('sk-b', model='m', messages=[]))
+
+    assert (first.api_key, second.api_key) == ('sk-a', 'sk-b')
+    assert openai_clients.stats()['clients_created'] == 2
+
+    openai_clients.run(openai_clients.complete('sk-c', model='m', messages=[]))
+    time.sleep(0.05)
+    assert clients['sk-a'].closed
+    assert openai_clients.stats()['clients'] == 2
+
+
+def test_concurrency_is_capped_per_key_and_globally():
+    openai_clients, clients = registry(per_key_limit=2, global_limit=3)
+    coros = [openai_clients.complete(key, model='m', messages=[]) for key in ['sk-a'] * 6 + ['sk-b'] * 6]
+
+    results = openai_clients.run_all(coros)
+
+    assert len(results) == 12
+    assert clients['sk-a'].peak_for_key <= 2
+    assert clients['sk-b'].peak_for_key <= 2
+    assert FakeAsyncClient.peak == 3
+    assert openai_clients.stats()['in_flight'] == 0
+
+
+def test_threads_and_foreign_loops_share_the_registry_loop():
+    """Test that sync callers in threads and asyncio.run callers overlap instead of queueing"""
+    openai_clients, _ = registry(per_key_limit=8, global_limit=8)
+    threads = [threading.Thread(target=openai_clients.run,
+                                args=(openai_clients.complete('sk-a', model='m', messages=[]),))
+               for _ in range(4)]
+
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    asyncio.run(openai_clients.complete('sk-a', model='m', messages=[]))
+    for thread in threads:
+        thread.join()
+
+    assert time.monotonic() - started < 0.2
+    assert openai_clients.stats()['completions'] == 5
+
+
+def test_service_uses_its_own_key_without_global_state():
+    from app.services.openai_service import OpenAIService
+    reply = {'title': 'T', 'content': 'C', 'seo_title': 'S', 'seo_description': 'D', 'faq': 'F'}
+    openai_clients, clients = registry(client_kwargs={'reply': reply})
+    openai.api_key = None
+
+    with patch('app.services.openai_service.openai_clients', openai_clients), \
+            patch.dict('os.environ', {'OPENAI_API_KEY': 'sk-env'}):
+        result = OpenAIService().generate_blog_post('seo tools')
+
+    assert result['title'] == 'T'
+    assert list(clients) == ['sk-env']
+    assert openai.api_key is None
+
+
+def test_stream_yields_deltas_as_they_arrive():
+    class StreamingClient(FakeAsyncClient):
+        async def create(self, stream=False, **kwargs):
+            async def chunks():
+                for text in ['Hel', None, 'lo']:
+                    await asyncio.sleep(0.01)
+                    delta = SimpleNamespace(content=text)
+                    yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+            return chunks()
+
+    openai_clients = OpenAIClientRegistry(client_factory=StreamingClient)
+
+    assert list(openai_clients.stream('sk-a', model='m', messages=[])) == ['Hel', 'lo']
+    assert openai_clients.stats()['completions'] == 1
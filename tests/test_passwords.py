@@ -0,0 +1,49 @@
+import threading
+import pytest
+from app.utils.passwords import PasswordHasher, PasswordHasherBusy
+
+
+def test_hash_and_verify_inline():
+    """Test hashing and verification without a worker pool"""
+    hasher = PasswordHasher(rounds=4, workers=0)
+    password_hash = hasher.hash('secret')
+
+    assert hasher.verify('secret', password_hash)
+    assert not hasher.verify('wrong', password_hash)
+    assert not hasher.needs_rehash(password_hash)
+    assert PasswordHasher(rounds=5, workers=0).needs_rehash(password_hash)
+
+
+def test_hash_and_verify_in_worker_process():
+    """Test that the process pool produces hashes the inline path accepts"""
+    hasher = PasswordHasher(rounds=4, workers=1)
+    try:
+        password_hash = hasher.hash('secret')
+        assert PasswordHasher(rounds=4, workers=0).verify('secret', password_hash)
+        assert hasher.verify('secret', password_hash)
+    finally:
+        hasher.shutdown()
+
+
+def test_saturated_pool_rejects_immediately():
+    """Test that callers beyond max_pending get PasswordHasherBusy"""
+    hasher = PasswordHasher(rounds=4, workers=0, max_pending=1, retry_after=2)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_verify():
+        started.set()
+        release.wait(5)
+        return True
+
+    worker = threading.Thread(target=hasher._run, args=(slow_verify,))
+    worker.start()
+    started.wait(5)
+    try:
+        with pytest.raises(PasswordHasherBusy) as excinfo:
+            hasher.verify('secret', hasher.hash('secret'))
+        assert excinfo.value.retry_after == 2
+        assert hasher.stats()['rejected'] == 1
+    finally:
+        release.set()
+        worker.join()
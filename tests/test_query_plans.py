@@ -0,0 +1,198 @@
+"""EXPLAIN every query the managers issue against a large seeded database.
+
+Needs a disposable PostgreSQL database:
+
+    TEST_DATABASE_URL=postgresql://localhost/seo_test pytest tests/test_query_plans.py
+
+The tests run in their own schema, which is dropped afterwards.
+"""
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+from psycopg2.extensions import cursor as base_cursor
+
+from app.migrations import apply_migrations
+from app.models import (APIKeyManager, DatabaseManager, SessionManager, UserManager,
+                        UserSettingsManager)
+from app.utils.activity_log import ActivityLogWriter
+from app.utils.cache import TTLCache
+from app.utils.passwords import PasswordHasher
+from app.utils.session_revocation import RevocationList
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+SCHEMA = 'query_plan_check'
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL not set')
+
+# Rows per table; large enough that the planner prefers an index whenever
+# one can serve the query
+SEED_SQL = [
+    '''INSERT INTO users (username, email, password_hash, created_at)
+        SELECT 'user' || i, 'user' || i || '@example.com', 'x',
+               CURRENT_TIMESTAMP - i * INTERVAL '1 minute'
+        FROM generate_series(1, 50000) AS i''',
+    '''INSERT INTO user_sessions (user_id, session_token, expires_at, is_active)
+        SELECT 1 + i % 50000, 'token-' || i,
+               CURRENT_TIMESTAMP + (i % 48 - 24) * INTERVAL '1 hour', i % 5 <> 0
+        FROM generate_series(1, 200000) AS i''',
+    '''INSERT INTO session_revocations (session_token, expires_at, revoked_at)
+        SELECT 'revoked-' || i, CURRENT_TIMESTAMP + INTERVAL '1 day',
+               CURRENT_TIMESTAMP - i * INTERVAL '1 minute'
+        FROM generate_series(1, 50000) AS i''',
+    '''INSERT INTO activity_logs (user_id, action, details, created_at)
+        SELECT 1 + i % 50000, 'login', 'seed',
+               CURRENT_TIMESTAMP - i * INTERVAL '1 minute'
+        FROM generate_series(1, 200000) AS i''',
+    '''INSERT INTO user_settings (user_id, setting_key, setting_value)
+        SELECT 1 + i % 50000, 'setting_' || (i / 50000), 'value'
+        FROM generate_series(1, 150000) AS i''',
+    '''INSERT INTO user_api_keys (user_id, service_name, api_key)
+        SELECT i, 'openai', 'sk-' || i FROM generate_series(1, 50000) AS i''',
+    '''INSERT INTO posts (user_id, wordpress_id, title, created_at)
+        SELECT 1 + i % 50000, i, 'Post ' || i, CURRENT_TIMESTAMP - i * INTERVAL '1 minute'
+        FROM generate_series(1, 100000) AS i''',
+]
+
+SEEDED_TABLES = {'users', 'user_sessions', 'session_revocations', 'activity_logs',
+                 'user_settings', 'user_api_keys', 'posts'}
+
+
+class RecordingCursor(base_cursor):
+    recorded = []
+
+    def execute(self, query, params=None):
+        super().execute(query, params)
+        RecordingCursor.recorded.append(self.query)
+
+
+class PlanDatabase(DatabaseManager):
+    """DatabaseManager on a dedicated schema that records every statement"""
+
+    def __init__(self, dsn):
+        self.database_url = dsn
+
+    def get_connection(self):
+        return psycopg2.connect(self.database_url, cursor_factory=RecordingCursor,
+                                options=f'-c search_path={SCHEMA}')
+
+    @contextmanager
+    def connection(self):
+        conn = self.get_connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+def partition_parents(cursor):
+    """Map each partition in the test schema (e.g. ``activity_logs_default``) to its parent table"""
+    cursor.execute('''SELECT child.relname, parent.relname FROM pg_inherits
+                      JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                      JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                      JOIN pg_namespace ns ON ns.oid = child.relnamespace
+                      WHERE ns.nspname = %s''', (SCHEMA,))
+    return dict(cursor.fetchall())
+
+
+def seq_scans(plan, parents):
+    """Yield table names scanned sequentially anywhere in a plan tree.
+
+    EXPLAIN names the partition it scans, so partitions are reported as
+    their parent table.
+    """
+    relation = parents.get(plan.get('Relation Name'), plan.get('Relation Name'))
+    if plan.get('Node Type') == 'Seq Scan' and relation in SEEDED_TABLES:
+        yield relation
+    for child in plan.get('Plans', []):
+        yield from seq_scans(child, parents)
+
+
+@pytest.fixture(scope='module')
+def db():
+    admin = psycopg2.connect(TEST_DATABASE_URL)
+    with admin, admin.cursor() as c:
+        c.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+        c.execute(f'CREATE SCHEMA {SCHEMA}')
+    database = PlanDatabase(TEST_DATABASE_URL)
+    with database.connection() as conn:
+        apply_migrations(conn)
+        c = conn.cursor()
+        for statement in SEED_SQL:
+            c.execute(statement)
+    conn = database.get_connection()
+    conn.autocommit = True
+    for table in sorted(SEEDED_TABLES):
+        conn.cursor().execute(f'ANALYZE {table}')
+    conn.close()
+    try:
+        yield database
+    finally:
+        with admin, admin.cursor() as c:
+            c.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+        admin.close()
+
+
+def run_manager_queries(db):
+    hasher = PasswordHasher(rounds=4, workers=0)
+    with db.connection() as conn:
+        conn.cursor().execute("UPDATE users SET password_hash = %s WHERE username = 'user42'",
+                              (hasher.hash('secret'),))
+
+    writer = ActivityLogWriter(db)
+    users = UserManager(db, activity_writer=writer, hasher=hasher)
+    settings = UserSettingsManager(db, cache=TTLCache(ttl=0))
+    api_keys = APIKeyManager(db, cache=TTLCache(ttl=0))
+    sessions = SessionManager(db, revocations=RevocationList())
+
+    RecordingCursor.recorded.clear()
+    assert users.authenticate_user('user42', 'secret')['success']
+    users.get_user_by_id(42)
+    users.update_user(42, {'subscription_plan': 'pro'})
+    settings.get_user_settings(42)
+    settings.update_user_settings_bulk(42, {'theme': 'dark', 'setting_1': 'x'})
+    api_keys.get_user_api_keys(42)
+    api_keys.set_user_api_key(42, 'openai', 'sk-new')
+    sessions._find_active_session(42, 'token-42')
+    sessions._load_revocations(datetime.now() - timedelta(minutes=5))
+    sessions.destroy_session(42, 'token-42')
+    users.delete_user(43)
+    writer.close()
+    return [query.decode() if isinstance(query, bytes) else query
+            for query in RecordingCursor.recorded]
+
+
+def test_manager_queries_use_indexes(db):
+    """Test that no manager query sequentially scans a large table"""
+    queries = run_manager_queries(db)
+    assert queries
+
+    offenders = []
+    conn = psycopg2.connect(db.database_url, options=f'-c search_path={SCHEMA}')
+    try:
+        c = conn.cursor()
+        parents = partition_parents(c)
+        for query in queries:
+            if not query.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue  # plain INSERTs have no scan to check
+            if 'pg_notify' in query:
+                continue
+            c.execute('EXPLAIN (FORMAT JSON) ' + query)
+            plan = c.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            scanned = sorted(set(seq_scans(plan[0]['Plan'], parents)))
+            if scanned:
+                offenders.append(f"{', '.join(scanned)}: {' '.join(query.split())}")
+    finally:
+        conn.rollback()
+        conn.close()
+
+    assert not offenders, 'Sequential scans:\n' + '\n'.join(offenders)
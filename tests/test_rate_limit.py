@@ -0,0 +1,23 @@
+import time
+import pytest
+from app.utils.rate_limit import RateLimitTimeout, TokenBucket
+
+
+def test_burst_then_throttle():
+    """Test that the bucket allows a burst and then paces to the rate"""
+    bucket = TokenBucket(rate=20, capacity=5)
+
+    assert all(bucket.try_acquire() for _ in range(5))
+    assert not bucket.try_acquire()
+
+    started = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.15
+
+
+def test_acquire_times_out():
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.acquire()
+    with pytest.raises(RateLimitTimeout):
+        bucket.acquire(timeout=0.1)
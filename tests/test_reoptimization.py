@@ -0,0 +1,118 @@
+import threading
+import time
+from app.services.reoptimization import Pipeline, ReoptimizationEngine, Stage
+
+
+class FakeSEMrush:
+    def __init__(self, positions):
+        self.positions = positions
+        self.requested = []
+
+    def get_keyword_rankings(self, keywords):
+        self.requested.extend(keywords)
+        return {keyword: {'position': self.positions.get(keyword, 50)} for keyword in keywords}
+
+
+class FakeWordPress:
+    def __init__(self, delay=0.0, fail_gets=None):
+        self.delay = delay
+        self.fail_gets = fail_gets or {}
+        self.updated = []
+        self._lock = threading.Lock()
+
+    def get_post(self, post_id):
+        time.sleep(self.delay)
+        with self._lock:
+            if self.fail_gets.get(post_id, 0) > 0:
+                self.fail_gets[post_id] -= 1
+                raise Exception('Failed to get WordPress post: 503')
+        return {'id': post_id, 'content': f'post {post_id}'}
+
+    def update_post(self, post_id, post_data):
+        time.sleep(self.delay)
+        with self._lock:
+            self.updated.append(post_id)
+        return {'id': post_id}
+
+
+class FakeOpenAI:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def reoptimize_content(self, content, keywords):
+        time.sleep(self.delay)
+        return {'title': 't', 'content': content + ' (optimized)', 'seo_title': 's', 'seo_description': 'd'}
+
+
+class FakeCheckpoints:
+    def __init__(self, completed=()):
+        self.completed = set(completed)
+        self.records = []
+
+    def get_completed(self, run_key):
+        return set(self.completed)
+
+    def record(self, run_key, post_id, status, stage=None, error=None):
+        self.records.append((post_id, status, stage))
+
+
+def test_stages_overlap_instead_of_running_serially(monkeypatch):
+    """Test that fetch, rewrite and publish work on different posts at the same time"""
+    monkeypatch.setenv('REOPTIMIZE_FETCH_WORKERS', '4')
+    monkeypatch.setenv('REOPTIMIZE_REWRITE_WORKERS', '4')
+    monkeypatch.setenv('REOPTIMIZE_PUBLISH_WORKERS', '4')
+    for stage in ('FETCH', 'REWRITE', 'PUBLISH'):
+        monkeypatch.setenv(f'REOPTIMIZE_{stage}_RATE', '0')
+    posts = [(i, 100 + i, f'keyword {i}') for i in range(8)]
+    wordpress = FakeWordPress(delay=0.05)
+    checkpoints = FakeCheckpoints()
+    engine = ReoptimizationEngine(FakeSEMrush({}), wordpress, FakeOpenAI(delay=0.05), checkpoints)
+
+    started = time.monotonic()
+    summary = engine.run(posts)
+    elapsed = time.monotonic() - started
+
+    # Serially this is 8 posts x 3 calls x 50ms = 1.2s
+    assert elapsed < 0.6
+    assert summary['published'] == 8
+    assert sorted(wordpress.updated) == [100 + i for i in range(8)]
+    assert summary['stages']['rewrite']['processed'] == 8
+    assert sorted(post_id for post_id, status, _ in checkpoints.records if status == 'published') == list(range(8))
+
+
+def test_well_ranked_and_already_published_posts_are_skipped():
+    semrush = FakeSEMrush({'good': 3, 'bad': 40})
+    wordpress = FakeWordPress()
+    engine = ReoptimizationEngine(semrush, wordpress, FakeOpenAI(), FakeCheckpoints(completed={3}))
+
+    summary = engine.run([(1, 101, 'good, other'), (2, 102, 'bad'), (3, 103, 'bad'), (4, 104, '')])
+
+    assert semrush.requested == ['good', 'bad']
+    assert wordpress.updated == [102]
+    assert summary['candidates'] == 1
+    assert summary['already_done'] == 1
+
+
+def test_transient_failures_are_retried_and_permanent_ones_checkpointed(monkeypatch):
+    monkeypatch.setenv('REOPTIMIZE_RETRIES', '2')
+    monkeypatch.setenv('REOPTIMIZE_RETRY_BACKOFF', '0')
+    wordpress = FakeWordPress(fail_gets={101: 1, 102: 5})
+    checkpoints = FakeCheckpoints()
+    engine = ReoptimizationEngine(FakeSEMrush({}), wordpress, FakeOpenAI(), checkpoints)
+
+    summary = engine.run([(1, 101, 'a'), (2, 102, 'b')])
+
+    assert wordpress.updated == [101]
+    assert summary['published'] == 1
+    assert summary['failed'] == 1
+    assert summary['stages']['fetch']['retries'] == 3
+    assert (2, 'failed', 'fetch') in checkpoints.records
+
+
+def test_pipeline_drains_with_more_tasks_than_queue_space():
+    stages = [Stage('double', lambda x: x * 2, workers=3), Stage('drop_odd', lambda x: x if x % 4 else None)]
+    results = []
+
+    Pipeline(stages, queue_size=2, on_success=results.append).run(range(50))
+
+    assert sorted(results) == [x * 2 for x in range(50) if (x * 2) % 4]
@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+from datetime import date, datetime
+from app.retention import (drop_activity_log_partitions, ensure_activity_log_partitions,
+                           next_month, purge_expired_sessions)
+
+
+class ScriptedCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self.db.statements.append((' '.join(query.split()), params))
+        self.rowcount = self.db.rowcounts.pop(0) if query.lstrip().startswith('DELETE') else 0
+
+    def fetchall(self):
+        return [(name,) for name in self.db.partitions]
+
+
+class ScriptedDatabase:
+    def __init__(self, rowcounts=(), partitions=()):
+        self.rowcounts = list(rowcounts)
+        self.partitions = list(partitions)
+        self.statements = []
+        self.transactions = 0
+
+    @contextmanager
+    def connection(self):
+        self.transactions += 1
+        yield type('Conn', (), {'cursor': lambda _self: ScriptedCursor(self)})()
+
+
+def test_next_month_wraps_year():
+    assert next_month(date(2025, 12, 1)) == date(2026, 1, 1)
+    assert next_month(date(2026, 1, 15)) == date(2026, 2, 1)
+
+
+def test_session_purge_runs_short_batches_until_done():
+    """Test that each batch is its own transaction and the loop stops on a short batch"""
+    db = ScriptedDatabase(rowcounts=[100, 100, 37])
+
+    deleted = purge_expired_sessions(db, datetime(2026, 1, 1), batch_size=100)
+
+    assert deleted == 237
+    assert db.transactions == 3
+    assert all(params == (datetime(2026, 1, 1), 100) for _, params in db.statements)
+
+
+def test_only_months_past_the_window_are_dropped():
+    """Test that partitions are dropped whole and only once fully expired"""
+    db = ScriptedDatabase(rowcounts=[0], partitions=[
+        'activity_logs_2026_01', 'activity_logs_2026_02', 'activity_logs_2026_03', 'activity_logs_default'])
+
+    dropped, deleted = drop_activity_log_partitions(db, datetime(2026, 3, 10))
+
+    assert dropped == ['activity_logs_2026_01', 'activity_logs_2026_02']
+    assert deleted == 0
+    assert ('DROP TABLE activity_logs_2026_03', None) not in db.statements
+
+
+def test_missing_future_partitions_are_created():
+    """Test that only absent months get a partition, moving rows out of the default"""
+    db = ScriptedDatabase(rowcounts=[0], partitions=['activity_logs_2026_03'])
+
+    created = ensure_activity_log_partitions(db, today=date(2026, 3, 20), months_ahead=2)
+
+    assert created == ['activity_logs_2026_04', 'activity_logs_2026_05']
+    attaches = [params for query, params in db.statements if 'ATTACH PARTITION' in query]
+    assert attaches == [(date(2026, 4, 1), date(2026, 5, 1)), (date(2026, 5, 1), date(2026, 6, 1))]
@@ -1,14 +1,15 @@
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 from app.services.wordpress_service import WordPressService
 from app.services.openai_service import OpenAIService
 from app.services.report_service import ReportService
+from app.services.semrush_service import SEMrushService
 
 
 class TestWordPressService:
     """Test WordPress service functionality"""
 
-    @patch('app.services.wordpress_service.requests.Session')
+    @patch('app.services.wordpress_service.http_clients.session')
     def test_create_post_success(self, mock_session):
         """Test successful post creation"""
         # Mock the session and response
@@ -30,7 +31,7 @@ class TestWordPressService:
         assert result['id'] == 123
         mock_session_instance.post.assert_called_once()
 
-    @patch('app.services.wordpress_service.requests.Session')
+    @patch('app.services.wordpress_service.http_clients.session')
     def test_create_post_failure(self, mock_session):
         """Test post creation failure"""
         mock_response = Mock()
@@ -52,7 +53,8 @@ class TestWordPressService:
 class TestOpenAIService:
     """Test OpenAI service functionality"""
 
-    @patch('app.services.openai_service.openai.ChatCompletion.create')
+    @patch.dict('os.environ', {'OPENAI_API_KEY': 'sk-test'})
+    @patch('app.services.openai_service.openai_clients.complete', new_callable=AsyncMock)
     def test_generate_blog_post_success(self, mock_create):
         """Test successful blog post generation"""
         mock_response = Mock()
@@ -65,9 +67,11 @@ class TestOpenAIService:
 
         assert result['title'] == "Test Title"
         assert result['content'] == "Test content"
-        mock_create.assert_called_once()
+        mock_create.assert_awaited_once()
+        assert mock_create.await_args.args[0] == 'sk-test'
 
-    @patch('app.services.openai_service.openai.ChatCompletion.create')
+    @patch.dict('os.environ', {'OPENAI_API_KEY': 'sk-test'})
+    @patch('app.services.openai_service.openai_clients.complete', new_callable=AsyncMock)
     def test_generate_blog_post_failure(self, mock_create):
         """Test blog post generation failure"""
         mock_create.side_effect = Exception("OpenAI API Error")
@@ -133,4 +137,266 @@ class TestReportService:
         import json
         with open(filename, 'r') as f:
             loaded_data = json.load(f)
-            assert loaded_data['wordpress']['total_posts'] == 5
\ No newline at end of file
+            assert loaded_data['wordpress']['total_posts'] == 5
+
+class FakeRankingStore:
+    def __init__(self, cached=None):
+        self.cached = cached or {}
+        self.saved = {}
+
+    def get_rankings(self, keywords, database, day):
+        return {k: v for k, v in self.cached.items() if k in keywords}
+
+    def save_rankings(self, results, database, day):
+        self.saved.update(results)
+
+
+class FakeRankingHistory:
+    def __init__(self):
+        self.recorded = {}
+
+    def record_rankings(self, results, database='us', captured_at=None):
+        self.recorded.update(results)
+        return len(results)
+
+    def get_summary(self, database='us', days=30):
+        return {'total_keywords': 2, 'organic_traffic': 300, 'average_position': 4.0, 'conversions': 15}
+
+
+class TestSEMrushKeywordRankings:
+    """Test batched SEMrush ranking lookups"""
+
+    def test_duplicates_and_cached_keywords_are_not_refetched(self):
+        store = FakeRankingStore(cached={'cached kw': {'keyword': 'cached kw', 'position': 3}})
+        service = SEMrushService(ranking_store=store)
+        fetched = []
+
+        def fake_ranking(keyword, database='us'):
+            fetched.append(keyword)
+            return {'keyword': keyword, 'position': 7}
+
+        with patch.object(service, 'get_keyword_ranking', side_effect=fake_ranking):
+            result = service.get_keyword_rankings(['SEO Tools', 'seo tools ', 'cached kw', 'backlinks'])
+
+        assert sorted(fetched) == ['backlinks', 'seo tools']
+        assert result['SEO Tools']['position'] == 7
+        assert result['seo tools ']['position'] == 7
+        assert result['cached kw']['position'] == 3
+        assert set(store.saved) == {'backlinks', 'seo tools'}
+
+    def test_concurrent_batches_share_in_flight_lookups(self):
+        import threading
+        import time
+        service = SEMrushService()
+        calls = []
+
+        def slow_ranking(keyword, database='us'):
+            calls.append(keyword)
+            time.sleep(0.2)
+            return {'keyword': keyword, 'position': 1}
+
+        results = []
+        with patch.object(SEMrushService, 'get_keyword_ranking', side_effect=slow_ranking):
+            threads = [threading.Thread(target=lambda: results.append(service.get_keyword_rankings(['shared'])))
+                       for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert calls == ['shared']
+        assert all(r['shared']['position'] == 1 for r in results)
+
+    def test_failed_lookups_are_not_cached(self):
+        store = FakeRankingStore()
+        service = SEMrushService(ranking_store=store)
+
+        with patch.object(service, 'get_keyword_ranking',
+                          return_value={'keyword': 'x', 'position': 0, 'error': 'quota'}):
+            result = service.get_keyword_rankings(['x'])
+
+        assert result['x']['error'] == 'quota'
+        assert store.saved == {}
+
+    def test_rate_limit_timeouts_are_reported_as_errors(self):
+        from app.utils.rate_limit import RateLimitTimeout
+        service = SEMrushService()
+
+        with patch('app.services.semrush_service.semrush_rate_limiter.acquire',
+                   side_effect=RateLimitTimeout('rate limit: no token within 60s')):
+            result = service.get_keyword_ranking('seo tools')
+
+        assert result == {'keyword': 'seo tools', 'position': 0, 'error': 'rate limit: no token within 60s'}
+
+    def test_fetched_rankings_are_recorded_in_history(self):
+        history = FakeRankingHistory()
+        store = FakeRankingStore(cached={'cached kw': {'keyword': 'cached kw', 'position': 3}})
+        service = SEMrushService(ranking_store=store, ranking_history=history)
+
+        with patch.object(service, 'get_keyword_ranking',
+                          side_effect=lambda keyword, database='us': {'keyword': keyword, 'position': 5}):
+            service.get_keyword_rankings(['new kw', 'cached kw'])
+
+        assert set(history.recorded) == {'new kw'}
+
+    def test_stats_come_from_stored_history(self):
+        service = SEMrushService(ranking_history=FakeRankingHistory())
+
+        with patch.object(service.session, 'get') as mock_get:
+            stats = service.get_stats()
+
+        mock_get.assert_not_called()
+        assert stats['total_keywords'] == 2
+        assert stats['conversions'] == 15
+
+
+class FakeStreamResponse:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+
+def organic_page(offset, count):
+    header = ['Keyword;Position;Search Volume;CPC;Competition']
+    return header + [f'kw {i};{i % 100 + 1};{i * 10};0.5;0.3' for i in range(offset, offset + count)]
+
+
+class FakeCheckpoints:
+    def __init__(self, checkpoint=None):
+        self.checkpoint = checkpoint
+        self.saved = []
+
+    def get_checkpoint(self, domain, database):
+        return self.checkpoint
+
+    def save_checkpoint(self, domain, database, next_offset, rows_ingested, completed=False):
+        self.saved.append((next_offset, rows_ingested, completed))
+
+
+class TestSEMrushOrganicKeywords:
+    """Test paginated, streaming organic keyword ingestion"""
+
+    def fake_pages(self, total):
+        requested = []
+
+        def fake_get(url, params=None, stream=False):
+            requested.append((params['display_offset'], params['display_limit']))
+            count = max(0, min(params['display_limit'], total - params['display_offset']))
+            if count == 0:
+                return FakeStreamResponse(['ERROR 50 :: NOTHING FOUND'])
+            return FakeStreamResponse(organic_page(params['display_offset'], count))
+
+        return fake_get, requested
+
+    def test_pages_are_streamed_with_offsets(self):
+        service = SEMrushService()
+        fake_get, requested = self.fake_pages(25)
+
+        with patch.object(service.session, 'get', side_effect=fake_get):
+            keywords = list(service.iter_domain_organic_keywords('example.com', page_size=10))
+
+        assert requested == [(0, 10), (10, 10), (20, 10)]
+        assert len(keywords) == 25
+        assert keywords[3] == ('kw 3', 4, 30, 0.5, 0.3)
+        assert keywords[3].search_volume == 30
+
+    def test_legacy_list_is_limited(self):
+        service = SEMrushService()
+        fake_get, requested = self.fake_pages(500)
+
+        with patch.object(service.session, 'get', side_effect=fake_get):
+            keywords = service.get_domain_organic_keywords('example.com', limit=5)
+
+        assert requested == [(0, 5)]
+        assert keywords[0] == {'keyword': 'kw 0', 'position': 1, 'search_volume': 0, 'cpc': 0.5,
+                               'competition': 0.3}
+
+    def test_ingestion_resumes_from_checkpoint_in_batches(self):
+        service = SEMrushService()
+        fake_get, requested = self.fake_pages(25)
+        batches = []
+        checkpoints = FakeCheckpoints({'next_offset': 10, 'rows_ingested': 10, 'completed_at': None})
+
+        def sink(rows, database, captured_at):
+            batches.append([row.keyword for row in rows])
+            return len(rows)
+
+        with patch.object(service.session, 'get', side_effect=fake_get):
+            summary = service.ingest_domain_organic_keywords('example.com', sink=sink, checkpoints=checkpoints,
+                                                             batch_size=4, page_size=10)
+
+        assert requested[0] == (10, 10)
+        assert [len(batch) for batch in batches] == [4, 4, 4, 3]
+        assert batches[0][0] == 'kw 10'
+        assert checkpoints.saved[-1] == (25, 25, True)
+        assert summary['rows'] == 15
+        assert summary['resumed_from'] == 10
+
+    def test_failed_batch_does_not_advance_checkpoint(self):
+        service = SEMrushService()
+        fake_get, _ = self.fake_pages(10)
+        checkpoints = FakeCheckpoints()
+
+        with patch.object(service.session, 'get', side_effect=fake_get):
+            with pytest.raises(RuntimeError):
+                service.ingest_domain_organic_keywords('example.com', sink=lambda *args: 0,
+                                                       checkpoints=checkpoints, batch_size=4, page_size=10)
+
+        assert checkpoints.saved == []
+
+
+    def test_rate_limit_timeout_keeps_fetched_rows_and_checkpoints_them(self):
+        from app.utils.rate_limit import RateLimitTimeout
+        service = SEMrushService()
+        fake_get, _ = self.fake_pages(25)
+        checkpoints = FakeCheckpoints()
+        stored = []
+        acquired = []
+
+        def acquire(timeout=None):
+            acquired.append(timeout)
+            if len(acquired) == 2:
+                raise RateLimitTimeout('rate limit: no token within 60s')
+
+        def sink(rows, database, captured_at):
+            stored.append(len(rows))
+            return len(rows)
+
+        with patch.object(service.session, 'get', side_effect=fake_get), \
+                patch('app.services.semrush_service.semrush_rate_limiter.acquire', side_effect=acquire):
+            with pytest.raises(RateLimitTimeout):
+                service.ingest_domain_organic_keywords('example.com', sink=sink, checkpoints=checkpoints,
+                                                       batch_size=4, page_size=10)
+
+        assert stored == [4, 4, 2]
+        assert checkpoints.saved[-1] == (10, 10, False)
+
+    def test_batches_without_keywords_are_skipped_not_failed(self):
+        service = SEMrushService()
+        checkpoints = FakeCheckpoints()
+        pages = iter([FakeStreamResponse(organic_page(0, 2) + [';5;10;0.5;0.3', ' ;6;10;0.5;0.3']),
+                      FakeStreamResponse(['ERROR 50 :: NOTHING FOUND'])])
+        stored = []
+
+        def sink(rows, database, captured_at):
+            stored.append(len(rows))
+            return len(rows)
+
+        with patch.object(service.session, 'get', side_effect=lambda *args, **kwargs: next(pages)):
+            summary = service.ingest_domain_organic_keywords('example.com', sink=sink, checkpoints=checkpoints,
+                                                             batch_size=2, page_size=10)
+
+        assert stored == [2]
+        assert checkpoints.saved[-1] == (4, 4, True)
+        assert summary['rows'] == 4
@@ -0,0 +1,80 @@
+import threading
+import time
+from app.utils.stats_cache import StatsCache
+
+
+def test_fresh_entries_are_served_from_cache():
+    cache = StatsCache(ttl=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {'total_posts': len(calls)}
+
+    assert cache.get('1', 'dashboard', loader) == ({'total_posts': 1}, 'miss')
+    assert cache.get('1', 'dashboard', loader) == ({'total_posts': 1}, 'hit')
+    assert cache.get('2', 'dashboard', loader) == ({'total_posts': 2}, 'miss')
+    assert len(calls) == 2
+
+
+def test_stale_entry_is_served_while_refreshing():
+    """Test that an expired entry returns immediately and refreshes in the background"""
+    cache = StatsCache(ttl=0.05, stale_ttl=60)
+    release = threading.Event()
+    values = iter([{'v': 1}, {'v': 2}])
+
+    def loader():
+        value = next(values)
+        if value['v'] == 2:
+            release.wait(5)
+        return value
+
+    cache.get('t', 'report', loader)
+    time.sleep(0.1)
+
+    started = time.monotonic()
+    assert cache.get('t', 'report', loader) == ({'v': 1}, 'stale')
+    assert time.monotonic() - started < 0.5
+
+    release.set()
+    deadline = time.monotonic() + 2
+    while cache.stats()['refreshes'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get('t', 'report', loader)[0] == {'v': 2}
+
+
+def test_cold_key_is_loaded_once_under_concurrency():
+    cache = StatsCache(ttl=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'ok': True}
+
+    threads = [threading.Thread(target=cache.get, args=('t', 'report', loader)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+
+
+def test_partial_results_are_only_fresh_briefly():
+    cache = StatsCache(ttl=60, partial_ttl=0.05)
+    values = iter([{'partial': True}, {'partial': False}])
+
+    def loader():
+        return next(values)
+
+    def partial(value):
+        return value['partial']
+
+    assert cache.get('site', 'report', loader, partial=partial) == ({'partial': True}, 'miss')
+    time.sleep(0.1)
+    assert cache.get('site', 'report', loader, partial=partial) == ({'partial': True}, 'stale')
+
+    deadline = time.monotonic() + 2
+    while cache.stats()['refreshes'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get('site', 'report', loader, partial=partial) == ({'partial': False}, 'hit')
@@ -0,0 +1,57 @@
+import time
+from app.services.stats_collector import StatsCollector
+
+
+def sleeper(seconds, result):
+    def fetch():
+        time.sleep(seconds)
+        return result
+    return fetch
+
+
+def test_sources_run_in_parallel():
+    """Test that latency is the slowest source, not the sum"""
+    collector = StatsCollector(sources={
+        'wordpress': sleeper(0.2, {'total_posts': 3}),
+        'semrush': sleeper(0.2, {'total_keywords': 10}),
+        'ga4': sleeper(0.2, {'sessions': 5}),
+        'gbp': sleeper(0.2, {'views': 7}),
+    }, timeout=2)
+
+    started = time.monotonic()
+    result = collector.collect()
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 0.6
+    assert result['data']['semrush'] == {'total_keywords': 10}
+    assert all(source['status'] == 'ok' for source in result['sources'].values())
+
+
+def test_slow_source_is_served_stale():
+    """Test that a source missing its deadline falls back to its last good value"""
+    delays = {'ga4': 0}
+
+    def ga4():
+        time.sleep(delays['ga4'])
+        return {'sessions': 42}
+
+    collector = StatsCollector(sources={'ga4': ga4, 'gbp': sleeper(0, {'views': 1})}, timeout=0.1)
+    assert collector.collect()['sources']['ga4']['status'] == 'ok'
+
+    delays['ga4'] = 0.5
+    result = collector.collect()
+
+    assert result['sources']['ga4']['status'] == 'stale'
+    assert result['data']['ga4'] == {'sessions': 42}
+    assert result['sources']['gbp']['status'] == 'ok'
+
+
+def test_failing_source_without_history_is_unavailable():
+    def broken():
+        raise RuntimeError('boom')
+
+    collector = StatsCollector(sources={'semrush': broken}, timeout=1)
+    result = collector.collect()
+
+    assert result['data']['semrush'] == {}
+    assert result['sources']['semrush'] == {'status': 'unavailable', 'error': 'boom'}
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.services.google_service import GoogleService
+from app.utils.token_cache import AccessTokenCache
+
+
+class StubTokenHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with server.lock:
+            server.requests += 1
+            token = f'token-{server.requests}'
+        time.sleep(server.delay)
+        body = json.dumps({'access_token': token, 'expires_in': server.expires_in}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def token_server():
+    """Local stand-in for oauth2.googleapis.com/token"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubTokenHandler)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.delay = 0
+    server.expires_in = 3600
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def google_service(monkeypatch, server, refresh_token):
+    monkeypatch.setenv('GOOGLE_TOKEN_URL', f'http://127.0.0.1:{server.server_port}/token')
+    monkeypatch.setenv('GOOGLE_REFRESH_TOKEN', refresh_token)
+    return GoogleService()
+
+
+def test_token_is_shared_across_instances(monkeypatch, token_server):
+    """Test that service instances with the same credentials reuse one token"""
+    first = google_service(monkeypatch, token_server, 'shared')
+    second = google_service(monkeypatch, token_server, 'shared')
+
+    assert first._get_access_token() == 'token-1'
+    assert second._get_access_token() == 'token-1'
+    assert token_server.requests == 1
+
+
+def test_concurrent_callers_share_one_refresh(monkeypatch, token_server):
+    """Test that a cold cache sends a single token request under concurrency"""
+    token_server.delay = 0.2
+    service = google_service(monkeypatch, token_server, 'concurrent')
+    tokens = []
+
+    threads = [threading.Thread(target=lambda: tokens.append(service._get_access_token())) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert tokens == ['token-1'] * 10
+    assert token_server.requests == 1
+
+
+def test_token_is_refreshed_in_background_before_expiry():
+    """Test that a token near expiry is served while the next one is fetched"""
+    issued = []
+
+    def fetch():
+        issued.append(f'token-{len(issued) + 1}')
+        return issued[-1], 0.4
+
+    cache = AccessTokenCache(fetch, refresh_margin=300)
+    assert cache.get_token() == 'token-1'
+    time.sleep(0.25)  # past the halfway refresh point, before expiry
+
+    assert cache.get_token() == 'token-1'
+    deadline = time.monotonic() + 2
+    while cache.stats()['background_refreshes'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get_token() == 'token-2'
+
+
+def test_failed_refresh_is_raised_to_caller():
+    def fetch():
+        raise RuntimeError('token endpoint down')
+
+    cache = AccessTokenCache(fetch)
+    with pytest.raises(RuntimeError):
+        cache.get_token()
+    assert cache.stats()['errors'] == 1
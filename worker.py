@@ -0,0 +1,32 @@
+"""Background job worker: python worker.py
+
+Runs queued blog generation, re-optimization and GBP jobs (see app/jobs.py).
+Start as many worker processes as the external APIs allow; they share the
+queue through the database.
+"""
+import signal
+from dotenv import load_dotenv
+from app.utils.logger import setup_logger
+from app.models import db_manager
+from app.jobs import JobWorker
+
+load_dotenv()
+logger = setup_logger()
+
+
+def main():
+    if not db_manager.database_url:
+        logger.error("DATABASE_URL is not set; the job worker needs the database")
+        return 1
+    db_manager.init_database()
+
+    worker = JobWorker()
+    # Finish the jobs in hand on SIGTERM (platform restarts) and Ctrl-C
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    worker.run()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())